@@ -0,0 +1,6 @@
+# bot/__main__.py
+import sys
+
+from bot.cli import main
+
+sys.exit(main())
@@ -0,0 +1,261 @@
+# bot/attachments.py
+"""
+Inspeção de anexos: SHA-256, tipo real pelo conteúdo e cache de hashes
+
+Uso:
+    python -m bot.attachments import-hashes malware_hashes.txt   # marca como maliciosos
+    python -m bot.attachments mark <sha256> malicious|clean|unknown
+    python -m bot.attachments show <sha256>
+
+O arquivo é lido em blocos (memória limitada) e o tipo é identificado pelos
+primeiros bytes, não pela extensão. A tabela attachment_hashes guarda, por
+hash, o tipo, quantas vezes o arquivo já apareceu e o veredito
+('malicious', 'clean' ou 'unknown'): um anexo cujo hash já foi marcado
+como malicioso recebe o score máximo, sem depender das demais regras.
+"""
+import os
+import re
+import sys
+import sqlite3
+import hashlib
+import logging
+import argparse
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+HEAD_SIZE = 0x8006  # cobre a assinatura de imagens ISO (offset 0x8001)
+
+# Assinaturas no início do arquivo
+MAGIC = [
+    (b'%PDF-', 'pdf'),
+    (b'MZ', 'exe'),
+    (b'\x7fELF', 'elf'),
+    (b'PK\x03\x04', 'zip'),
+    (b'PK\x05\x06', 'zip'),
+    (b'Rar!\x1a\x07', 'rar'),
+    (b'7z\xbc\xaf\x27\x1c', '7z'),
+    (b'\x1f\x8b', 'gzip'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'ole'),  # .doc/.xls/.ppt/.msi
+    (b'{\\rtf', 'rtf'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF8', 'gif'),
+    (b'L\x00\x00\x00\x01\x14\x02\x00', 'lnk'),
+]
+
+# Tipos aceitos para cada extensão declarada
+EXPECTED_TYPES = {
+    'pdf': {'pdf'}, 'rtf': {'rtf'}, 'txt': {'text'}, 'csv': {'text'},
+    'doc': {'ole', 'rtf'}, 'xls': {'ole'}, 'ppt': {'ole'}, 'msi': {'ole'},
+    'docx': {'zip'}, 'xlsx': {'zip'}, 'pptx': {'zip'}, 'docm': {'zip'}, 'xlsm': {'zip'},
+    'zip': {'zip'}, 'jar': {'zip'}, 'rar': {'rar'}, '7z': {'7z'}, 'gz': {'gzip'}, 'tgz': {'gzip'},
+    'png': {'png'}, 'jpg': {'jpeg'}, 'jpeg': {'jpeg'}, 'gif': {'gif'},
+    'htm': {'html'}, 'html': {'html'}, 'exe': {'exe'}, 'dll': {'exe'}, 'iso': {'iso'}, 'lnk': {'lnk'},
+}
+
+# Conteúdo executável ou que executa ao abrir
+DANGEROUS_TYPES = {'exe', 'elf', 'lnk', 'iso', 'html'}
+DANGEROUS_EXTENSIONS = {
+    'exe', 'scr', 'com', 'pif', 'bat', 'cmd', 'js', 'jse', 'vbs', 'vbe', 'wsf', 'hta',
+    'ps1', 'msi', 'jar', 'lnk', 'iso', 'img', 'htm', 'html', 'svg', 'docm', 'xlsm', 'pptm',
+}
+
+VERDICTS = ('malicious', 'clean', 'unknown')
+
+
+def detect_type(head):
+    """Tipo do arquivo pelos primeiros bytes"""
+    for signature, file_type in MAGIC:
+        if head.startswith(signature):
+            return file_type
+
+    if head[0x8001:0x8006] == b'CD001':
+        return 'iso'
+
+    start = head[:512].lstrip().lower()
+    if start.startswith((b'<!doctype html', b'<html', b'<svg')) or b'<script' in start:
+        return 'html'
+
+    if head and b'\x00' not in head[:1024]:
+        try:
+            head[:1024].decode('utf-8')
+            return 'text'
+        except UnicodeDecodeError:
+            pass
+    return 'unknown'
+
+
+def hash_stream(stream, chunk_size=CHUNK_SIZE):
+    """
+    Calcula o SHA-256 lendo em blocos
+
+    Returns:
+        (sha256, tamanho, primeiros HEAD_SIZE bytes)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    head = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+        if len(head) < HEAD_SIZE:
+            head += chunk[:HEAD_SIZE - len(head)]
+    return digest.hexdigest(), size, head
+
+
+def assess(attachment):
+    """
+    Marca 'mismatch' (extensão diz uma coisa, conteúdo diz outra, ex.: fatura.pdf
+    que é um executável) e 'dangerous' a partir do nome e do tipo detectado
+
+    Também usado para anexos lidos do banco, que guarda só nome e tipo.
+    """
+    filename = attachment.get('filename') or ''
+    file_type = attachment.get('file_type') or 'unknown'
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    expected = EXPECTED_TYPES.get(extension)
+
+    attachment['mismatch'] = bool(expected) and file_type != 'unknown' and file_type not in expected
+    attachment['dangerous'] = file_type in DANGEROUS_TYPES or extension in DANGEROUS_EXTENSIONS
+    return attachment
+
+
+def _describe(filename, content_type, sha256, size, head):
+    return assess({
+        'filename': os.path.basename(filename or '') or 'sem_nome',
+        'content_type': content_type or '',
+        'size': size,
+        'sha256': sha256,
+        'file_type': detect_type(head),
+        'verdict': None
+    })
+
+
+def inspect_file(path, filename=None, content_type=None):
+    """Inspeciona um arquivo em disco (ex.: download do navegador)"""
+    with open(path, 'rb') as f:
+        sha256, size, head = hash_stream(f)
+    return _describe(filename or path, content_type, sha256, size, head)
+
+
+def inspect_bytes(data, filename=None, content_type=None):
+    """Inspeciona um anexo já decodificado em memória (ex.: parte MIME)"""
+    return _describe(
+        filename, content_type, hashlib.sha256(data).hexdigest(), len(data), data[:HEAD_SIZE]
+    )
+
+
+class AttachmentCache:
+    """Vereditos por hash (tabela attachment_hashes, criada pelo EmailDatabase)"""
+
+    def __init__(self, db_path="data/emails.db"):
+        self.db_path = db_path
+
+    def annotate(self, attachments):
+        """Preenche 'verdict' de cada anexo com o veredito salvo para o hash"""
+        if not attachments:
+            return attachments
+
+        hashes = list({a['sha256'] for a in attachments})
+        verdicts = {}
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT sha256, verdict FROM attachment_hashes WHERE sha256 IN ({','.join('?' * len(hashes))})",
+                hashes
+            )
+            verdicts = dict(cursor.fetchall())
+            conn.close()
+        except Exception as e:
+            logger.error(f"❌ Erro ao consultar hashes de anexos: {e}")
+
+        for attachment in attachments:
+            attachment['verdict'] = verdicts.get(attachment['sha256'], 'unknown')
+        return attachments
+
+    def set_verdicts(self, hashes, verdict, source='manual'):
+        """Registra o veredito de vários hashes. Retorna a quantidade gravada."""
+        if verdict not in VERDICTS:
+            raise ValueError(f"Veredito inválido: {verdict}")
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO attachment_hashes (sha256, verdict, source, seen_count)
+            VALUES (?, ?, ?, 0)
+            ON CONFLICT(sha256) DO UPDATE SET verdict = excluded.verdict, source = excluded.source
+        ''', [(h.lower(), verdict, source) for h in hashes])
+        count = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return count
+
+    def import_hashes(self, path, verdict='malicious'):
+        """Importa um feed de hashes SHA-256 (um por linha; comentários com #)"""
+        hashes = []
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                match = re.search(r'\b[0-9a-fA-F]{64}\b', line.split('#', 1)[0])
+                if match:
+                    hashes.append(match.group(0))
+
+        count = self.set_verdicts(hashes, verdict, source=os.path.basename(path))
+        logger.info(f"🧬 {count} hashes importados de {path} como '{verdict}'")
+        return count
+
+    def get(self, sha256):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(
+            'SELECT * FROM attachment_hashes WHERE sha256 = ?', (sha256.lower(),)
+        ).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+
+def main(argv=None):
+    from bot.database import EmailDatabase
+    from bot.logger import setup_logging
+
+    parser = argparse.ArgumentParser(description='Cache de hashes de anexos')
+    parser.add_argument('--db', default='data/emails.db')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    imp = sub.add_parser('import-hashes', help='Importa feed de hashes SHA-256')
+    imp.add_argument('paths', nargs='+')
+    imp.add_argument('--verdict', choices=VERDICTS, default='malicious')
+
+    mark = sub.add_parser('mark', help='Define o veredito de um hash')
+    mark.add_argument('sha256')
+    mark.add_argument('verdict', choices=VERDICTS)
+
+    show = sub.add_parser('show', help='Mostra o registro de um hash')
+    show.add_argument('sha256')
+
+    args = parser.parse_args(argv)
+    setup_logging()
+    EmailDatabase(args.db)
+    cache = AttachmentCache(args.db)
+
+    if args.command == 'import-hashes':
+        for path in args.paths:
+            cache.import_hashes(path, args.verdict)
+    elif args.command == 'mark':
+        cache.set_verdicts([args.sha256], args.verdict)
+    else:
+        record = cache.get(args.sha256)
+        if not record:
+            print("Hash não encontrado")
+            return 1
+        for key, value in record.items():
+            print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
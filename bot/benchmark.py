@@ -0,0 +1,328 @@
+# bot/benchmark.py
+"""
+Benchmark do pipeline de processamento (100% offline)
+
+Uso:
+    python -m bot.benchmark                    # executa e mostra resultados
+    python -m bot.benchmark --save             # salva como baseline
+    python -m bot.benchmark --compare          # compara com o baseline salvo
+    python -m bot.benchmark --scales 100,1000  # escalas personalizadas
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import tracemalloc
+from datetime import datetime
+
+# Nunca acessar a rede durante o benchmark
+os.environ.setdefault('OFFLINE', 'true')
+
+from bot.cache import AnalysisCache
+from bot.corpus import CorpusGenerator
+from bot.database import EmailDatabase
+from bot.extrair import EmailExtractor
+from bot.phishing import PhishingDetector
+from bot.reputation import ReputationStore
+
+
+DEFAULT_SCALES = [100, 1000, 5000]
+DEFAULT_BASELINE = 'data/benchmark_baseline.json'
+
+
+class Benchmark:
+    """Mede a vazão de cada etapa do pipeline em várias escalas"""
+
+    def __init__(self, scales=None, seed=42, repeat=3):
+        self.scales = scales or DEFAULT_SCALES
+        self.seed = seed
+        self.repeat = repeat
+        self.detector = PhishingDetector()
+        self.extractor = EmailExtractor()
+
+    def _measure(self, func, items):
+        """Executa func(items) `repeat` vezes e retorna o melhor tempo"""
+        best = None
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func(items)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best
+
+    def _result(self, count, elapsed):
+        return {
+            'count': count,
+            'seconds': round(elapsed, 6),
+            'per_second': round(count / elapsed, 2) if elapsed > 0 else None
+        }
+
+    def bench_analyze(self, emails):
+        def run(items):
+            for email in items:
+                self.detector.analyze_email(email)
+        return self._result(len(emails), self._measure(run, emails))
+
+    def bench_extract(self, emails):
+        def run(items):
+            for email in items:
+                self.extractor.extract_all(email['body'])
+        return self._result(len(emails), self._measure(run, emails))
+
+    def bench_cache(self, emails):
+        """Análise via cache: primeira passada (fria) e segunda (quente)"""
+        tmp_dir = tempfile.mkdtemp(prefix='bot_bench_')
+        try:
+            db_path = os.path.join(tmp_dir, 'cache.db')
+            EmailDatabase(db_path)
+            cache = AnalysisCache(self.detector, self.extractor, db_path)
+
+            start = time.perf_counter()
+            for email in emails:
+                cache.analyze(email)
+            cold = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for email in emails:
+                cache.analyze(email)
+            warm = time.perf_counter() - start
+
+            return {
+                'cold': self._result(len(emails), cold),
+                'warm': self._result(len(emails), warm)
+            }
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def bench_classifier(self, emails):
+        """Treino e pontuação em lote do classificador (se numpy/scipy estiverem instalados)"""
+        try:
+            from bot.classifier import PhishingClassifier
+        except ImportError:
+            return None
+
+        labels = [1 if e['expected_phishing'] else 0 for e in emails]
+        if len(set(labels)) < 2:
+            return None
+
+        clf = PhishingClassifier()
+        start = time.perf_counter()
+        clf.fit(emails, labels)
+        train = time.perf_counter() - start
+
+        return {
+            'train': self._result(len(emails), train),
+            'predict_batch': self._result(len(emails), self._measure(clf.predict_proba, emails))
+        }
+
+    def bench_reputation(self, scale):
+        """Carga e consulta das listas de reputação com scale * 100 domínios"""
+        count = scale * 100
+        tmp_dir = tempfile.mkdtemp(prefix='bot_bench_')
+        try:
+            for kind in ReputationStore.KINDS:
+                os.makedirs(os.path.join(tmp_dir, kind))
+            with open(os.path.join(tmp_dir, 'blocked', 'feed.txt'), 'w') as f:
+                for i in range(count):
+                    f.write(f"bad{i}-{self.seed}.example{i % 97}.com\n")
+
+            start = time.perf_counter()
+            store = ReputationStore(tmp_dir, check_interval=3600)
+            load = time.perf_counter() - start
+
+            # Memória retida pelas listas (medida à parte: o tracemalloc deixa a carga lenta)
+            tracemalloc.start()
+            lists = store._load(store._signature)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del lists
+
+            # Metade casa por sufixo (subdomínio de um domínio da lista), metade não
+            hosts = [
+                f"www.bad{i}-{self.seed}.example{i % 97}.com" if i % 2 else f"ok{i}.example.org"
+                for i in range(min(count, 20000))
+            ]
+
+            result = self._result(count, load)
+            result['bytes_per_domain'] = round(memory / count, 1)
+            return {
+                'load': result,
+                'lookup': self._result(len(hosts), self._measure(
+                    lambda items: [store.lookup(h) for h in items], hosts
+                ))
+            }
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def bench_database(self, emails):
+        """Mede inserção e consultas em um banco temporário"""
+        results = {}
+        tmp_dir = tempfile.mkdtemp(prefix='bot_bench_')
+
+        try:
+            db = EmailDatabase(os.path.join(tmp_dir, 'bench.db'))
+
+            analyzed = []
+            for email in emails:
+                data = dict(email)
+                data['phishing_result'] = self.detector.analyze_email(email)
+                analyzed.append(data)
+
+            # Inserção (e-mail + análise + dados extraídos, como no scheduler)
+            start = time.perf_counter()
+            for data in analyzed:
+                email_id = db.save_email(data)
+                if email_id > 0:
+                    db.save_phishing_analysis(email_id, data['phishing_result'])
+                    extracted = self.extractor.extract_all(data['body'])
+                    for data_type, values in extracted.items():
+                        for value in values:
+                            db.save_extracted_data(email_id, data_type, value)
+            results['insert'] = self._result(len(analyzed), time.perf_counter() - start)
+
+            # Consulta de existência (usada a cada e-mail lido)
+            ids = [email['message_id'] for email in emails]
+            results['email_exists'] = self._result(
+                len(ids), self._measure(lambda items: [db.email_exists(i) for i in items], ids)
+            )
+
+            # Listagem de phishing e estatísticas
+            results['get_phishing_emails'] = self._result(
+                1, self._measure(lambda _: db.get_phishing_emails(limit=50), None)
+            )
+            results['get_stats'] = self._result(
+                1, self._measure(lambda _: db.get_stats(), None)
+            )
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return results
+
+    def run(self):
+        report = {
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': self.seed,
+            'scales': {}
+        }
+
+        for scale in self.scales:
+            generator = CorpusGenerator(seed=self.seed)
+            emails = generator.generate_list(scale)
+
+            print(f"📏 Escala {scale} e-mails...")
+            stages = {
+                'analyze_email': self.bench_analyze(emails),
+                'extract_all': self.bench_extract(emails),
+                'analysis_cache': self.bench_cache(emails),
+                'classifier': self.bench_classifier(emails),
+                'reputation': self.bench_reputation(scale),
+                'database': self.bench_database(emails)
+            }
+            report['scales'][str(scale)] = {k: v for k, v in stages.items() if v is not None}
+
+        return report
+
+
+def flatten(report):
+    """Converte o relatório em {'escala/etapa': e-mails por segundo}"""
+    flat = {}
+    for scale, stages in report.get('scales', {}).items():
+        for stage, result in stages.items():
+            if 'per_second' in result:
+                flat[f"{scale}/{stage}"] = result['per_second']
+            else:
+                for sub, sub_result in result.items():
+                    flat[f"{scale}/{stage}.{sub}"] = sub_result['per_second']
+    return flat
+
+
+def compare(current, baseline, tolerance=0.25):
+    """
+    Compara o relatório atual com o baseline
+
+    Returns:
+        lista de (chave, baseline, atual, variação) das etapas que ficaram
+        mais lentas que a tolerância
+    """
+    regressions = []
+    base = flatten(baseline)
+
+    print(f"\n{'Etapa':<40} {'Baseline':>12} {'Atual':>12} {'Variação':>10}")
+    for key, value in flatten(current).items():
+        old = base.get(key)
+        if not old or not value:
+            print(f"{key:<40} {'-':>12} {value or 0:>12.1f} {'novo':>10}")
+            continue
+
+        change = (value - old) / old
+        flag = ''
+        if change < -tolerance:
+            flag = ' ⚠️'
+            regressions.append((key, old, value, change))
+        print(f"{key:<40} {old:>12.1f} {value:>12.1f} {change:>+9.0%}{flag}")
+
+    return regressions
+
+
+def print_report(report):
+    print(f"\n{'Etapa':<40} {'Qtd':>8} {'Segundos':>10} {'Por seg.':>12}")
+    for scale, stages in report['scales'].items():
+        for stage, result in stages.items():
+            items = [(stage, result)] if 'per_second' in result else [
+                (f"{stage}.{sub}", sub_result) for sub, sub_result in result.items()
+            ]
+            for name, r in items:
+                print(f"{scale + '/' + name:<40} {r['count']:>8} {r['seconds']:>10.4f} {r['per_second'] or 0:>12.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline de e-mails')
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                        help='Escalas separadas por vírgula')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save', action='store_true', help='Salva o resultado como baseline')
+    parser.add_argument('--compare', action='store_true', help='Compara com o baseline salvo')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Queda de vazão tolerada antes de acusar regressão (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(',') if s.strip()]
+    report = Benchmark(scales=scales, seed=args.seed, repeat=args.repeat).run()
+    print_report(report)
+
+    exit_code = 0
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"\n❌ Baseline não encontrado: {args.baseline}")
+            exit_code = 2
+        else:
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = compare(report, baseline, args.tolerance)
+            if regressions:
+                print(f"\n⚠️ {len(regressions)} etapa(s) mais lenta(s) que o baseline")
+                exit_code = 1
+            else:
+                print("\n✅ Nenhuma regressão de desempenho")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Baseline salvo em {args.baseline}")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+# bot/cache.py
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCache:
+    """
+    Cache de análises de phishing por hash do conteúdo
+
+    A chave é o hash do remetente, assunto, corpo e anexos (flag e, de cada
+    anexo, hash, veredito, nome, tipo e flags), normalizados, mais a versão
+    do conjunto de regras do detector. Cópias do mesmo e-mail (mesma onda de
+    phishing em várias caixas, reenvios) reaproveitam o veredito e os dados
+    extraídos.
+
+    Camadas:
+        1. memória: LRU com até CACHE_MEMORY_SIZE entradas
+        2. disco: tabela analysis_cache no banco SQLite
+
+    Com write_behind=True as gravações em disco (novas análises e contagem de
+    acertos) ficam pendentes até flush(): no pipeline, analyze() roda nas
+    threads de análise e flush() na thread de gravação, a única que escreve
+    no banco.
+    """
+
+    def __init__(self, detector, extractor, db_path="data/emails.db", memory_size=None,
+                 write_behind=False):
+        self.detector = detector
+        self.extractor = extractor
+        self.db_path = db_path
+        self.memory_size = memory_size or int(os.getenv('CACHE_MEMORY_SIZE', 10000))
+        self.enabled = os.getenv('ANALYSIS_CACHE', 'true').lower() == 'true'
+        self.write_behind = write_behind
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self._pending_stores = {}
+        self._pending_hits = {}
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0
+        }
+        self.create_tables()
+        self.purge_old_versions()
+
+    def create_tables(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                content_hash TEXT PRIMARY KEY,
+                ruleset_version TEXT,
+                analysis TEXT,
+                extracted TEXT,
+                hits INTEGER DEFAULT 0,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                last_hit_at TEXT
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def purge_old_versions(self):
+        """Remove entradas de versões anteriores das regras"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            'DELETE FROM analysis_cache WHERE ruleset_version != ?',
+            (self.detector.get_ruleset_version(),)
+        )
+        removed = cursor.rowcount
+        conn.commit()
+        conn.close()
+
+        if removed > 0:
+            logger.info(f"🧹 Cache: {removed} análises de regras antigas removidas")
+
+    def content_hash(self, email_data, ruleset_version=None):
+        """Hash do conteúdo normalizado + versão das regras"""
+        body = email_data.get('body', '') or ''
+        body = '\n'.join(line.rstrip() for line in body.replace('\r\n', '\n').split('\n')).strip()
+
+        parts = [
+            ruleset_version or self.detector.get_ruleset_version(),
+            (email_data.get('sender_email', '') or '').strip().lower(),
+            (email_data.get('sender', '') or '').strip().lower(),
+            (email_data.get('subject', '') or '').strip().lower(),
+            body,
+            '1' if email_data.get('has_attachments') else '0',
+            # O nome e o tipo entram nos motivos e nas flags de assess()
+            '\x1e'.join(sorted(
+                '|'.join((
+                    a.get('sha256') or '',
+                    a.get('verdict') or '',
+                    (a.get('filename') or '').strip(),
+                    a.get('file_type') or '',
+                    '1' if a.get('mismatch') else '0',
+                    '1' if a.get('dangerous') else '0',
+                )) for a in email_data.get('attachments') or []
+            )),
+        ]
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def analyze(self, email_data):
+        """
+        Retorna (analysis, extracted) usando o cache quando possível
+
+        Em caso de acerto, analysis traz 'cached': True e um novo analyzed_at.
+        """
+        if not self.enabled:
+            return self._compute(email_data)
+
+        version = self.detector.get_ruleset_version()
+        key = self.content_hash(email_data, version)
+
+        # 1. Memória
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+
+        if entry is not None:
+            return self._from_entry(entry)
+
+        # 2. Disco
+        entry = self._load(key, version)
+        if entry is not None:
+            with self.lock:
+                self.stats['disk_hits'] += 1
+            self._record_hit(key)
+            self._remember(key, entry)
+            return self._from_entry(entry)
+
+        # 3. Calcular
+        with self.lock:
+            self.stats['misses'] += 1
+
+        analysis, extracted = self._compute(email_data)
+        entry = (analysis, extracted)
+        self._remember(key, entry)
+        self._store(key, version, analysis, extracted)
+        return analysis, extracted
+
+    def _compute(self, email_data):
+        analysis = self.detector.analyze_email(email_data)
+        extracted = self.extractor.extract_all(email_data.get('body', ''))
+        return analysis, extracted
+
+    def _from_entry(self, entry):
+        analysis, extracted = entry
+        analysis = dict(analysis)
+        analysis['analyzed_at'] = datetime.now().isoformat()
+        analysis['cached'] = True
+        return analysis, {k: list(v) for k, v in extracted.items()}
+
+    def _remember(self, key, entry):
+        with self.lock:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_size:
+                self.memory.popitem(last=False)
+
+    def _load(self, key, version):
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT analysis, extracted FROM analysis_cache WHERE content_hash = ? AND ruleset_version = ?',
+                (key, version)
+            )
+            row = cursor.fetchone()
+            conn.close()
+        except Exception as e:
+            logger.error(f"❌ Erro ao ler cache: {e}")
+            return None
+
+        if not row:
+            return None
+        return json.loads(row[0]), json.loads(row[1])
+
+    def _record_hit(self, key):
+        with self.lock:
+            self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+        if not self.write_behind:
+            self.flush()
+
+    def _store(self, key, version, analysis, extracted):
+        with self.lock:
+            self._pending_stores[key] = (
+                key,
+                version,
+                json.dumps(analysis, ensure_ascii=False),
+                json.dumps(extracted, ensure_ascii=False)
+            )
+        if not self.write_behind:
+            self.flush()
+
+    def flush(self):
+        """Grava as análises novas e as contagens de acertos pendentes numa transação"""
+        with self.lock:
+            stores, self._pending_stores = self._pending_stores, {}
+            hits, self._pending_hits = self._pending_hits, {}
+        if not stores and not hits:
+            return
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT OR REPLACE INTO analysis_cache (
+                    content_hash, ruleset_version, analysis, extracted
+                )
+                VALUES (?, ?, ?, ?)
+            ''', list(stores.values()))
+            now = datetime.now().isoformat()
+            cursor.executemany(
+                'UPDATE analysis_cache SET hits = hits + ?, last_hit_at = ? WHERE content_hash = ?',
+                [(count, now, key) for key, count in hits.items()]
+            )
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar cache: {e}")
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self._pending_stores.clear()
+            self._pending_hits.clear()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('DELETE FROM analysis_cache')
+        conn.commit()
+        conn.close()
+
+    def get_stats(self):
+        """Acertos por camada e taxa de acerto"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self.memory)
+
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        hits = stats['memory_hits'] + stats['disk_hits']
+        stats['lookups'] = lookups
+        stats['hit_rate'] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
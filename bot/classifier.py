@@ -0,0 +1,446 @@
+# bot/classifier.py
+"""
+Classificador estatístico de phishing (requer numpy e scipy)
+
+Uso:
+    python -m bot.classifier train                    # treina com o banco e salva data/classifier.npz
+    python -m bot.classifier train --algorithm logreg
+    python -m bot.classifier train --min-labels 500   # exige mais e-mails revisados
+    python -m bot.classifier evaluate                 # avalia o modelo salvo
+
+Características: n-gramas de palavras (1 e 2) do assunto e do corpo, domínio
+do remetente e atributos das URLs, mapeados por hashing para uma matriz
+esparsa (scipy.sparse.csr_matrix). O modelo final é linear (Naive Bayes
+multinomial ou regressão logística), então a pontuação de um lote inteiro é
+uma soma de pesos por e-mail feita de uma vez no numpy.
+
+O treino usa apenas e-mails revisados (coluna label): o veredito das regras
+não entra, senão o classificador só aprenderia a repetir as regras com as
+quais é combinado. Abaixo de CLASSIFIER_MIN_LABELS revisões (padrão 200) o
+treino é recusado.
+
+O modelo salvo guarda apenas os pesos diferentes de zero (np.savez_compressed)
+e é carregado pelo PhishingDetector quando CLASSIFIER_WEIGHT > 0.
+"""
+import os
+import re
+import sys
+import json
+import zlib
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import minimize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'data/classifier.npz'
+MIN_LABELS = int(os.getenv('CLASSIFIER_MIN_LABELS', 200))
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_URL_RE = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+', re.IGNORECASE)
+_IP_RE = re.compile(r'^\d{1,3}(\.\d{1,3}){3}$')
+_SHORTENERS = {'bit.ly', 'tinyurl.com', 'goo.gl', 't.co', 'ow.ly'}
+_BIGRAM_MULTIPLIER = np.uint64(0x9E3779B1)
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+class PhishingClassifier:
+    """Modelo linear sobre características com hashing"""
+
+    def __init__(self, n_features=2 ** 18, weights=None, bias=0.0, meta=None):
+        self.n_features = n_features
+        self.weights = weights if weights is not None else np.zeros(n_features, dtype=np.float32)
+        self.bias = float(bias)
+        self.meta = meta or {'algorithm': 'nb', 'normalize': False}
+        self.max_body_chars = 20000
+        self._hash_cache = {}
+        self.model_id = self._compute_model_id()
+
+    def _compute_model_id(self):
+        """Identificador do modelo (muda a cada treino)"""
+        digest = hashlib.sha1(self.weights.tobytes())
+        digest.update(str(self.bias).encode())
+        return digest.hexdigest()[:12]
+
+    # ===== CARACTERÍSTICAS =====
+
+    def _hash(self, token, prefix=''):
+        """crc32 de prefixo + token, com memória por prefixo (o vocabulário se repete muito)"""
+        cache = self._hash_cache.setdefault(prefix, {})
+        value = cache.get(token)
+        if value is None:
+            value = zlib.crc32(f"{prefix}{token}".encode('utf-8'))
+            if len(cache) < 500000:
+                cache[token] = value
+        return value
+
+    def meta_features(self, email_data):
+        """Características do remetente, anexos e URLs"""
+        body = (email_data.get('body', '') or '')[:self.max_body_chars]
+        sender_email = (email_data.get('sender_email', '') or '').lower()
+
+        domain = sender_email.split('@')[-1] if '@' in sender_email else ''
+        features = [f"d:{domain}" if domain else 'd:<vazio>']
+        if domain:
+            features.append(f"dt:{domain.rsplit('.', 1)[-1]}")
+
+        if email_data.get('has_attachments'):
+            features.append('a:anexo')
+
+        for url in _URL_RE.findall(body):
+            features.extend(self._url_features(url))
+
+        return features
+
+    def _url_features(self, url):
+        # Divisão manual: urlparse é o trecho mais lento da extração
+        rest = url.lower().split('://', 1)[-1]
+        netloc, _, path = rest.partition('/')
+        path, _, query = path.partition('?')
+        host = netloc.rsplit('@', 1)[-1].split(':', 1)[0]
+
+        features = [f"uh:{host}", f"ut:{host.rsplit('.', 1)[-1]}"]
+        features.extend(f"up:{t}" for t in _TOKEN_RE.findall(path)[:10])
+
+        if _IP_RE.match(host):
+            features.append('u:ip')
+        if host in _SHORTENERS:
+            features.append('u:encurtador')
+        if '@' in netloc:
+            features.append('u:arroba')
+        if query:
+            features.append('u:query')
+        features.append(f"u:tam{min(len(url) // 25, 8)}")
+        features.append(f"u:sub{min(host.count('.'), 5)}")
+        return features
+
+    def _hashed_features(self, emails):
+        """
+        Pares (linha, coluna) de todas as características do lote, com repetição
+
+        No Python só são feitos a tokenização e o hash de cada palavra (com
+        memória); bigramas e índices são calculados de uma vez para o lote
+        inteiro no numpy.
+        """
+        hash_token = self._hash
+
+        unigrams = []       # hashes das palavras de todos os campos, em ordem
+        segment_starts = [] # posição onde começa cada campo (sem bigrama com o anterior)
+        unigram_counts = []
+        meta = []
+        meta_counts = []
+
+        for email_data in emails:
+            before = len(unigrams)
+            for prefix, text in (('s:', email_data.get('subject', '') or ''),
+                                 ('b:', (email_data.get('body', '') or '')[:self.max_body_chars])):
+                segment_starts.append(len(unigrams))
+                words = _TOKEN_RE.findall(text.lower())
+                get = self._hash_cache.setdefault(prefix, {}).get
+                hashes = [get(w) for w in words]
+                if None in hashes:
+                    hashes = [h if h is not None else hash_token(w, prefix) for h, w in zip(hashes, words)]
+                unigrams.extend(hashes)
+            unigram_counts.append(len(unigrams) - before)
+
+            features = self.meta_features(email_data)
+            meta.extend(hash_token(f) for f in features)
+            meta_counts.append(len(features))
+
+        n_docs = len(emails)
+        docs = np.arange(n_docs)
+        uni = np.asarray(unigrams, dtype=np.uint64)
+        uni_docs = np.repeat(docs, unigram_counts)
+
+        # Bigramas: pares consecutivos dentro do mesmo campo
+        valid = np.ones(max(len(uni) - 1, 0), dtype=bool)
+        starts = np.asarray(segment_starts, dtype=np.int64)
+        starts = starts[(starts > 0) & (starts < len(uni))]
+        valid[starts - 1] = False
+        bigrams = ((uni[:-1] * _BIGRAM_MULTIPLIER + uni[1:]) & _MASK32)[valid]
+        bigram_docs = uni_docs[1:][valid]
+
+        indices = np.concatenate((uni, bigrams, np.asarray(meta, dtype=np.uint64)))
+        rows = np.concatenate((uni_docs, bigram_docs, np.repeat(docs, meta_counts)))
+        indices = (indices & np.uint64(self.n_features - 1)).astype(np.int64)
+        return rows, indices
+
+    def transform(self, emails):
+        """Converte uma lista de e-mails na matriz esparsa (n_emails x n_features)"""
+        rows, indices = self._hashed_features(emails)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), (rows, indices)),
+            shape=(len(emails), self.n_features)
+        )
+        matrix.sum_duplicates()
+        matrix.data = np.log1p(matrix.data)
+
+        if self.meta.get('normalize'):
+            norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+            norms[norms == 0] = 1.0
+            matrix = sparse.diags(1.0 / norms).dot(matrix).tocsr()
+
+        return matrix
+
+    # ===== PONTUAÇÃO =====
+
+    def decision_function(self, matrix):
+        return matrix.dot(self.weights) + self.bias
+
+    def predict_proba(self, emails):
+        """
+        Probabilidade de phishing (0-1) de cada e-mail do lote
+
+        Sem montar a matriz esparsa: as contagens por (e-mail, característica)
+        saem de um np.unique e o produto com os pesos de um np.bincount, então
+        o custo acompanha o número de palavras do lote, não n_features.
+        """
+        n_docs = len(emails)
+        if not n_docs:
+            return np.zeros(0, dtype=np.float64)
+
+        rows, indices = self._hashed_features(emails)
+        keys, counts = np.unique(rows * self.n_features + indices, return_counts=True)
+        rows = keys // self.n_features
+        values = np.log1p(counts)
+
+        if self.meta.get('normalize'):
+            norms = np.sqrt(np.bincount(rows, values * values, minlength=n_docs))
+            norms[norms == 0] = 1.0
+            values = values / norms[rows]
+
+        weights = self.weights[keys % self.n_features].astype(np.float64)
+        logits = np.bincount(rows, values * weights, minlength=n_docs) + self.bias
+        logits = np.clip(logits, -30, 30)
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    # ===== TREINO =====
+
+    def fit(self, emails=None, labels=None, matrix=None, algorithm='nb', alpha=1.0, l2=1e-4, max_iter=200):
+        """Treina o modelo. Aceita e-mails ou uma matriz já transformada."""
+        self.meta = {'algorithm': algorithm, 'normalize': algorithm == 'logreg'}
+        if matrix is None:
+            matrix = self.transform(emails)
+        y = np.asarray(labels, dtype=np.float64)
+
+        if y.min() == y.max():
+            raise ValueError("O treino precisa de exemplos das duas classes (phishing e legítimo)")
+
+        if algorithm == 'nb':
+            self._fit_naive_bayes(matrix, y, alpha)
+        elif algorithm == 'logreg':
+            self._fit_logistic(matrix, y, l2, max_iter)
+        else:
+            raise ValueError(f"Algoritmo desconhecido: {algorithm}")
+
+        self.meta.update({
+            'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'samples': int(len(y)),
+            'positives': int(y.sum())
+        })
+        self.model_id = self._compute_model_id()
+        return self
+
+    def _fit_naive_bayes(self, matrix, y, alpha):
+        positive = np.asarray(matrix[y == 1].sum(axis=0)).ravel() + alpha
+        negative = np.asarray(matrix[y == 0].sum(axis=0)).ravel() + alpha
+
+        self.weights = (np.log(positive / positive.sum()) - np.log(negative / negative.sum())).astype(np.float32)
+        self.bias = float(np.log(y.mean() / (1 - y.mean())))
+
+        # Características nunca vistas não devem pesar
+        seen = np.asarray(matrix.sum(axis=0)).ravel() > 0
+        self.weights[~seen] = 0.0
+
+    def _fit_logistic(self, matrix, y, l2, max_iter):
+        n = matrix.shape[0]
+        matrix_t = matrix.T.tocsr()
+
+        def loss(params):
+            w, b = params[:-1], params[-1]
+            z = matrix.dot(w) + b
+            p = 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+            value = np.mean(np.logaddexp(0, z) - y * z) + 0.5 * l2 * w.dot(w)
+            error = (p - y) / n
+            grad = np.empty_like(params)
+            grad[:-1] = matrix_t.dot(error) + l2 * w
+            grad[-1] = error.sum()
+            return value, grad
+
+        result = minimize(loss, np.zeros(self.n_features + 1), jac=True,
+                          method='L-BFGS-B', options={'maxiter': max_iter})
+        self.weights = result.x[:-1].astype(np.float32)
+        self.bias = float(result.x[-1])
+
+    # ===== PERSISTÊNCIA =====
+
+    def save(self, path=DEFAULT_MODEL):
+        nonzero = np.flatnonzero(self.weights)
+        np.savez_compressed(
+            path,
+            indices=nonzero.astype(np.int32),
+            values=self.weights[nonzero],
+            bias=np.float64(self.bias),
+            n_features=np.int64(self.n_features),
+            meta=np.array(json.dumps(self.meta))
+        )
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL):
+        with np.load(path, allow_pickle=False) as data:
+            n_features = int(data['n_features'])
+            weights = np.zeros(n_features, dtype=np.float32)
+            weights[data['indices']] = data['values']
+            return cls(n_features, weights, float(data['bias']), json.loads(str(data['meta'])))
+
+
+# ===== BANCO DE DADOS =====
+
+def count_labeled(db_path="data/emails.db"):
+    """Quantidade de e-mails revisados (coluna label) por classe: (phishing, legítimos)"""
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(
+            'SELECT COALESCE(SUM(label = 1), 0), COALESCE(SUM(label = 0), 0) '
+            'FROM emails WHERE label IS NOT NULL'
+        ).fetchone()
+    finally:
+        conn.close()
+    return int(row[0]), int(row[1])
+
+
+def load_training_data(db_path="data/emails.db", batch_size=5000):
+    """Gera lotes (emails, labels, ids) dos e-mails revisados (coluna label)"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    last_id = 0
+
+    try:
+        while True:
+            cursor.execute('''
+                SELECT id, subject, sender_email, body, has_attachments, label
+                FROM emails
+                WHERE label IS NOT NULL AND id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            last_id = rows[-1][0]
+            emails = [{
+                'subject': r[1] or '',
+                'sender_email': r[2] or '',
+                'body': r[3] or '',
+                'has_attachments': bool(r[4])
+            } for r in rows]
+            yield emails, [int(r[5]) for r in rows], [r[0] for r in rows]
+    finally:
+        conn.close()
+
+
+def _split(db_path, n_features, normalize):
+    """Monta as matrizes de treino e teste (1 em cada 5 ids vai para o teste)"""
+    clf = PhishingClassifier(n_features, meta={'normalize': normalize})
+    train_x, train_y, test_x, test_y = [], [], [], []
+
+    for emails, labels, ids in load_training_data(db_path):
+        matrix = clf.transform(emails)
+        is_test = np.array([i % 5 == 0 for i in ids])
+        labels = np.array(labels)
+        train_x.append(matrix[~is_test])
+        train_y.append(labels[~is_test])
+        test_x.append(matrix[is_test])
+        test_y.append(labels[is_test])
+
+    if not train_x:
+        raise ValueError("Nenhum e-mail revisado para treinar (preencha a coluna label)")
+
+    return (sparse.vstack(train_x).tocsr(), np.concatenate(train_y),
+            sparse.vstack(test_x).tocsr(), np.concatenate(test_y))
+
+
+def evaluate(clf, matrix, labels, threshold=0.5):
+    if matrix.shape[0] == 0:
+        return {'samples': 0}
+
+    logits = np.clip(clf.decision_function(matrix), -30, 30)
+    predicted = (1.0 / (1.0 + np.exp(-logits))) >= threshold
+    labels = np.asarray(labels).astype(bool)
+
+    tp = int((predicted & labels).sum())
+    fp = int((predicted & ~labels).sum())
+    fn = int((~predicted & labels).sum())
+
+    return {
+        'samples': int(len(labels)),
+        'accuracy': round(float((predicted == labels).mean()), 4),
+        'precision': round(tp / (tp + fp), 4) if tp + fp else 0.0,
+        'recall': round(tp / (tp + fn), 4) if tp + fn else 0.0
+    }
+
+
+def train_from_database(db_path="data/emails.db", algorithm='nb', n_features=2 ** 18, min_labels=None):
+    """Treina com o banco e retorna (classificador, métricas no conjunto de teste)"""
+    min_labels = MIN_LABELS if min_labels is None else min_labels
+    positives, negatives = count_labeled(db_path)
+    if positives + negatives < min_labels or not positives or not negatives:
+        raise ValueError(
+            f"Poucos e-mails revisados: {positives} phishing e {negatives} legítimos "
+            f"(mínimo {min_labels}, com as duas classes)"
+        )
+
+    train_x, train_y, test_x, test_y = _split(db_path, n_features, algorithm == 'logreg')
+    clf = PhishingClassifier(n_features)
+    clf.fit(matrix=train_x, labels=train_y, algorithm=algorithm)
+    return clf, evaluate(clf, test_x, test_y)
+
+
+def main(argv=None):
+    from bot.logger import setup_logging
+
+    parser = argparse.ArgumentParser(description='Classificador estatístico de phishing')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    train = sub.add_parser('train', help='Treina com os e-mails do banco')
+    train.add_argument('--db', default='data/emails.db')
+    train.add_argument('--out', default=DEFAULT_MODEL)
+    train.add_argument('--algorithm', choices=['nb', 'logreg'], default='nb')
+    train.add_argument('--min-labels', type=int, default=MIN_LABELS,
+                       help='Mínimo de e-mails revisados para treinar')
+    train.add_argument('--bits', type=int, default=18, help='Tamanho do espaço de hashing (2^bits)')
+
+    ev = sub.add_parser('evaluate', help='Avalia o modelo salvo')
+    ev.add_argument('--db', default='data/emails.db')
+    ev.add_argument('--model', default=DEFAULT_MODEL)
+
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    if args.command == 'train':
+        start = time.perf_counter()
+        try:
+            clf, metrics = train_from_database(args.db, args.algorithm, 2 ** args.bits, args.min_labels)
+        except ValueError as e:
+            logger.error(f"❌ {e}")
+            return 1
+        clf.save(args.out)
+        logger.info(f"🧠 Modelo {clf.model_id} salvo em {args.out} ({time.perf_counter() - start:.1f}s)")
+        logger.info(f"📊 Teste: {metrics}")
+        return 0
+
+    clf = PhishingClassifier.load(args.model)
+    _, _, test_x, test_y = _split(args.db, clf.n_features, clf.meta.get('normalize', False))
+    logger.info(f"📊 Modelo {clf.model_id}: {evaluate(clf, test_x, test_y)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+# bot/cli.py
+"""
+Linha de comando do bot
+
+Uso:
+    python -m bot run [--headless]             # modo contínuo (24/7) com o navegador
+    python -m bot single-check [--headless]    # uma verificação com o navegador
+    python -m bot stats [--json]               # estatísticas do banco
+    python -m bot list-phishing [--limit 20]
+    python -m bot search "boleto" [--phishing]
+    python -m bot export --format csv|jsonl [--output arquivo] [filtros]
+    python -m bot export --after-id 1234 --risk ALTO --risk CRÍTICO   # só ids novos
+    python -m bot export --after-seq 5678      # novos e vereditos alterados (rescore, revisão)
+    python -m bot migrate                      # cria/atualiza o esquema do banco
+
+Os módulos pesados (Playwright, tldextract, schedule) só são importados por
+run e single-check; os comandos de consulta abrem apenas o SQLite, somente
+leitura e sem migrações, respondem em milissegundos e servem para cron e
+sondas de monitoramento.
+"""
+import os
+import sys
+import json
+import argparse
+
+DEFAULT_DB = 'data/emails.db'
+
+
+def _open_db(path):
+    """
+    Abre o banco somente leitura, sem migrações (consultas não criam nem
+    alteram arquivos). None se ele não existir ou estiver desatualizado.
+    """
+    from bot.database import EmailDatabase
+
+    if not os.path.exists(path):
+        print(f"❌ Banco não encontrado: {path}", file=sys.stderr)
+        return None
+
+    db = EmailDatabase(path, read_only=True)
+    missing = db.missing_schema()
+    if missing:
+        print(f"❌ Esquema do banco desatualizado (falta {', '.join(missing)}); "
+              f"atualize com: python -m bot --db {path} migrate", file=sys.stderr)
+        return None
+    return db
+
+
+def cmd_migrate(args):
+    from bot.database import EmailDatabase
+
+    EmailDatabase(args.db)
+    print(f"✅ Esquema atualizado: {args.db}")
+    return 0
+
+
+def cmd_run(args, mode):
+    from bot.main import main as run_bot
+
+    run_bot(mode=mode, headless=True if args.headless else None)
+    return 0
+
+
+def cmd_stats(args):
+    db = _open_db(args.db)
+    if db is None:
+        return 2
+
+    stats = db.get_stats()
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False))
+        return 0
+
+    print(f"📧 Total de e-mails: {stats['total_emails']}")
+    print(f"⚠️ Phishing detectados: {stats['phishing_detected']}")
+    for level, count in sorted(stats['by_risk_level'].items(), key=lambda i: -i[1]):
+        print(f"   {level}: {count}")
+    return 0
+
+
+def _print_rows(rows):
+    for row in rows:
+        print(f"{row['id']:>7}  [{row['risk_level']}] {row['phishing_score']:>3}  "
+              f"{(row['sender'] or '')[:25]:<25}  {(row['subject'] or '')[:50]}")
+    if not rows:
+        print("Nenhum e-mail encontrado")
+
+
+def cmd_list_phishing(args):
+    db = _open_db(args.db)
+    if db is None:
+        return 2
+    _print_rows(db.query_emails(
+        columns=['id', 'risk_level', 'phishing_score', 'sender', 'subject'],
+        phishing=True, limit=args.limit, descending=True
+    ))
+    return 0
+
+
+def cmd_search(args):
+    db = _open_db(args.db)
+    if db is None:
+        return 2
+    _print_rows(db.search_emails(args.text, phishing_only=args.phishing, limit=args.limit))
+    return 0
+
+
+def cmd_export(args):
+    from bot.export import export
+
+    db = _open_db(args.db)
+    if db is None:
+        return 2
+
+    columns = args.columns.split(',') if args.columns else None
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        count, last_id = export(
+            db, out, args.format,
+            columns=columns,
+            page_size=args.page_size,
+            limit=args.limit,
+            phishing=None if args.all else True,
+            risk_levels=args.risk,
+            since=args.since,
+            until=args.until,
+            sender_domain=args.sender_domain,
+            mailbox=args.mailbox,
+            after_id=args.after_id,
+            after_seq=args.after_seq
+        )
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    finally:
+        if args.output:
+            out.close()
+
+    # Para a próxima exportação incremental: --after-id <último id> ou --after-seq <última seq>
+    position = 'seq' if args.after_seq is not None else 'id'
+    print(f"📤 {count} e-mails exportados; último {position}: {last_id}", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m bot', description='Bot de e-mails com detecção de phishing')
+    parser.add_argument('--db', default=DEFAULT_DB, help='Banco SQLite (consultas)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in (('run', 'Modo contínuo (24/7) com o navegador'),
+                            ('single-check', 'Uma verificação com o navegador')):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument('--headless', action='store_true', help='Sem janela (padrão: HEADLESS)')
+
+    stats = sub.add_parser('stats', help='Estatísticas do banco')
+    stats.add_argument('--json', action='store_true', help='Saída em JSON (monitoramento)')
+
+    listing = sub.add_parser('list-phishing', help='Últimos e-mails classificados como phishing')
+    listing.add_argument('--limit', type=int, default=20)
+
+    search = sub.add_parser('search', help='Busca no assunto, remetente e corpo')
+    search.add_argument('text')
+    search.add_argument('--phishing', action='store_true', help='Só phishing')
+    search.add_argument('--limit', type=int, default=20)
+
+    export = sub.add_parser('export', help='Exporta os e-mails de phishing (em fluxo)')
+    export.add_argument('--format', choices=('csv', 'jsonl'), default='jsonl')
+    export.add_argument('--output', help='Arquivo de saída (padrão: saída padrão)')
+    export.add_argument('--all', action='store_true', help='Todos os e-mails, não só phishing')
+    export.add_argument('--columns', help='Colunas separadas por vírgula (padrão: todas menos body)')
+    export.add_argument('--risk', action='append', help='Nível de risco (pode repetir)')
+    export.add_argument('--since', help='created_at inicial (ex.: 2024-05-01)')
+    export.add_argument('--until', help='created_at final, exclusivo')
+    export.add_argument('--sender-domain', help='Domínio do remetente (inclui subdomínios)')
+    export.add_argument('--mailbox', help='Caixa de origem')
+    export.add_argument('--after-id', type=int, help='Só ids maiores (exportação incremental)')
+    export.add_argument('--after-seq', type=int,
+                        help='Só e-mails novos ou com veredito alterado depois desta sequência '
+                             '(exportação incremental; comece com 0)')
+    export.add_argument('--limit', type=int, default=None)
+    export.add_argument('--page-size', type=int, default=500)
+
+    sub.add_parser('migrate', help='Cria ou atualiza o esquema do banco')
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'run':
+        return cmd_run(args, 'continuous')
+    if args.command == 'single-check':
+        return cmd_run(args, 'single')
+
+    commands = {
+        'stats': cmd_stats,
+        'list-phishing': cmd_list_phishing,
+        'search': cmd_search,
+        'export': cmd_export,
+        'migrate': cmd_migrate,
+    }
+    return commands[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
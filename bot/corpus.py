@@ -0,0 +1,190 @@
+# bot/corpus.py
+import random
+from datetime import datetime, timedelta
+
+
+class CorpusGenerator:
+    """Gerador determinístico de e-mails sintéticos (phishing e legítimos)"""
+
+    def __init__(self, seed=42):
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        # Remetentes legítimos
+        self.benign_senders = [
+            ('Recursos Humanos', 'rh@empresa.com.br'),
+            ('Departamento Pessoal', 'dp@empresa.com.br'),
+            ('Google', 'no-reply@google.com'),
+            ('GitHub', 'noreply@github.com'),
+            ('LinkedIn', 'messages-noreply@linkedin.com'),
+            ('Nubank', 'meajuda@nubank.com.br'),
+            ('Maria Souza', 'maria.souza@empresa.com.br'),
+            ('John Smith', 'john.smith@partner.com'),
+        ]
+
+        # Remetentes de phishing
+        self.phishing_senders = [
+            ('Banco do Brasil', 'atendimento@bb-secure-login.tk'),
+            ('Nubank Segurança', 'alerta@nubank-verify.ml'),
+            ('PayPal', 'service@paypai-account.com'),
+            ('Microsoft Support', 'support@micr0soft-update.ga'),
+            ('Itau', 'itau98231@gmail.com'),
+            ('Apple ID', 'id@app1e-login.cf'),
+            ('Receita Federal', 'notificacao483920@outlook.com'),
+        ]
+
+        self.benign_subjects = [
+            'Reunião de alinhamento semanal',
+            'Holerite de {mes} disponível',
+            'Convite: treinamento de integração',
+            'Weekly report - Q{q}',
+            'Férias aprovadas',
+            'Your pull request was merged',
+            'Atualização do plano de saúde',
+            'Meeting notes from {mes}',
+        ]
+
+        self.phishing_subjects = [
+            'URGENTE: sua conta esta bloqueada!!!',
+            'Ação requerida: verificar sua conta',
+            'Security alert: unauthorized access detected',
+            'Voce ganhou um prêmio de R$ 10.000!',
+            'Fatura em atraso - pague agora',
+            'Your account will expire - confirm now!',
+            'ALERTA DE SEGURANÇA: ATIVIDADE SUSPEITA',
+        ]
+
+        self.benign_sentences = [
+            'Segue em anexo a pauta da reunião de amanhã.',
+            'Por favor, confirme sua presença até sexta-feira.',
+            'O treinamento será realizado na sala 3 do segundo andar.',
+            'Qualquer dúvida, estamos à disposição.',
+            'Please find the weekly report attached.',
+            'Let me know if you have any questions about the proposal.',
+            'As férias foram aprovadas pelo gestor imediato.',
+            'O novo benefício entra em vigor no próximo mês.',
+            'Thanks for your contribution to the project.',
+            'Lembramos que o ponto deve ser registrado diariamente.',
+        ]
+
+        self.phishing_sentences = [
+            'Sua conta foi bloqueada por atividade suspeita.',
+            'Clique aqui para verificar seus dados imediatamente.',
+            'Digite sua senha e o número do cartão para confirmar.',
+            'Voce ganhou um prêmio, acesse agora para resgatar.',
+            'Your account has been limited due to unauthorized activity.',
+            'Click here to confirm your account and update your password.',
+            'Caso não atualize em 24 horas sua conta será encerrada.',
+            'Informe seu CPF e senha para validar o pagamento.',
+            'Pague agora o boleto em atraso para evitar o cancelamento.',
+            'Urgent: verify your bank account to avoid suspension.',
+        ]
+
+        self.benign_domains = [
+            'empresa.com.br', 'google.com', 'github.com', 'linkedin.com',
+            'nubank.com.br', 'docs.google.com', 'intranet.empresa.com.br',
+        ]
+
+        self.phishing_domains = [
+            'bb-secure-login.tk', 'nubank-verify.ml', 'paypai-account.com',
+            'g00gle-login.ga', 'bit.ly', '192.168.10.45', 'faceb00k-secure.cf',
+            'account.verify.update-info.com', 'amaz0n-prize.gq',
+        ]
+
+        self.first_names = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Felipe', 'Gabriela', 'Hugo']
+        self.last_names = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Costa', 'Pereira']
+        self.months = ['janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho',
+                       'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro']
+
+    def reset(self):
+        """Reinicia o gerador para reproduzir a mesma sequência"""
+        self.rng = random.Random(self.seed)
+
+    def generate(self, count, phishing_ratio=0.3, urls_per_email=(0, 4),
+                 body_sentences=(3, 12), pii_density=0.3, attachment_ratio=0.2):
+        """
+        Gera e-mails sintéticos no mesmo formato do EmailReader
+
+        Args:
+            count: quantidade de e-mails
+            phishing_ratio: fração de e-mails de phishing (0-1)
+            urls_per_email: intervalo (min, max) de URLs no corpo
+            body_sentences: intervalo (min, max) de frases no corpo
+            pii_density: probabilidade de cada frase vir acompanhada de dados pessoais
+            attachment_ratio: fração de e-mails com anexo
+        """
+        start = datetime(2024, 1, 1, 8, 0, 0)
+
+        for i in range(count):
+            is_phishing = self.rng.random() < phishing_ratio
+            yield self._generate_one(
+                i, is_phishing, start + timedelta(minutes=37 * i),
+                urls_per_email, body_sentences, pii_density, attachment_ratio
+            )
+
+    def generate_list(self, count, **kwargs):
+        return list(self.generate(count, **kwargs))
+
+    def _generate_one(self, index, is_phishing, date, urls_per_email,
+                      body_sentences, pii_density, attachment_ratio):
+        rng = self.rng
+
+        if is_phishing:
+            sender, sender_email = rng.choice(self.phishing_senders)
+            subject = rng.choice(self.phishing_subjects)
+            sentences = self.phishing_sentences
+            domains = self.phishing_domains
+        else:
+            sender, sender_email = rng.choice(self.benign_senders)
+            subject = rng.choice(self.benign_subjects)
+            sentences = self.benign_sentences
+            domains = self.benign_domains
+
+        subject = subject.format(mes=self.months[date.month - 1], q=(date.month - 1) // 3 + 1)
+
+        # Corpo
+        lines = [f"Olá {rng.choice(self.first_names)},", ""]
+        for _ in range(rng.randint(*body_sentences)):
+            lines.append(rng.choice(sentences))
+            if rng.random() < pii_density:
+                lines.append(self._random_pii())
+
+        for _ in range(rng.randint(*urls_per_email)):
+            lines.append(self._random_url(domains))
+
+        lines.extend(["", "Atenciosamente,", sender])
+
+        return {
+            'subject': subject,
+            'sender': sender,
+            'sender_email': sender_email,
+            'date': date.strftime('%d/%m/%Y %H:%M'),
+            'body': '\n'.join(lines),
+            'has_attachments': rng.random() < attachment_ratio,
+            'message_id': f"synthetic_{self.seed}_{index}",
+            'read_at': date.isoformat(),
+            'expected_phishing': is_phishing
+        }
+
+    def _random_pii(self):
+        rng = self.rng
+        kind = rng.randint(0, 5)
+
+        if kind == 0:
+            return f"CPF: {rng.randint(100, 999)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}-{rng.randint(10, 99)}"
+        if kind == 1:
+            return f"Telefone: (11) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}"
+        if kind == 2:
+            name = f"{rng.choice(self.first_names).lower()}.{rng.choice(self.last_names).lower()}"
+            return f"Contato: {name}@empresa.com.br"
+        if kind == 3:
+            return f"Valor: R$ {rng.randint(10, 9999)},{rng.randint(10, 99)}"
+        if kind == 4:
+            return f"Vencimento: {rng.randint(10, 28)}/{rng.randint(10, 12)}/2024"
+        return f"CNPJ: {rng.randint(10, 99)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}/0001-{rng.randint(10, 99)}"
+
+    def _random_url(self, domains):
+        rng = self.rng
+        domain = rng.choice(domains)
+        path = rng.choice(['login', 'verificar', 'docs/relatorio', 'index.php?id=', 'conta/atualizar', 'u/'])
+        return f"https://{domain}/{path}{rng.randint(1, 99999)}"
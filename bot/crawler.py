@@ -0,0 +1,166 @@
+# bot/crawler.py
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def row_id(row):
+    """
+    Id de uma linha da lista: uma mensagem, não a conversa
+
+    A conversa com uma só mensagem usa o id da conversa (como antes); com
+    mais, o id leva o número de mensagens, para que uma resposta nova numa
+    conversa já analisada seja lida de novo.
+    """
+    return row.get('message_id') or row['thread_id']
+
+
+def default_mailbox():
+    """Nome da caixa lida pelo navegador (conta + inbox)"""
+    return f"{os.getenv('EMAIL_USER', 'u/0')}:inbox"
+
+
+class InboxCrawler:
+    """
+    Leitura incremental da caixa de entrada
+
+    Guarda no banco (mailbox_state) o último e-mail processado de cada caixa
+    e percorre as páginas da lista, do mais recente para o mais antigo, até
+    encontrar essa marca. Só a lista é lida aqui: todas as linhas novas vão
+    para o diário (work_journal), de onde o agendador tira um bloco por ciclo,
+    do mais antigo para o mais recente. Assim cada página é listada uma vez,
+    por maior que seja o atraso.
+
+    A marca só conta como encontrada depois de STOP_AFTER_KNOWN conversas
+    conhecidas seguidas: uma conversa antiga que subiu na lista por uma
+    resposta não encerra a varredura. Se a marca não aparecer em
+    MAX_PAGES_PER_CHECK páginas, a página onde a próxima varredura começa
+    (cursor_page) e os ids da marca (cursor_mark) ficam salvos, e as próximas
+    varreduras continuam dali até alcançá-la. Nelas só os ids da marca contam:
+    os e-mails salvos ou já no diário são apenas ignorados. Uma página que não carrega não é confundida com o fim da caixa: a
+    varredura para e o cursor fica nela.
+    """
+
+    RECENT_SIZE = 50
+
+    def __init__(self, reader, database, mailbox=None):
+        self.reader = reader
+        self.db = database
+        self.mailbox = mailbox or default_mailbox()
+        self.max_pages = int(os.getenv('MAX_PAGES_PER_CHECK', 20))
+        self.initial_pages = int(os.getenv('INITIAL_PAGES', 1))
+        self.stop_after_known = max(1, int(os.getenv('STOP_AFTER_KNOWN', 3)))
+        self.cursor_page = None
+        self.cursor_mark = None
+
+    def find_new(self, discovered=()):
+        """
+        Lista os e-mails ainda não processados
+
+        Args:
+            discovered: ids já registrados no diário (pendentes ou abandonados);
+                contam como conhecidos e não voltam na lista
+
+        Returns:
+            lista de linhas (thread_id, message_id, sender, subject), do mais antigo para o mais recente
+        """
+        state = self.db.get_mailbox_state(self.mailbox)
+        max_pages = self.max_pages if state else self.initial_pages
+        cursor = state.get('cursor_page') if state else None
+        mark = (state.get('cursor_mark') if cursor else state['recent_ids']) if state else []
+        known = set(mark or [])
+        needed = max(1, min(self.stop_after_known, len(known))) if cursor else self.stop_after_known
+
+        # Continuação de uma varredura que não alcançou a marca; o que já foi
+        # salvo é ignorado
+        first_page = cursor or 1
+
+        new_rows = []
+        seen = set()
+        streak = 0
+        reached_mark = False
+        last_page = first_page
+        failed_page = None
+
+        for page in range(first_page, first_page + max_pages):
+            rows = self.reader.list_inbox_page(page)
+            if rows is None:
+                # Página que não carregou não é o fim da caixa: a varredura
+                # para aqui e a próxima continua desta página
+                failed_page = page
+                break
+            last_page = page
+
+            # Página vazia ou repetida: fim da caixa de entrada
+            if not rows or row_id(rows[0]) in seen:
+                reached_mark = True
+                break
+
+            for row in rows:
+                message_id = row_id(row)
+                if message_id in seen:
+                    continue
+                seen.add(message_id)
+
+                if message_id in known or (
+                        not cursor and (message_id in discovered or self.db.email_exists(message_id))):
+                    streak += 1
+                    if streak >= needed:
+                        reached_mark = True
+                    continue
+                if cursor and (message_id in discovered or self.db.email_exists(message_id)):
+                    # Parte do atraso já listada ou processada
+                    continue
+
+                # Depois da marca só entram mensagens que nunca foram salvas
+                # (ex.: resposta nova numa conversa antiga)
+                streak = 0
+                new_rows.append(row)
+
+            # Termina a página onde a marca apareceu e para
+            if reached_mark:
+                break
+
+        self.cursor_page = None
+        self.cursor_mark = None
+        if state and not reached_mark:
+            # Ao avançar, a última página é relida, porque e-mails apagados
+            # puxam a lista para cima
+            if failed_page:
+                self.cursor_page = failed_page
+            else:
+                self.cursor_page = max(last_page, first_page + 1)
+            self.cursor_mark = list(known)
+            if failed_page:
+                logger.warning(
+                    f"⚠️ Página {failed_page} não carregou; "
+                    f"a próxima varredura continua da página {self.cursor_page}"
+                )
+            else:
+                logger.warning(
+                    f"⚠️ Marca não encontrada nas páginas {first_page}-{last_page}; "
+                    f"a próxima varredura continua da página {self.cursor_page}"
+                )
+
+        new_rows.reverse()
+        self._save_pending(state, len(new_rows))
+        return new_rows
+
+    def mark_processed(self, message_id, pending=0):
+        """Avança a marca para o e-mail recém-processado"""
+        state = self.db.get_mailbox_state(self.mailbox)
+        recent = state['recent_ids'] if state else []
+        recent = [message_id] + [i for i in recent if i != message_id]
+        cursor = state.get('cursor_page') if state else None
+
+        # Com varredura por terminar ainda há pendências, mesmo sem linhas listadas
+        if cursor:
+            pending = max(pending, 1)
+        self.db.save_mailbox_state(self.mailbox, message_id, recent[:self.RECENT_SIZE], pending)
+
+    def _save_pending(self, state, pending):
+        if state:
+            if self.cursor_page:
+                pending = max(pending, 1)
+            self.db.save_mailbox_cursor(self.mailbox, pending, self.cursor_page, self.cursor_mark)
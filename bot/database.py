@@ -1,19 +1,133 @@
 # bot/database.py
+import os
+import re
 import sqlite3
 import json
-from datetime import datetime
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+# Colunas que query_emails aceita na projeção ('reasons' vem da última análise)
+QUERY_COLUMNS = (
+    'id', 'message_id', 'mailbox', 'subject', 'sender', 'sender_email', 'sender_domain',
+    'email_date', 'body', 'has_attachments', 'phishing_score', 'is_phishing', 'risk_level',
+    'ruleset_version', 'label', 'read_at', 'created_at', 'updated_seq', 'reasons'
+)
+# Padrão: tudo menos o corpo
+DEFAULT_QUERY_COLUMNS = tuple(c for c in QUERY_COLUMNS if c != 'body')
+# Colunas lidas pelas consultas (conferidas no modo somente leitura)
+SCHEMA_COLUMNS = {
+    'emails': tuple(c for c in QUERY_COLUMNS if c != 'reasons'),
+    'phishing_analysis': ('email_id', 'reasons'),
+}
+
+
+def sender_domain(sender_email):
+    """Domínio do remetente em minúsculas ('' se não houver)"""
+    sender_email = (sender_email or '').strip().lower().rstrip('>')
+    return sender_email.rsplit('@', 1)[-1] if '@' in sender_email else ''
+
+
+_MONTHS = {
+    'jan': 1, 'fev': 2, 'feb': 2, 'mar': 3, 'abr': 4, 'apr': 4, 'mai': 5, 'may': 5, 'jun': 6,
+    'jul': 7, 'ago': 8, 'aug': 8, 'set': 9, 'sep': 9, 'out': 10, 'oct': 10, 'nov': 11,
+    'dez': 12, 'dec': 12,
+}
+# '12 de mai. de 2024 10:30' (Gmail em português) ou '12 May 2024, 10:30'
+_TEXT_DATE = re.compile(
+    r'(\d{1,2})(?:\s+de)?\s+([a-zç]{3})[a-zç]*\.?(?:\s+de)?\s+(\d{4})(?:[,\s]+(?:às\s+)?(\d{1,2}):(\d{2}))?',
+    re.IGNORECASE
+)
+
+
+def parse_email_date(text):
+    """
+    Data de envio no formato de created_at ('AAAA-MM-DD HH:MM:SS'), ou None
+    
+    Aceita o formato gravado pela importação e pelo corpus ('dd/mm/aaaa hh:mm'),
+    RFC 2822, ISO e o texto do Gmail com o ano ('12 de mai. de 2024 10:30').
+    Datas sem ano (e-mails recentes no Gmail) não são reconhecidas.
+    """
+    text = (text or '').strip()
+    if not text:
+        return None
+    
+    for fmt in ('%d/%m/%Y %H:%M', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(text, fmt).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            pass
+    
+    parsed = None
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(text)
+        except (TypeError, ValueError, IndexError):
+            match = _TEXT_DATE.search(text)
+            month = _MONTHS.get(match.group(2).lower()) if match else None
+            if month:
+                try:
+                    parsed = datetime(int(match.group(3)), month, int(match.group(1)),
+                                      int(match.group(4) or 0), int(match.group(5) or 0))
+                except ValueError:
+                    parsed = None
+    if parsed is None:
+        return None
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def reverse_domain(domain):
+    """Rótulos em ordem inversa ('mail.exemplo.com' → 'com.exemplo.mail'): subdomínios viram prefixo"""
+    return '.'.join(reversed(domain.split('.'))) if domain else ''
 
 
 class EmailDatabase:
     
-    def __init__(self, db_path="data/emails.db"):
+    def __init__(self, db_path="data/emails.db", read_only=False):
+        """
+        read_only: abre o banco somente leitura (URI mode=ro) e sem migrações,
+        para consultas que não devem alterar nem bloquear o banco do bot;
+        verifique o esquema com missing_schema()
+        """
         self.db_path = db_path
-        self.create_tables()
+        self.read_only = read_only
+        if not read_only:
+            self.create_tables()
+    
+    def _connect(self):
+        if self.read_only:
+            return sqlite3.connect(f"file:{quote(os.path.abspath(self.db_path))}?mode=ro", uri=True)
+        return sqlite3.connect(self.db_path)
+    
+    def missing_schema(self):
+        """Tabelas e colunas esperadas pelas consultas que o banco ainda não tem"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        missing = []
+        for table, columns in SCHEMA_COLUMNS.items():
+            cursor.execute(f'PRAGMA table_info({table})')
+            existing = {row[1] for row in cursor.fetchall()}
+            if not existing:
+                missing.append(table)
+            else:
+                missing += [f"{table}.{c}" for c in columns if c not in existing]
+        conn.close()
+        return missing
     
     def create_tables(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
+        # Bancos novos já nascem com vácuo incremental (ver bot/retention.py)
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        
         # Tabela de e-mails
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS emails (
@@ -73,31 +187,174 @@ class EmailDatabase:
             )
         ''')
         
+        # Marca d'água da leitura incremental por caixa de e-mail
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS mailbox_state (
+                mailbox TEXT PRIMARY KEY,
+                last_message_id TEXT,
+                recent_ids TEXT,
+                pending INTEGER DEFAULT 0,
+                updated_at TEXT
+            )
+        ''')
+        
+        # Anexos de cada e-mail
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS attachments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email_id INTEGER,
+                filename TEXT,
+                content_type TEXT,
+                file_type TEXT,
+                size INTEGER,
+                sha256 TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (email_id) REFERENCES emails(id)
+            )
+        ''')
+        
+        # Cache de hashes de anexos (veredito e ocorrências por arquivo)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS attachment_hashes (
+                sha256 TEXT PRIMARY KEY,
+                file_type TEXT,
+                size INTEGER,
+                verdict TEXT DEFAULT 'unknown',
+                source TEXT,
+                first_seen TEXT,
+                last_seen TEXT,
+                seen_count INTEGER DEFAULT 0
+            )
+        ''')
+        
+        # Migrações de bancos existentes
+        self._add_column(cursor, 'emails', 'ruleset_version', 'TEXT')
+        self._add_column(cursor, 'phishing_analysis', 'ruleset_version', 'TEXT')
+        # Revisão manual (1 = phishing, 0 = legítimo, NULL = não revisado)
+        self._add_column(cursor, 'emails', 'label', 'INTEGER')
+        self._add_column(cursor, 'emails', 'mailbox', 'TEXT')
+        # Varredura que não alcançou a marca: página onde continuar e ids da marca procurada
+        self._add_column(cursor, 'mailbox_state', 'cursor_page', 'INTEGER')
+        self._add_column(cursor, 'mailbox_state', 'cursor_mark', 'TEXT')
+        if self._add_column(cursor, 'emails', 'sender_domain', 'TEXT'):
+            cursor.execute('''
+                UPDATE emails SET sender_domain = lower(substr(sender_email, instr(sender_email, '@') + 1))
+                WHERE instr(sender_email, '@') > 0
+            ''')
+        # Domínio invertido: o filtro com subdomínios vira uma faixa no índice
+        if self._add_column(cursor, 'emails', 'sender_domain_rev', 'TEXT'):
+            cursor.execute("SELECT DISTINCT sender_domain FROM emails WHERE sender_domain != ''")
+            cursor.executemany('UPDATE emails SET sender_domain_rev = ? WHERE sender_domain = ?', [
+                (reverse_domain(domain), domain) for (domain,) in cursor.fetchall()
+            ])
+        
+        # Data de envio normalizada (idade na retenção)
+        if self._add_column(cursor, 'emails', 'sent_at', 'TEXT'):
+            cursor.execute("SELECT id, email_date FROM emails WHERE email_date != ''")
+            dates = [(parse_email_date(date), email_id) for email_id, date in cursor.fetchall()]
+            cursor.executemany('UPDATE emails SET sent_at = ? WHERE id = ?', [d for d in dates if d[0]])
+        
+        # Sequência de alterações: todo e-mail novo e toda mudança de veredito
+        # (gravação, rescore, revisão manual) recebe o próximo updated_seq,
+        # base da exportação incremental. Os gatilhos cobrem qualquer escritor.
+        if self._add_column(cursor, 'emails', 'updated_seq', 'INTEGER'):
+            cursor.execute('UPDATE emails SET updated_seq = id')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sequences (
+                name TEXT PRIMARY KEY,
+                value INTEGER
+            )
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO sequences (name, value)
+            SELECT 'emails', COALESCE(MAX(updated_seq), 0) FROM emails
+        ''')
+        bump = '''
+            BEGIN
+                UPDATE sequences SET value = value + 1 WHERE name = 'emails';
+                UPDATE emails SET updated_seq = (SELECT value FROM sequences WHERE name = 'emails')
+                WHERE id = NEW.id;
+            END
+        '''
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS emails_seq_insert AFTER INSERT ON emails {bump}')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS emails_seq_update
+            AFTER UPDATE OF phishing_score, is_phishing, risk_level, label ON emails
+            WHEN OLD.phishing_score IS NOT NEW.phishing_score OR OLD.is_phishing IS NOT NEW.is_phishing
+                OR OLD.risk_level IS NOT NEW.risk_level OR OLD.label IS NOT NEW.label
+            {bump}
+        ''')
+        
+        # message_id dos e-mails movidos para os arquivos mensais (não salvar de novo)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archived_ids (
+                message_id TEXT PRIMARY KEY,
+                month TEXT,
+                archived_at TEXT
+            )
+        ''')
+        
+        # Filtros de query_emails. Nos de igualdade (is_phishing, risk_level,
+        # mailbox) o índice (coluna, id) já entrega a página na ordem do id;
+        # nos de faixa (created_at, domínio com subdomínios) o índice limita
+        # as linhas lidas e a página é ordenada depois.
+        cursor.execute('DROP INDEX IF EXISTS idx_emails_sender_domain')
+        cursor.execute('DROP INDEX IF EXISTS idx_emails_created_at')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_phishing ON emails(is_phishing, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_risk ON emails(risk_level, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_sender_domain_rev ON emails(sender_domain_rev, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_created_at_id ON emails(created_at, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_mailbox ON emails(mailbox, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_age ON emails(COALESCE(sent_at, created_at))')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_updated_seq ON emails(updated_seq)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_phishing_analysis_email ON phishing_analysis(email_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_extracted_data_email ON extracted_data(email_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_attachments_email ON attachments(email_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_attachments_sha256 ON attachments(sha256)')
+        
         conn.commit()
         conn.close()
     
+    def _add_column(self, cursor, table, column, definition):
+        """Adiciona a coluna se ela ainda não existir. Retorna True se adicionou."""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            return True
+        return False
+    
+    @staticmethod
+    def _is_archived(cursor, message_id):
+        cursor.execute('SELECT 1 FROM archived_ids WHERE message_id = ?', (message_id,))
+        return cursor.fetchone() is not None
+    
     def email_exists(self, message_id):
-        conn = sqlite3.connect(self.db_path)
+        """O e-mail está no banco ou já foi movido para um arquivo mensal"""
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute('SELECT id FROM emails WHERE message_id = ?', (message_id,))
-        result = cursor.fetchone()
+        result = cursor.fetchone() is not None or self._is_archived(cursor, message_id)
         conn.close()
-        return result is not None
+        return result
     
     def save_email(self, email_data):
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
+            if self._is_archived(cursor, email_data.get('message_id', '')):
+                conn.close()
+                return -1
+            
             phishing_result = email_data.get('phishing_result', {})
             
             cursor.execute('''
                 INSERT INTO emails (
                     message_id, subject, sender, sender_email, email_date, 
                     body, has_attachments, phishing_score, is_phishing, 
-                    risk_level, read_at
+                    risk_level, read_at, ruleset_version, mailbox, sender_domain, sender_domain_rev, sent_at
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 email_data.get('message_id', ''),
                 email_data.get('subject', ''),
@@ -109,7 +366,12 @@ class EmailDatabase:
                 phishing_result.get('score', 0),
                 1 if phishing_result.get('is_phishing') else 0,
                 phishing_result.get('risk_level', 'SEGURO'),
-                email_data.get('read_at', datetime.now().isoformat())
+                email_data.get('read_at', datetime.now().isoformat()),
+                phishing_result.get('ruleset_version'),
+                email_data.get('mailbox'),
+                sender_domain(email_data.get('sender_email')),
+                reverse_domain(sender_domain(email_data.get('sender_email'))),
+                parse_email_date(email_data.get('date'))
             ))
             
             email_id = cursor.lastrowid
@@ -120,20 +382,20 @@ class EmailDatabase:
         except sqlite3.IntegrityError:
             return -1
         except Exception as e:
-            print(f"❌ Erro ao salvar: {e}")
+            logger.error(f"❌ Erro ao salvar: {e}")
             return -1
     
     def save_phishing_analysis(self, email_id, analysis):
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             cursor.execute('''
                 INSERT INTO phishing_analysis (
                     email_id, score, risk_level, is_phishing, 
-                    reasons, urls_found, analyzed_at
+                    reasons, urls_found, analyzed_at, ruleset_version
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 email_id,
                 analysis.get('score', 0),
@@ -141,17 +403,18 @@ class EmailDatabase:
                 1 if analysis.get('is_phishing') else 0,
                 json.dumps(analysis.get('reasons', []), ensure_ascii=False),
                 json.dumps(analysis.get('urls_found', []), ensure_ascii=False),
-                analysis.get('analyzed_at', datetime.now().isoformat())
+                analysis.get('analyzed_at', datetime.now().isoformat()),
+                analysis.get('ruleset_version')
             ))
             
             conn.commit()
             conn.close()
         except Exception as e:
-            print(f"❌ Erro ao salvar análise: {e}")
+            logger.error(f"❌ Erro ao salvar análise: {e}")
     
     def save_extracted_data(self, email_id, data_type, value):
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO extracted_data (email_id, data_type, value)
@@ -162,8 +425,340 @@ class EmailDatabase:
         except:
             pass
     
+    def _insert_attachments(self, cursor, rows):
+        """rows: lista de (email_id, anexo) — grava os anexos e atualiza o cache de hashes"""
+        now = datetime.now().isoformat()
+        cursor.executemany('''
+            INSERT INTO attachments (email_id, filename, content_type, file_type, size, sha256)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(
+            email_id, a.get('filename'), a.get('content_type'), a.get('file_type'), a.get('size'), a.get('sha256')
+        ) for email_id, a in rows])
+        
+        cursor.executemany('''
+            INSERT INTO attachment_hashes (sha256, file_type, size, first_seen, last_seen, seen_count)
+            VALUES (?, ?, ?, ?, ?, 1)
+            ON CONFLICT(sha256) DO UPDATE SET
+                file_type = excluded.file_type,
+                size = excluded.size,
+                first_seen = COALESCE(attachment_hashes.first_seen, excluded.first_seen),
+                last_seen = excluded.last_seen,
+                seen_count = attachment_hashes.seen_count + 1
+        ''', [(a.get('sha256'), a.get('file_type'), a.get('size'), now, now) for _, a in rows])
+    
+    def save_attachments(self, email_id, attachments):
+        if not attachments:
+            return
+        try:
+            conn = self._connect()
+            self._insert_attachments(conn.cursor(), [(email_id, a) for a in attachments])
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar anexos: {e}")
+    
+    def get_attachments(self, email_ids):
+        """Anexos de vários e-mails com o veredito atual do hash: {email_id: [anexo, ...]}"""
+        if not email_ids:
+            return {}
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        result = {}
+        email_ids = list(email_ids)
+        # Limite de parâmetros do SQLite por consulta
+        for start in range(0, len(email_ids), 500):
+            part = email_ids[start:start + 500]
+            cursor.execute(f'''
+                SELECT a.email_id, a.filename, a.content_type, a.file_type, a.size, a.sha256,
+                       COALESCE(h.verdict, 'unknown') AS verdict
+                FROM attachments a
+                LEFT JOIN attachment_hashes h ON h.sha256 = a.sha256
+                WHERE a.email_id IN ({','.join('?' * len(part))})
+                ORDER BY a.id
+            ''', part)
+            for row in cursor.fetchall():
+                result.setdefault(row['email_id'], []).append(dict(row))
+        conn.close()
+        return result
+    
+    def save_batch(self, items, mailbox=None):
+        """
+        Salva vários e-mails numa única transação
+        
+        items: lista de (email_data, analysis, extracted). E-mails com
+        message_id já existente são ignorados. mailbox é usado nos e-mails
+        que não trazem o próprio.
+        
+        Returns:
+            (salvos, ignorados)
+        """
+        conn = self._connect()
+        conn.execute('PRAGMA synchronous=NORMAL')
+        cursor = conn.cursor()
+        saved = 0
+        
+        try:
+            analyses = []
+            extracted_rows = []
+            attachment_rows = []
+            
+            for email_data, analysis, extracted in items:
+                if self._is_archived(cursor, email_data.get('message_id', '')):
+                    continue
+                
+                cursor.execute('''
+                    INSERT OR IGNORE INTO emails (
+                        message_id, subject, sender, sender_email, email_date, 
+                        body, has_attachments, phishing_score, is_phishing, 
+                        risk_level, read_at, ruleset_version, mailbox, sender_domain, sender_domain_rev, sent_at
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    email_data.get('message_id', ''),
+                    email_data.get('subject', ''),
+                    email_data.get('sender', ''),
+                    email_data.get('sender_email', ''),
+                    email_data.get('date', ''),
+                    email_data.get('body', ''),
+                    1 if email_data.get('has_attachments') else 0,
+                    analysis.get('score', 0),
+                    1 if analysis.get('is_phishing') else 0,
+                    analysis.get('risk_level', 'SEGURO'),
+                    email_data.get('read_at', datetime.now().isoformat()),
+                    analysis.get('ruleset_version'),
+                    email_data.get('mailbox', mailbox),
+                    sender_domain(email_data.get('sender_email')),
+                    reverse_domain(sender_domain(email_data.get('sender_email'))),
+                    parse_email_date(email_data.get('date'))
+                ))
+                
+                if cursor.rowcount != 1:
+                    continue
+                
+                email_id = cursor.lastrowid
+                saved += 1
+                
+                analyses.append((
+                    email_id,
+                    analysis.get('score', 0),
+                    analysis.get('risk_level', 'SEGURO'),
+                    1 if analysis.get('is_phishing') else 0,
+                    json.dumps(analysis.get('reasons', []), ensure_ascii=False),
+                    json.dumps(analysis.get('urls_found', []), ensure_ascii=False),
+                    analysis.get('analyzed_at', datetime.now().isoformat()),
+                    analysis.get('ruleset_version')
+                ))
+                
+                for data_type, values in (extracted or {}).items():
+                    for value in values:
+                        extracted_rows.append((email_id, data_type, value))
+                
+                for attachment in email_data.get('attachments') or []:
+                    attachment_rows.append((email_id, attachment))
+            
+            cursor.executemany('''
+                INSERT INTO phishing_analysis (
+                    email_id, score, risk_level, is_phishing, 
+                    reasons, urls_found, analyzed_at, ruleset_version
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', analyses)
+            
+            cursor.executemany('''
+                INSERT INTO extracted_data (email_id, data_type, value)
+                VALUES (?, ?, ?)
+            ''', extracted_rows)
+            
+            self._insert_attachments(cursor, attachment_rows)
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return saved, len(items) - saved
+    
+    def save_processed(self, email_data, analysis, extracted):
+        """
+        Salva um e-mail com análise, dados extraídos e anexos numa única transação
+        
+        Se o message_id já estiver no banco (ex.: gravação interrompida antes
+        desta versão), só as partes que faltam são gravadas; se já tiver sido
+        arquivado, nada é gravado. Erros são propagados: nada fica gravado
+        pela metade.
+        
+        Returns:
+            (email_id, True se o e-mail foi inserido agora); email_id é None
+            para e-mails arquivados
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        try:
+            if self._is_archived(cursor, email_data.get('message_id', '')):
+                return None, False
+            
+            cursor.execute('SELECT id FROM emails WHERE message_id = ?', (email_data.get('message_id', ''),))
+            row = cursor.fetchone()
+            inserted = row is None
+            
+            if inserted:
+                cursor.execute('''
+                    INSERT INTO emails (
+                        message_id, subject, sender, sender_email, email_date, 
+                        body, has_attachments, phishing_score, is_phishing, 
+                        risk_level, read_at, ruleset_version, mailbox, sender_domain, sender_domain_rev, sent_at
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    email_data.get('message_id', ''),
+                    email_data.get('subject', ''),
+                    email_data.get('sender', ''),
+                    email_data.get('sender_email', ''),
+                    email_data.get('date', ''),
+                    email_data.get('body', ''),
+                    1 if email_data.get('has_attachments') else 0,
+                    analysis.get('score', 0),
+                    1 if analysis.get('is_phishing') else 0,
+                    analysis.get('risk_level', 'SEGURO'),
+                    email_data.get('read_at', datetime.now().isoformat()),
+                    analysis.get('ruleset_version'),
+                    email_data.get('mailbox'),
+                    sender_domain(email_data.get('sender_email')),
+                    reverse_domain(sender_domain(email_data.get('sender_email'))),
+                    parse_email_date(email_data.get('date'))
+                ))
+                email_id = cursor.lastrowid
+                missing = {'phishing_analysis', 'extracted_data', 'attachments'}
+            else:
+                email_id = row[0]
+                missing = set()
+                for table in ('phishing_analysis', 'extracted_data', 'attachments'):
+                    cursor.execute(f'SELECT 1 FROM {table} WHERE email_id = ? LIMIT 1', (email_id,))
+                    if cursor.fetchone() is None:
+                        missing.add(table)
+            
+            if 'phishing_analysis' in missing:
+                cursor.execute('''
+                    INSERT INTO phishing_analysis (
+                        email_id, score, risk_level, is_phishing, 
+                        reasons, urls_found, analyzed_at, ruleset_version
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    email_id,
+                    analysis.get('score', 0),
+                    analysis.get('risk_level', 'SEGURO'),
+                    1 if analysis.get('is_phishing') else 0,
+                    json.dumps(analysis.get('reasons', []), ensure_ascii=False),
+                    json.dumps(analysis.get('urls_found', []), ensure_ascii=False),
+                    analysis.get('analyzed_at', datetime.now().isoformat()),
+                    analysis.get('ruleset_version')
+                ))
+            
+            if 'extracted_data' in missing:
+                cursor.executemany('''
+                    INSERT INTO extracted_data (email_id, data_type, value)
+                    VALUES (?, ?, ?)
+                ''', [
+                    (email_id, data_type, value)
+                    for data_type, values in (extracted or {}).items() for value in values
+                ])
+            
+            if 'attachments' in missing:
+                self._insert_attachments(cursor, [(email_id, a) for a in email_data.get('attachments') or []])
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return email_id, inserted
+    
+    def is_complete(self, message_id):
+        """O e-mail já está salvo com a análise (gravação concluída) ou foi arquivado"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT 1 FROM emails e JOIN phishing_analysis p ON p.email_id = e.id
+            WHERE e.message_id = ? LIMIT 1
+        ''', (message_id,))
+        result = cursor.fetchone() is not None or self._is_archived(cursor, message_id)
+        conn.close()
+        return result
+    
+    def set_label(self, email_id, label):
+        """Registra a revisão manual de um e-mail (usada no treino do classificador)"""
+        conn = self._connect()
+        conn.execute(
+            'UPDATE emails SET label = ? WHERE id = ?',
+            (None if label is None else (1 if label else 0), email_id)
+        )
+        conn.commit()
+        conn.close()
+    
+    def get_mailbox_state(self, mailbox):
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT last_message_id, recent_ids, pending, updated_at, cursor_page, cursor_mark '
+            'FROM mailbox_state WHERE mailbox = ?',
+            (mailbox,)
+        )
+        row = cursor.fetchone()
+        conn.close()
+        
+        if not row:
+            return None
+        
+        return {
+            'last_message_id': row[0],
+            'recent_ids': json.loads(row[1] or '[]'),
+            'pending': row[2],
+            'updated_at': row[3],
+            'cursor_page': row[4],
+            'cursor_mark': json.loads(row[5]) if row[5] else None
+        }
+    
+    def save_mailbox_state(self, mailbox, last_message_id, recent_ids, pending=0):
+        """
+        Grava a marca da caixa (último processado e ids recentes)
+        
+        Não mexe no cursor da varredura: a marca é gravada pela thread de
+        gravação do pipeline e o cursor pela de leitura, ao mesmo tempo.
+        """
+        conn = self._connect()
+        conn.execute('''
+            INSERT INTO mailbox_state (mailbox, last_message_id, recent_ids, pending, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(mailbox) DO UPDATE SET
+                last_message_id = excluded.last_message_id,
+                recent_ids = excluded.recent_ids,
+                pending = excluded.pending,
+                updated_at = excluded.updated_at
+        ''', (mailbox, last_message_id, json.dumps(recent_ids), pending, datetime.now().isoformat()))
+        conn.commit()
+        conn.close()
+    
+    def save_mailbox_cursor(self, mailbox, pending, cursor_page=None, cursor_mark=None):
+        """Grava a continuação da varredura (None: a marca foi alcançada)"""
+        conn = self._connect()
+        conn.execute(
+            'UPDATE mailbox_state SET pending = ?, cursor_page = ?, cursor_mark = ?, updated_at = ? '
+            'WHERE mailbox = ?',
+            (pending, cursor_page, json.dumps(cursor_mark) if cursor_page else None,
+             datetime.now().isoformat(), mailbox)
+        )
+        conn.commit()
+        conn.close()
+    
     def get_phishing_emails(self, limit=50):
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute('''
             SELECT e.*, p.reasons 
@@ -177,8 +772,145 @@ class EmailDatabase:
         conn.close()
         return emails
     
+    def query_emails(self, columns=None, phishing=None, risk_levels=None, since=None, until=None,
+                     sender_domain=None, mailbox=None, after_id=None, after_seq=None, limit=100,
+                     descending=False):
+        """
+        Uma página de e-mails com paginação por chave (id, ou updated_seq com after_seq)
+        
+        Args:
+            columns: colunas de QUERY_COLUMNS (padrão: todas menos o corpo)
+            phishing: True/False filtra por is_phishing
+            risk_levels: lista de níveis (ex.: ['ALTO', 'CRÍTICO'])
+            since/until: intervalo de created_at ('2024-05-01' ou ISO), until exclusivo
+            sender_domain: domínio do remetente (inclui subdomínios)
+            mailbox: caixa de origem
+            after_id: id do último registro da página anterior
+            after_seq: só e-mails novos ou com veredito alterado depois desta
+                sequência, em ordem de alteração (exportação incremental)
+            descending: mais recentes primeiro (after_id passa a ser o limite superior)
+        
+        Returns:
+            lista de dicts; o 'id' (ou 'updated_seq') do último é o after_id
+            (ou after_seq) da próxima página
+        """
+        columns = list(columns or DEFAULT_QUERY_COLUMNS)
+        unknown = [c for c in columns if c not in QUERY_COLUMNS]
+        if unknown:
+            raise ValueError(f"Colunas inválidas: {', '.join(unknown)}")
+        # Chave da paginação
+        key = 'id' if after_seq is None else 'updated_seq'
+        if key not in columns:
+            columns.insert(0, key)
+        
+        select = [
+            '(SELECT p.reasons FROM phishing_analysis p WHERE p.email_id = e.id '
+            'ORDER BY p.id DESC LIMIT 1) AS reasons' if c == 'reasons' else f'e.{c}'
+            for c in columns
+        ]
+        
+        conditions, params = [], []
+        if phishing is not None:
+            conditions.append('e.is_phishing = ?')
+            params.append(1 if phishing else 0)
+        if risk_levels:
+            conditions.append(f"e.risk_level IN ({','.join('?' * len(risk_levels))})")
+            params += list(risk_levels)
+        # created_at é gravado como 'AAAA-MM-DD HH:MM:SS'
+        if since:
+            conditions.append('e.created_at >= ?')
+            params.append(since.replace('T', ' '))
+        if until:
+            conditions.append('e.created_at < ?')
+            params.append(until.replace('T', ' '))
+        if sender_domain:
+            # 'com.exemplo' e 'com.exemplo.*' ficam na faixa ['com.exemplo', 'com.exemplo/')
+            # ('/' vem logo depois de '.'); o resto da condição tira 'com.exemplo-x'
+            domain = reverse_domain(sender_domain.lower().lstrip('@'))
+            conditions.append('e.sender_domain_rev >= ? AND e.sender_domain_rev < ? '
+                              'AND (e.sender_domain_rev = ? OR e.sender_domain_rev >= ?)')
+            params += [domain, f'{domain}/', domain, f'{domain}.']
+        if mailbox:
+            conditions.append('e.mailbox = ?')
+            params.append(mailbox)
+        if after_id is not None:
+            conditions.append('e.id < ?' if descending else 'e.id > ?')
+            params.append(after_id)
+        if after_seq is not None:
+            conditions.append('e.updated_seq < ?' if descending else 'e.updated_seq > ?')
+            params.append(after_seq)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        order = 'DESC' if descending else 'ASC'
+        
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {', '.join(select)} FROM emails e {where}
+            ORDER BY e.{key} {order}
+            LIMIT ?
+        ''', params + [limit])
+        rows = [dict(row) for row in cursor]
+        conn.close()
+        return rows
+    
+    def iter_emails(self, page_size=500, limit=None, **filters):
+        """
+        Percorre o resultado de query_emails página por página
+        
+        Cada página é uma consulta curta (não segura o banco durante a
+        exportação inteira) e só uma página fica na memória por vez.
+        """
+        # Com after_seq a chave é updated_seq (ordem de alteração)
+        if filters.get('after_seq') is not None:
+            key, param = 'updated_seq', 'after_seq'
+        else:
+            key, param = 'id', 'after_id'
+        position = filters.pop(param, None)
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            page = self.query_emails(limit=size, **{param: position}, **filters)
+            yield from page
+            if len(page) < size:
+                return
+            position = page[-1][key]
+            if remaining is not None:
+                remaining -= len(page)
+    
+    def search_emails(self, text=None, phishing_only=False, limit=50):
+        """
+        Busca por trecho no assunto, remetente ou corpo (mais recentes primeiro)
+        
+        Returns:
+            lista de dicts sem o corpo
+        """
+        conditions, params = [], []
+        if text:
+            pattern = f"%{text}%"
+            conditions.append('(subject LIKE ? OR sender LIKE ? OR sender_email LIKE ? OR body LIKE ?)')
+            params += [pattern] * 4
+        if phishing_only:
+            conditions.append('is_phishing = 1')
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, message_id, subject, sender, sender_email, email_date,
+                   phishing_score, is_phishing, risk_level, created_at
+            FROM emails {where}
+            ORDER BY id DESC
+            LIMIT ?
+        ''', params + [limit])
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return rows
+    
     def get_stats(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT COUNT(*) FROM emails')
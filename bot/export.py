@@ -0,0 +1,80 @@
+# bot/export.py
+"""
+Exportação em fluxo dos resultados para CSV e JSON Lines
+
+As linhas vêm de EmailDatabase.iter_emails (paginação por chave) e são
+escritas uma a uma: a memória usada não depende do tamanho do resultado.
+"""
+import csv
+import json
+
+
+def _decode_reasons(row):
+    if row.get('reasons'):
+        try:
+            row['reasons'] = json.loads(row['reasons'])
+        except ValueError:
+            pass
+    return row
+
+
+def write_jsonl(rows, out, columns=None):
+    """Um objeto JSON por linha ('reasons' como lista). Retorna a quantidade."""
+    count = 0
+    for row in rows:
+        out.write(json.dumps(_decode_reasons(row), ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def write_csv(rows, out, columns):
+    """CSV com cabeçalho fixo em columns. Retorna a quantidade."""
+    writer = csv.DictWriter(out, fieldnames=list(columns), extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+EXPORTERS = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+}
+
+
+def export(db, out, fmt='jsonl', columns=None, page_size=500, limit=None, **filters):
+    """
+    Exporta o resultado de db.iter_emails(**filters) para o arquivo aberto out
+
+    Com after_seq a exportação segue a ordem de alteração (updated_seq):
+    entram os e-mails novos e os que mudaram de veredito (rescore, revisão
+    manual) desde a última exportação.
+    
+    Returns:
+        (quantidade, id, ou updated_seq com after_seq, do último registro
+        exportado ou None)
+    """
+    from bot.database import QUERY_COLUMNS, DEFAULT_QUERY_COLUMNS
+
+    columns = list(columns or DEFAULT_QUERY_COLUMNS)
+    # Validar antes de escrever o cabeçalho
+    unknown = [c for c in columns if c not in QUERY_COLUMNS]
+    if unknown:
+        raise ValueError(f"Colunas inválidas: {', '.join(unknown)}")
+    key = 'id' if filters.get('after_seq') is None else 'updated_seq'
+    for column in ('id', key):
+        if column not in columns:
+            columns.insert(0, column)
+
+    last = {key: None}
+
+    def track(rows):
+        for row in rows:
+            last[key] = row[key]
+            yield row
+
+    rows = db.iter_emails(page_size=page_size, limit=limit, columns=columns, **filters)
+    count = EXPORTERS[fmt](track(rows), out, columns)
+    return count, last[key]
@@ -0,0 +1,420 @@
+# bot/ingest.py
+"""
+Importação offline de arquivos de e-mail (mbox, diretório de .eml ou Maildir)
+
+Uso:
+    python -m bot.ingest arquivo.mbox
+    python -m bot.ingest pasta_com_emls/ --workers 8
+    python -m bot.ingest ~/Maildir --format maildir
+    python -m bot.ingest arquivo.mbox --restart     # ignora o checkpoint
+
+As mensagens são lidas em sequência, convertidas (MIME) para o mesmo dict
+produzido pelo EmailReader, analisadas e extraídas num pool de processos e
+gravadas em lotes grandes com EmailDatabase.save_batch. O progresso é salvo
+por origem na tabela ingest_checkpoint; mensagens repetidas são ignoradas
+pelo message_id.
+"""
+import os
+import re
+import sys
+import html
+import time
+import email
+import sqlite3
+import hashlib
+import logging
+import mailbox
+import argparse
+from collections import deque
+from datetime import datetime
+from email.header import decode_header, make_header
+from email.utils import parseaddr, parsedate_to_datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from bot.attachments import inspect_bytes
+from bot.database import EmailDatabase
+
+logger = logging.getLogger(__name__)
+
+_detector = None
+_extractor = None
+_attachment_cache = None
+
+
+# ===== CONVERSÃO MIME =====
+
+def html_to_text(content):
+    """Converte HTML em texto simples (suficiente para a análise)"""
+    content = re.sub(r'(?is)<(script|style).*?</\1>', ' ', content)
+    content = re.sub(r'(?i)<br\s*/?>|</p>|</div>|</tr>', '\n', content)
+    content = re.sub(r'(?i)<a\s[^>]*href=["\']([^"\']+)["\'][^>]*>', r' \1 ', content)
+    content = re.sub(r'<[^>]+>', ' ', content)
+    content = html.unescape(content)
+    content = re.sub(r'[ \t\r\f\v]+', ' ', content)
+    return re.sub(r'\n\s*\n+', '\n\n', content).strip()
+
+
+def _decode_header(value):
+    """Decodifica cabeçalhos RFC 2047 (=?utf-8?b?...?=)"""
+    if not value:
+        return ''
+    try:
+        return str(make_header(decode_header(str(value))))
+    except Exception:
+        return str(value)
+
+
+def _decode_part(part):
+    payload = part.get_payload(decode=True) or b''
+    charset = part.get_content_charset() or 'utf-8'
+    try:
+        return payload.decode(charset, errors='replace')
+    except LookupError:
+        return payload.decode('utf-8', errors='replace')
+
+
+def message_to_content(raw):
+    """Converte uma mensagem RFC 822 (bytes) no dict usado pelo pipeline"""
+    # Parser compat32: bem mais rápido que policy.default para importação em massa
+    msg = email.message_from_bytes(raw)
+
+    name, address = parseaddr(_decode_header(msg.get('From', '')))
+
+    date = str(msg.get('Date', '') or '')
+    try:
+        date = parsedate_to_datetime(date).strftime('%d/%m/%Y %H:%M')
+    except Exception:
+        pass
+
+    plain = []
+    html_parts = []
+    attachments = []
+
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+
+        if part.get_content_disposition() == 'attachment' or part.get_filename():
+            attachments.append(inspect_bytes(
+                part.get_payload(decode=True) or b'',
+                _decode_header(part.get_filename()),
+                part.get_content_type()
+            ))
+            continue
+
+        content_type = part.get_content_type()
+        if content_type == 'text/plain':
+            plain.append(_decode_part(part))
+        elif content_type == 'text/html':
+            html_parts.append(_decode_part(part))
+
+    if plain:
+        body = '\n'.join(plain).strip()
+    else:
+        body = html_to_text('\n'.join(html_parts))
+
+    message_id = str(msg.get('Message-ID', '') or '').strip()
+    if not message_id:
+        message_id = f"sha256:{hashlib.sha256(raw).hexdigest()}"
+
+    return {
+        'subject': _decode_header(msg.get('Subject', '')),
+        'sender': name or address,
+        'sender_email': address,
+        'date': date,
+        'body': body,
+        'has_attachments': bool(attachments),
+        'attachments': attachments,
+        'message_id': message_id,
+        'read_at': datetime.now().isoformat()
+    }
+
+
+# ===== PROCESSOS DO POOL =====
+
+def _init_worker(db_path):
+    global _detector, _extractor, _attachment_cache
+    from bot.attachments import AttachmentCache
+    from bot.extrair import EmailExtractor
+    from bot.phishing import PhishingDetector
+
+    _detector = PhishingDetector()
+    _extractor = EmailExtractor()
+    _attachment_cache = AttachmentCache(db_path)
+
+
+def _process_chunk(raws):
+    """Converte, analisa e extrai um bloco de mensagens"""
+    contents = []
+    errors = 0
+
+    for raw in raws:
+        try:
+            contents.append(message_to_content(raw))
+        except Exception:
+            errors += 1
+
+    # Vereditos já conhecidos dos hashes dos anexos
+    _attachment_cache.annotate([a for c in contents for a in c['attachments']])
+
+    results = []
+    for content, analysis in zip(contents, _detector.analyze_batch(contents)):
+        extracted = _extractor.extract_all(content.get('body', ''))
+        results.append((content, analysis, extracted))
+
+    return results, errors
+
+
+# ===== ORIGENS =====
+
+class MessageSource:
+    """Lê mensagens de mbox, Maildir ou diretório de .eml em ordem estável"""
+
+    def __init__(self, path, fmt='auto'):
+        self.path = os.path.abspath(path)
+        self.format = self._detect_format(fmt)
+
+    def _detect_format(self, fmt):
+        if fmt != 'auto':
+            return fmt
+        if os.path.isfile(self.path):
+            return 'eml' if self.path.lower().endswith('.eml') else 'mbox'
+        if all(os.path.isdir(os.path.join(self.path, d)) for d in ('cur', 'new', 'tmp')):
+            return 'maildir'
+        return 'eml'
+
+    def _eml_files(self):
+        if os.path.isfile(self.path):
+            return [self.path]
+
+        files = []
+        for root, dirs, names in os.walk(self.path):
+            dirs.sort()
+            for name in sorted(names):
+                if name.lower().endswith('.eml'):
+                    files.append(os.path.join(root, name))
+        return files
+
+    def count(self):
+        """
+        Total de mensagens, ou None para mbox
+
+        Contar um mbox exige ler o arquivo inteiro; a importação o lê uma vez só.
+        """
+        if self.format == 'mbox':
+            return None
+        if self.format == 'maildir':
+            return len(mailbox.Maildir(self.path, factory=None, create=False))
+        return len(self._eml_files())
+
+    def iter_raw(self, skip=0):
+        """Gera os bytes de cada mensagem, pulando as `skip` primeiras"""
+        if self.format == 'mbox':
+            yield from self._iter_mbox(skip)
+            return
+
+        if self.format == 'maildir':
+            box = mailbox.Maildir(self.path, factory=None, create=False)
+            try:
+                for key in sorted(box.keys())[skip:]:
+                    yield box.get_bytes(key)
+            finally:
+                box.close()
+            return
+
+        for path in self._eml_files()[skip:]:
+            with open(path, 'rb') as f:
+                yield f.read()
+
+    def _iter_mbox(self, skip):
+        """
+        Lê o mbox numa única passada, sem o índice do módulo mailbox
+
+        Mesmas fronteiras do mailbox.mbox: cada linha 'From ' abre uma
+        mensagem, que não inclui essa linha nem a linha em branco que a
+        separa da seguinte.
+        """
+        index = -1
+        lines = []
+        last_was_empty = False
+
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if line.startswith(b'From '):
+                    if index >= skip:
+                        yield b''.join(lines[:-1] if last_was_empty else lines)
+                    index += 1
+                    lines = []
+                    last_was_empty = False
+                    continue
+
+                if index >= skip:
+                    lines.append(line)
+                last_was_empty = line == b'\n'
+
+        if index >= skip:
+            yield b''.join(lines)
+
+
+# ===== IMPORTAÇÃO =====
+
+class MailIngestor:
+    """Importa arquivos de e-mail para o banco com análise em paralelo"""
+
+    def __init__(self, db_path="data/emails.db", workers=None, batch_size=2000, chunk_size=100):
+        self.db = EmailDatabase(db_path)
+        self.db_path = db_path
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.create_tables()
+
+    def create_tables(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ingest_checkpoint (
+                source TEXT PRIMARY KEY,
+                position INTEGER DEFAULT 0,
+                imported INTEGER DEFAULT 0,
+                skipped INTEGER DEFAULT 0,
+                errors INTEGER DEFAULT 0,
+                updated_at TEXT,
+                finished_at TEXT
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def get_checkpoint(self, source):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT position, imported, skipped, errors, finished_at
+            FROM ingest_checkpoint WHERE source = ?
+        ''', (source,))
+        row = cursor.fetchone()
+        conn.close()
+
+        if not row:
+            return {'position': 0, 'imported': 0, 'skipped': 0, 'errors': 0, 'finished_at': None}
+        return dict(zip(('position', 'imported', 'skipped', 'errors', 'finished_at'), row))
+
+    def save_checkpoint(self, source, state, finished=False):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            INSERT OR REPLACE INTO ingest_checkpoint
+                (source, position, imported, skipped, errors, updated_at, finished_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            source, state['position'], state['imported'], state['skipped'], state['errors'],
+            datetime.now().isoformat(), datetime.now().isoformat() if finished else None
+        ))
+        conn.commit()
+        conn.close()
+
+    def _batches(self, raws):
+        batch = []
+        for raw in raws:
+            batch.append(raw)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _submit(self, pool, batch):
+        chunks = [batch[i:i + self.chunk_size] for i in range(0, len(batch), self.chunk_size)]
+        return len(batch), [pool.submit(_process_chunk, chunk) for chunk in chunks]
+
+    def ingest(self, path, fmt='auto', restart=False):
+        """Importa uma origem. Retorna o estado final do checkpoint."""
+        source = MessageSource(path, fmt)
+        key = f"{source.format}:{source.path}"
+
+        state = self.get_checkpoint(key)
+        if restart:
+            state = {'position': 0, 'imported': 0, 'skipped': 0, 'errors': 0, 'finished_at': None}
+        elif state['finished_at']:
+            logger.info(f"✅ {path} já importado em {state['finished_at']}")
+            return state
+
+        total = source.count()
+        logger.info(f"📥 Importando {total if total is not None else 'as'} mensagens de {path} ({source.format})")
+        if state['position']:
+            logger.info(f"↩️ Retomando da mensagem {state['position']}")
+
+        started = time.perf_counter()
+        done_now = 0
+        pending = deque()
+
+        def write(count, futures):
+            nonlocal done_now
+            items = []
+            for future in futures:
+                results, errors = future.result()
+                items.extend(results)
+                state['errors'] += errors
+
+            saved, skipped = self.db.save_batch(items, mailbox=key)
+            state['imported'] += saved
+            state['skipped'] += skipped
+            state['position'] += count
+            self.save_checkpoint(key, state)
+
+            done_now += count
+            elapsed = time.perf_counter() - started
+            rate = done_now / elapsed if elapsed else 0
+            if total is None:
+                progress, eta = f"{state['position']}", ''
+            else:
+                remaining = (total - state['position']) / rate if rate else 0
+                progress, eta = f"{state['position']}/{total}", f" | restante ~{remaining:.0f}s"
+            logger.info(
+                f"   {progress} | {state['imported']} novos | "
+                f"{state['skipped']} repetidos | {state['errors']} erros | "
+                f"{rate:.0f} msg/s{eta}"
+            )
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.db_path,)) as pool:
+            # Mantém no máximo dois lotes em processamento (memória limitada)
+            for batch in self._batches(source.iter_raw(skip=state['position'])):
+                pending.append(self._submit(pool, batch))
+                if len(pending) >= 2:
+                    write(*pending.popleft())
+
+            while pending:
+                write(*pending.popleft())
+
+        self.save_checkpoint(key, state, finished=True)
+        logger.info(
+            f"✅ Importação concluída: {state['imported']} novos, "
+            f"{state['skipped']} repetidos, {state['errors']} erros"
+        )
+        return state
+
+
+def main(argv=None):
+    from bot.logger import setup_logging
+
+    parser = argparse.ArgumentParser(description='Importa e-mails de mbox, .eml ou Maildir')
+    parser.add_argument('paths', nargs='+', help='Arquivos mbox, diretórios de .eml ou Maildir')
+    parser.add_argument('--format', choices=['auto', 'mbox', 'maildir', 'eml'], default='auto')
+    parser.add_argument('--db', default='data/emails.db')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--restart', action='store_true', help='Ignora o checkpoint e reimporta')
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    ingestor = MailIngestor(args.db, workers=args.workers, batch_size=args.batch_size)
+    for path in args.paths:
+        ingestor.ingest(path, fmt=args.format, restart=args.restart)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+# bot/journal.py
+import json
+import sqlite3
+import logging
+from datetime import datetime
+
+from bot.crawler import row_id
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('discovered', 'scraped', 'analyzed', 'saved')
+
+
+class WorkJournal:
+    """
+    Diário persistente do trabalho de cada ciclo (tabela work_journal)
+
+    Guarda todas as linhas novas encontradas na caixa (o atraso inteiro, não
+    só o bloco do ciclo), e o agendador tira delas um bloco por ciclo.
+    Cada e-mail passa por
+        discovered → scraped → analyzed → saved
+    e cada etapa é gravada junto com o que ela produziu (conteúdo lido no
+    navegador, resultado da análise). O resultado da análise é gravado pela
+    thread de gravação do pipeline, antes do e-mail. Quando a marca da
+    caixa avança, a linha sai do diário: ele guarda só o trabalho em aberto.
+
+    Se o processo cair no meio do ciclo, a próxima execução retoma cada
+    e-mail da última etapa concluída, sem abrir o navegador para o que já
+    foi lido e sem percorrer a caixa de novo.
+
+    E-mails abandonados depois de falhar repetidamente vão para a tabela
+    failed_emails, com o conteúdo lido e o último erro, para revisão.
+
+    Também guarda as estatísticas do agendador (tabela scheduler_state).
+    """
+
+    def __init__(self, db_path="data/emails.db", mailbox="inbox"):
+        self.db_path = db_path
+        self.mailbox = mailbox
+        self.create_tables()
+
+    def create_tables(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS work_journal (
+                message_id TEXT PRIMARY KEY,
+                mailbox TEXT,
+                seq INTEGER,
+                stage TEXT DEFAULT 'discovered',
+                row TEXT,
+                content TEXT,
+                result TEXT,
+                attempts INTEGER DEFAULT 0,
+                updated_at TEXT
+            )
+        ''')
+        # Diários criados antes da contagem de tentativas
+        cursor.execute('PRAGMA table_info(work_journal)')
+        if 'attempts' not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE work_journal ADD COLUMN attempts INTEGER DEFAULT 0')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_work_journal_mailbox ON work_journal(mailbox, seq)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS failed_emails (
+                message_id TEXT PRIMARY KEY,
+                mailbox TEXT,
+                row TEXT,
+                content TEXT,
+                error TEXT,
+                failed_at TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scheduler_state (
+                name TEXT PRIMARY KEY,
+                stats TEXT,
+                updated_at TEXT
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _execute(self, sql, params):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(sql, params)
+        conn.commit()
+        conn.close()
+
+    def discover(self, rows):
+        """Registra as linhas encontradas na lista (as já registradas mantêm a etapa)"""
+        if not rows:
+            return
+        now = datetime.now().isoformat()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM work_journal WHERE mailbox = ?', (self.mailbox,))
+        seq = cursor.fetchone()[0]
+        cursor.executemany('''
+            INSERT OR IGNORE INTO work_journal (message_id, mailbox, seq, row, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (row_id(row), self.mailbox, seq + i + 1, json.dumps(row, ensure_ascii=False), now)
+            for i, row in enumerate(rows)
+        ])
+        conn.commit()
+        conn.close()
+
+    def attempt(self, message_id):
+        """Conta mais uma tentativa de concluir o e-mail (persiste entre reinícios)"""
+        self._execute(
+            'UPDATE work_journal SET attempts = attempts + 1, updated_at = ? WHERE message_id = ?',
+            (datetime.now().isoformat(), message_id)
+        )
+
+    def scraped(self, message_id, content):
+        """Guarda o conteúdo lido no navegador"""
+        self._execute(
+            "UPDATE work_journal SET stage = 'scraped', content = ?, updated_at = ? WHERE message_id = ?",
+            (json.dumps(content, ensure_ascii=False), datetime.now().isoformat(), message_id)
+        )
+
+    def analyzed(self, message_id, result):
+        """Guarda (analysis, extracted); None se o e-mail já estava no banco"""
+        self._execute(
+            "UPDATE work_journal SET stage = 'analyzed', result = ?, updated_at = ? WHERE message_id = ?",
+            (json.dumps(result, ensure_ascii=False), datetime.now().isoformat(), message_id)
+        )
+
+    def saved(self, message_id):
+        self._execute(
+            "UPDATE work_journal SET stage = 'saved', content = NULL, result = NULL, updated_at = ? "
+            "WHERE message_id = ?",
+            (datetime.now().isoformat(), message_id)
+        )
+
+    def done(self, message_id):
+        """A marca da caixa passou deste e-mail: remove do diário"""
+        self._execute('DELETE FROM work_journal WHERE message_id = ?', (message_id,))
+
+    def failed(self, message_id, row, content, error):
+        """Registra um e-mail abandonado (a marca da caixa passa dele)"""
+        self._execute('''
+            INSERT OR REPLACE INTO failed_emails (message_id, mailbox, row, content, error, failed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            message_id, self.mailbox, json.dumps(row, ensure_ascii=False),
+            json.dumps(content, ensure_ascii=False, default=str) if content else None,
+            str(error), datetime.now().isoformat()
+        ))
+
+    def known_ids(self):
+        """Ids já registrados nesta caixa: pendentes no diário ou abandonados"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT message_id FROM work_journal WHERE mailbox = ?
+            UNION SELECT message_id FROM failed_emails WHERE mailbox = ?
+        ''', (self.mailbox, self.mailbox))
+        ids = {row[0] for row in cursor.fetchall()}
+        conn.close()
+        return ids
+
+    def pending(self):
+        """
+        Trabalho em aberto, na ordem em que foi encontrado
+
+        Returns:
+            lista de dicts com row, stage, content, result (None se a etapa
+            ainda não foi concluída) e attempts (ciclos que já tentaram concluí-lo)
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT row, stage, content, result, attempts FROM work_journal
+            WHERE mailbox = ? ORDER BY seq
+        ''', (self.mailbox,))
+        rows = cursor.fetchall()
+        conn.close()
+
+        entries = []
+        for row, stage, content, result, attempts in rows:
+            result = json.loads(result) if result else None
+            entries.append({
+                'row': json.loads(row),
+                'stage': stage,
+                'content': json.loads(content) if content else None,
+                # JSON devolve listas; o pipeline espera a tupla (analysis, extracted)
+                'result': tuple(result) if result else None,
+                'attempts': attempts or 0
+            })
+        return entries
+
+    def load_stats(self, name='scheduler'):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT stats FROM scheduler_state WHERE name = ?', (name,))
+        row = cursor.fetchone()
+        conn.close()
+        return json.loads(row[0]) if row else {}
+
+    def save_stats(self, stats, name='scheduler'):
+        try:
+            self._execute(
+                'INSERT OR REPLACE INTO scheduler_state (name, stats, updated_at) VALUES (?, ?, ?)',
+                (name, json.dumps(stats, ensure_ascii=False), datetime.now().isoformat())
+            )
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar estatísticas: {e}")
@@ -1,22 +1,60 @@
 # bot/ler_email.py
 import os
+import re
 import time
+import logging
 from datetime import datetime
 from playwright.sync_api import sync_playwright
 from dotenv import load_dotenv
 
+from bot.attachments import inspect_file
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Botão de download dentro do cartão de anexo (interface em português ou inglês)
+DOWNLOAD_BUTTON = (
+    '[aria-label^="Fazer o download"], [aria-label^="Baixar"], [aria-label^="Download"], '
+    '[data-tooltip^="Fazer o download"], [data-tooltip^="Baixar"], [data-tooltip^="Download"]'
+)
+
 
 class EmailReader:
     
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, record_dir=None):
         self.headless = headless
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
         self.user_data_dir = os.path.join(os.getcwd(), "browser_session")
+        # Multiplicador das esperas entre ações (0 no modo replay)
+        self.delay_factor = 1.0
+        # Se definido, salva o HTML das páginas visitadas como fixtures
+        self.record_dir = record_dir
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+        # Baixar anexos para calcular hash e tipo (mais lento; desligado por padrão)
+        self.capture_attachments = os.getenv('CAPTURE_ATTACHMENTS', 'false').lower() == 'true'
+        self.max_attachments = int(os.getenv('MAX_ATTACHMENTS_PER_EMAIL', 10))
+    
+    def _wait(self, seconds):
+        if self.delay_factor > 0:
+            time.sleep(seconds * self.delay_factor)
+    
+    def _record(self, name):
+        """Salva o HTML atual (sem scripts) em record_dir/<name>.html"""
+        if not self.record_dir:
+            return
+        try:
+            html = self.page.content()
+            html = re.sub(r'(?is)<script\b.*?</script>', '', html)
+            name = re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+            with open(os.path.join(self.record_dir, f"{name}.html"), 'w', encoding='utf-8') as f:
+                f.write(html)
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao gravar fixture {name}: {e}")
     
     def start_browser(self, browser_type="chrome"):
         try:
@@ -30,6 +68,7 @@ class EmailReader:
                 viewport={"width": 1366, "height": 768},
                 locale="pt-BR",
                 timeout=60000,
+                accept_downloads=True,
                 args=[
                     "--disable-blink-features=AutomationControlled",
                     "--no-sandbox",
@@ -41,44 +80,44 @@ class EmailReader:
             self.page.set_default_timeout(60000)
             self.page.set_default_navigation_timeout(60000)
             
-            print(f"🌐 Navegador iniciado!")
+            logger.info(f"🌐 Navegador iniciado!")
             return True
             
         except Exception as e:
-            print(f"❌ Erro ao iniciar navegador: {e}")
+            logger.error(f"❌ Erro ao iniciar navegador: {e}")
             return False
     
     def login_gmail(self):
         try:
-            print("🔐 Acessando Gmail...")
+            logger.info("🔐 Acessando Gmail...")
             
             for tentativa in range(3):
                 try:
                     self.page.goto("https://mail.google.com/", wait_until="load", timeout=60000)
-                    time.sleep(5)
+                    self._wait(5)
                     break
                 except:
                     if tentativa < 2:
-                        print(f"   🔄 Tentativa {tentativa + 2}...")
-                        time.sleep(3)
+                        logger.info(f"   🔄 Tentativa {tentativa + 2}...")
+                        self._wait(3)
             
             if "mail.google.com/mail" in self.page.url:
-                print("✅ Já está logado!")
+                logger.info("✅ Já está logado!")
                 return True
             
-            print("\n" + "=" * 50)
-            print("⚠️  FAÇA LOGIN NO NAVEGADOR QUE ABRIU")
-            print("=" * 50)
+            logger.warning("=" * 50)
+            logger.warning("⚠️  FAÇA LOGIN NO NAVEGADOR QUE ABRIU")
+            logger.warning("=" * 50)
             input("\n👉 Pressione ENTER após fazer login... ")
             
             if "mail.google.com/mail" in self.page.url:
-                print("✅ Login OK!")
+                logger.info("✅ Login OK!")
                 return True
             
             return False
             
         except Exception as e:
-            print(f"❌ Erro: {e}")
+            logger.error(f"❌ Erro: {e}")
             return False
     
     def get_email_count(self):
@@ -89,19 +128,90 @@ class EmailReader:
         except:
             return 0
     
+    def inbox_url(self, page=1):
+        """URL da lista da caixa de entrada (página 1, 2, ...)"""
+        if page <= 1:
+            return "https://mail.google.com/mail/u/0/#inbox"
+        return f"https://mail.google.com/mail/u/0/#inbox/p{page}"
+    
+    def thread_url(self, thread_id):
+        """URL de uma conversa aberta diretamente pelo id"""
+        return f"https://mail.google.com/mail/u/0/#inbox/{thread_id}"
+    
+    def list_inbox_page(self, page=1):
+        """
+        Lista as linhas de uma página da caixa de entrada sem abrir os e-mails
+        
+        A conversa com mais de uma mensagem ganha message_id "<thread_id>#<n>"
+        (n = número de mensagens mostrado na lista): uma resposta nova numa
+        conversa já analisada vira uma linha nova.
+        
+        Returns:
+            lista (mais recente primeiro) de dicts com thread_id, message_id,
+            message_count, sender, subject; [] se a página não tem e-mails (fim da caixa) e None se ela não
+            carregou (erro de navegação, tempo esgotado)
+        """
+        try:
+            self.page.goto(self.inbox_url(page), wait_until="load")
+            self._wait(3)
+            self._record(f"inbox_p{page}")
+            
+            rows = []
+            for row in self.page.query_selector_all('tr.zA'):
+                id_el = row.query_selector('[data-legacy-thread-id]')
+                if not id_el:
+                    continue
+                
+                sender_el = row.query_selector('span.bA4, span.yP')
+                subject_el = row.query_selector('span.bog, span.y2')
+                count_el = row.query_selector('span.bx0')
+                
+                thread_id = id_el.get_attribute('data-legacy-thread-id')
+                count_text = re.sub(r'\D', '', count_el.inner_text()) if count_el else ''
+                count = int(count_text) if count_text else 1
+                
+                rows.append({
+                    'thread_id': thread_id,
+                    'message_id': thread_id if count <= 1 else f"{thread_id}#{count}",
+                    'message_count': count,
+                    'sender': sender_el.inner_text() if sender_el else "Desconhecido",
+                    'subject': subject_el.inner_text() if subject_el else "Sem assunto"
+                })
+            
+            return rows
+            
+        except Exception as e:
+            logger.error(f"   ❌ Erro ao listar página {page}: {e}")
+            return None
+    
+    def read_email_by_id(self, thread_id, sender="Desconhecido", subject="Sem assunto", message_id=None):
+        """Abre uma conversa pelo id e lê a mensagem mais recente (message_id padrão = thread_id)"""
+        try:
+            logger.info(f"   📧 {sender[:25]} - {subject[:35]}", extra={'sample': True})
+            
+            self.page.goto(self.thread_url(thread_id), wait_until="load")
+            self._wait(3)
+            self._record(f"thread_{thread_id}")
+            
+            return self._read_open_email(sender, message_id or thread_id)
+            
+        except Exception as e:
+            logger.error(f"   ❌ Erro: {e}")
+            return None
+    
     def read_email_by_index(self, index):
         """Lê um e-mail pelo índice (re-busca o elemento cada vez)"""
         try:
             # Garantir que está na inbox
             if "inbox" not in self.page.url:
-                self.page.goto("https://mail.google.com/mail/u/0/#inbox", wait_until="load")
-                time.sleep(3)
+                self.page.goto(self.inbox_url(), wait_until="load")
+                self._wait(3)
             
             # Buscar todos os e-mails NOVAMENTE
             email_rows = self.page.query_selector_all('tr.zA')
             
             if index >= len(email_rows):
-                print(f"   ⚠️ Índice {index} não existe mais")
+                logger.warning(f"   ⚠️ Índice {index} não existe mais")
                 return None
             
             row = email_rows[index]
@@ -118,71 +228,121 @@ class EmailReader:
             if subject_el:
                 subject = subject_el.inner_text()
             
-            print(f"   📧 {sender[:25]} - {subject[:35]}")
+            logger.info(f"   📧 {sender[:25]} - {subject[:35]}", extra={'sample': True})
             
             # Clicar para abrir
             row.click()
-            time.sleep(3)
-            
-            # Extrair conteúdo
-            content = {
-                'subject': '',
-                'sender': sender,
-                'sender_email': '',
-                'date': '',
-                'body': '',
-                'has_attachments': False,
-                'message_id': f"{index}_{int(time.time())}",
-                'read_at': datetime.now().isoformat()
-            }
-            
-            # Assunto
-            el = self.page.query_selector('h2.hP')
-            if el:
-                content['subject'] = el.inner_text()
-            
-            # Remetente com email
-            el = self.page.query_selector('span.gD, span.go')
-            if el:
-                content['sender'] = el.inner_text()
-                content['sender_email'] = el.get_attribute('email') or ''
-            
-            # Data
-            el = self.page.query_selector('span.g3')
-            if el:
-                content['date'] = el.inner_text()
-            
-            # Corpo
-            el = self.page.query_selector('div.a3s.aiL, div.a3s')
-            if el:
-                content['body'] = el.inner_text()
-            
-            # Anexos
-            if self.page.query_selector('div.aZo'):
-                content['has_attachments'] = True
+            self._wait(3)
+            
+            content = self._read_open_email(sender, f"{index}_{int(time.time())}")
             
             # Voltar para inbox
-            self.page.goto("https://mail.google.com/mail/u/0/#inbox", wait_until="load")
-            time.sleep(2)
+            self.page.goto(self.inbox_url(), wait_until="load")
+            self._wait(2)
             
             return content
             
         except Exception as e:
-            print(f"   ❌ Erro: {e}")
+            logger.error(f"   ❌ Erro: {e}")
             # Tentar voltar para inbox
             try:
-                self.page.goto("https://mail.google.com/mail/u/0/#inbox", wait_until="load")
-                time.sleep(2)
+                self.page.goto(self.inbox_url(), wait_until="load")
+                self._wait(2)
             except:
                 pass
             return None
     
+    def _read_open_email(self, sender, message_id):
+        """Extrai o conteúdo do e-mail aberto na página"""
+        content = {
+            'subject': '',
+            'sender': sender,
+            'sender_email': '',
+            'date': '',
+            'body': '',
+            'has_attachments': False,
+            'message_id': message_id,
+            'read_at': datetime.now().isoformat()
+        }
+        
+        # Assunto
+        el = self.page.query_selector('h2.hP')
+        if el:
+            content['subject'] = el.inner_text()
+        
+        # Numa conversa, a última mensagem (a mais recente, aberta)
+        messages = self.page.query_selector_all('div.adn')
+        scope = messages[-1] if messages else self.page
+        
+        # Remetente com email
+        el = scope.query_selector('span.gD, span.go')
+        if el:
+            content['sender'] = el.inner_text()
+            content['sender_email'] = el.get_attribute('email') or ''
+        
+        # Data
+        el = scope.query_selector('span.g3')
+        if el:
+            content['date'] = el.inner_text()
+        
+        # Corpo
+        el = scope.query_selector('div.a3s.aiL, div.a3s')
+        if el:
+            content['body'] = el.inner_text()
+        
+        # Anexos
+        cards = scope.query_selector_all('div.aZo')
+        if cards:
+            content['has_attachments'] = True
+            if self.capture_attachments:
+                content['attachments'] = self._capture_attachments(cards)
+        
+        return content
+    
+    def _capture_attachments(self, cards):
+        """
+        Baixa os anexos pelo navegador e calcula SHA-256 e tipo de cada um
+        
+        O Playwright grava o download num arquivo temporário, lido em blocos
+        e apagado em seguida.
+        """
+        attachments = []
+        for card in cards[:self.max_attachments]:
+            # download_url="tipo/mime:nome.ext:https://..."
+            content_type, filename = None, None
+            parts = (card.get_attribute('download_url') or '').split(':', 2)
+            if len(parts) == 3:
+                content_type, filename = parts[0], parts[1]
+            if not filename:
+                name_el = card.query_selector('span.aV3')
+                filename = name_el.inner_text() if name_el else None
+            
+            try:
+                card.hover()
+                button = card.query_selector(DOWNLOAD_BUTTON)
+                if not button:
+                    logger.warning(f"   ⚠️ Botão de download não encontrado: {filename}")
+                    continue
+                
+                with self.page.expect_download(timeout=60000) as download_info:
+                    button.click()
+                download = download_info.value
+                
+                attachments.append(inspect_file(
+                    download.path(), filename or download.suggested_filename, content_type
+                ))
+                download.delete()
+            except Exception as e:
+                logger.warning(f"   ⚠️ Erro ao baixar anexo {filename}: {e}")
+        
+        return attachments
+    
     def close_browser(self):
         try:
             if self.context:
                 self.context.close()
             if self.playwright:
                 self.playwright.stop()
-            print("🔒 Navegador fechado!")
+            logger.info("🔒 Navegador fechado!")
         except Exception as e:
-            print(f"⚠️ Erro ao fechar: {e}")
\ No newline at end of file
+            logger.warning(f"⚠️ Erro ao fechar: {e}")
\ No newline at end of file
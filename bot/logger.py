@@ -0,0 +1,199 @@
+# bot/logger.py
+"""
+Subsistema de logging não bloqueante
+
+Todos os registros passam por um QueueHandler; uma thread (QueueListener)
+grava em disco e no console. O arquivo é JSON Lines com rotação.
+
+Configuração (.env):
+    LOG_LEVEL=INFO
+    LOG_FILE=logs/bot.jsonl
+    LOG_MAX_BYTES=10485760      rotação por tamanho (padrão 10 MB)
+    LOG_BACKUP_COUNT=5
+    LOG_ROTATE_WHEN=            rotação por tempo (ex.: 'midnight', 'H'); ignora LOG_MAX_BYTES
+    LOG_SAMPLE_RATE=1.0         fração dos e-mails cujas linhas detalhadas são gravadas
+"""
+import os
+import sys
+import copy
+import json
+import uuid
+import queue
+import atexit
+import logging
+import logging.handlers
+import contextvars
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+_correlation_id = contextvars.ContextVar('correlation_id', default=None)
+_listener = None
+
+# Atributos padrão do LogRecord (o resto vem de `extra=`)
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'correlation_id', 'sample'}
+
+
+def new_correlation_id():
+    return uuid.uuid4().hex[:12]
+
+
+def get_correlation_id():
+    return _correlation_id.get()
+
+
+@contextmanager
+def correlation(correlation_id=None):
+    """Associa um id de correlação a todos os logs do bloco (ex.: um e-mail)"""
+    token = _correlation_id.set(correlation_id or new_correlation_id())
+    try:
+        yield _correlation_id.get()
+    finally:
+        _correlation_id.reset(token)
+
+
+class CorrelationFilter(logging.Filter):
+    """Copia o id de correlação do contexto atual para o registro"""
+
+    def filter(self, record):
+        if not hasattr(record, 'correlation_id'):
+            record.correlation_id = _correlation_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Amostra linhas detalhadas por e-mail (logger.info(..., extra={'sample': True}))
+
+    A decisão é feita pelo id de correlação, então um e-mail amostrado
+    mantém todas as suas linhas. WARNING ou acima nunca é descartado.
+    """
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.threshold = int(max(0.0, min(rate, 1.0)) * 10000)
+
+    def filter(self, record):
+        if not getattr(record, 'sample', False) or record.levelno >= logging.WARNING:
+            return True
+        if self.threshold >= 10000:
+            return True
+
+        key = getattr(record, 'correlation_id', None) or record.getMessage()
+        return zlib.crc32(key.encode('utf-8')) % 10000 < self.threshold
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+
+        correlation_id = getattr(record, 'correlation_id', None)
+        if correlation_id:
+            entry['correlation_id'] = correlation_id
+
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Já formatado por _QueueHandler.prepare
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que mantém a exceção separada da mensagem
+
+    O prepare() padrão junta o traceback à mensagem e apaga exc_info e
+    exc_text. Aqui a mensagem fica só com o texto e o traceback formatado
+    segue em exc_text, que o JsonFormatter grava no campo 'exc' e o
+    Formatter do console acrescenta à linha.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        # O traceback (frames) não atravessa a fila
+        record.exc_info = None
+        return record
+
+
+def _file_handler(path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    when = os.getenv('LOG_ROTATE_WHEN', '').strip()
+    backups = int(os.getenv('LOG_BACKUP_COUNT', 5))
+
+    if when:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=when, backupCount=backups, encoding='utf-8'
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+            backupCount=backups, encoding='utf-8'
+        )
+
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def setup_logging(log_file=None, level=None, console=True):
+    """Configura o logging raiz (idempotente). Retorna o QueueListener."""
+    global _listener
+
+    if _listener is not None:
+        return _listener
+
+    level = level or os.getenv('LOG_LEVEL', 'INFO').upper()
+    log_file = log_file or os.getenv('LOG_FILE', 'logs/bot.jsonl')
+
+    handlers = [_file_handler(log_file)]
+    if console:
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        handlers.append(stream)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(CorrelationFilter())
+    queue_handler.addFilter(SamplingFilter(float(os.getenv('LOG_SAMPLE_RATE', 1.0))))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    return _listener
+
+
+def shutdown_logging():
+    """Esvazia a fila e para a thread de escrita"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,342 @@
+# bot/lookalike.py
+import os
+import re
+import hashlib
+import functools
+import logging
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+
+# Marcas protegidas por padrão (ampliável com data/brands.txt)
+DEFAULT_BRANDS = [
+    # Internacionais
+    'google.com', 'gmail.com', 'youtube.com', 'microsoft.com', 'outlook.com',
+    'hotmail.com', 'apple.com', 'icloud.com',
+    'amazon.com', 'facebook.com', 'instagram.com', 'whatsapp.com', 'twitter.com',
+    'linkedin.com', 'github.com', 'netflix.com', 'spotify.com', 'paypal.com',
+    'dropbox.com', 'adobe.com', 'docusign.com', 'zoom.us', 'yahoo.com',
+    'ebay.com', 'aliexpress.com', 'shopee.com.br', 'binance.com', 'coinbase.com',
+    'dhl.com', 'fedex.com', 'ups.com', 'booking.com', 'airbnb.com', 'uber.com',
+    'wetransfer.com', 'salesforce.com', 'slack.com', 'steampowered.com',
+    # Brasil
+    'mercadolivre.com.br', 'mercadopago.com.br', 'nubank.com.br', 'itau.com.br',
+    'bradesco.com.br', 'santander.com.br', 'bb.com.br', 'caixa.gov.br',
+    'inter.co', 'c6bank.com.br', 'picpay.com', 'sicredi.com.br', 'sicoob.com.br',
+    'banrisul.com.br', 'btgpactual.com', 'xpi.com.br', 'magazineluiza.com.br',
+    'americanas.com.br', 'correios.com.br', 'gov.br', 'receita.fazenda.gov.br',
+    'serasa.com.br', 'vivo.com.br', 'claro.com.br', 'tim.com.br', 'ifood.com.br',
+    'olx.com.br', 'casasbahia.com.br', 'netshoes.com.br', 'pagseguro.uol.com.br',
+]
+
+# Domínios das próprias marcas que não são marcas à parte (serviços, CDNs, analytics)
+RELATED_DOMAINS = [
+    'office.com', 'office365.com', 'microsoftonline.com', 'live.com', 'sharepoint.com',
+    'windows.net', 'azure.com', 'googlemail.com', 'google-analytics.com', 'googleapis.com',
+    'gstatic.com', 'googleusercontent.com', 'googletagmanager.com', 'doubleclick.net',
+    'amazonaws.com', 'amazon-adsystem.com', 'media-amazon.com', 'cloudfront.net',
+    'fbcdn.net', 'whatsapp.net', 'cdninstagram.com', 'mlstatic.com', 'itau-unibanco.com.br',
+]
+
+# Plataformas onde empresas têm subdomínio próprio (netflix.zendesk.com): a marca
+# no subdomínio não é imitação
+HOSTING_PLATFORMS = {
+    'zendesk.com', 'freshdesk.com', 'helpscoutdocs.com', 'statuspage.io',
+    'service-now.com', 'atlassian.net', 'force.com', 'salesforce.com',
+}
+
+# Nomes de marca que são palavras comuns ou curtas demais: só contam como
+# homóglifo (com troca de caractere), nunca como erro de digitação ou parte do nome
+COMMON_WORD_NAMES = {'inter', 'vivo', 'claro', 'zoom', 'slack', 'uber', 'tim', 'ups', 'gov', 'olx', 'bb'}
+MIN_HOMOGLYPH_LENGTH = 4
+MIN_EMBEDDED_LENGTH = 5
+
+# Mesmo nome da marca com estes sufixos é a própria marca (google.com.br, itau.com)
+_VARIANT_SUFFIX = re.compile(r'^(?:com|net|org|[a-z]{2}|(?:com|co|net|org|gov)\.[a-z]{2})$')
+
+# Caracteres confundíveis → forma canônica (aplicado à marca e ao domínio)
+CONFUSABLES = {
+    # Dígitos e símbolos
+    '0': 'o', '1': 'l', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b', '9': 'g',
+    'i': 'l', '|': 'l', '!': 'l', '$': 's', '@': 'a',
+    # Cirílico
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o',
+    'р': 'p', 'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'ѕ': 's', 'і': 'l', 'ї': 'l',
+    'ј': 'j', 'ԁ': 'd', 'ԛ': 'q', 'ԝ': 'w', 'һ': 'h', 'ո': 'n', 'ս': 'u',
+    # Grego
+    'α': 'a', 'β': 'b', 'ε': 'e', 'η': 'n', 'ι': 'l', 'κ': 'k', 'ν': 'v', 'ο': 'o',
+    'ρ': 'p', 'τ': 't', 'υ': 'u', 'χ': 'x', 'ω': 'w',
+    # Latim estendido
+    'ɡ': 'g', 'ɑ': 'a', 'ı': 'l', 'ł': 'l', 'ß': 'ss', 'ø': 'o', 'đ': 'd', 'ħ': 'h',
+}
+
+# Sequências que imitam uma letra
+MULTI_CONFUSABLES = [('rn', 'm'), ('vv', 'w'), ('cl', 'd'), ('nn', 'm')]
+
+
+def decode_idn(domain):
+    """Converte rótulos punycode (xn--) para Unicode"""
+    labels = []
+    for label in domain.split('.'):
+        if label.startswith('xn--'):
+            try:
+                label = label.encode('ascii').decode('idna')
+            except Exception:
+                pass
+        labels.append(label)
+    return '.'.join(labels)
+
+
+_ASCII_TABLE = str.maketrans({
+    **{k: v for k, v in CONFUSABLES.items() if k.isascii()}, '-': None
+})
+
+
+def skeleton(text):
+    """Forma canônica: sem acentos, sem hífens e com confundíveis unificados"""
+    text = text.lower()
+    if text.isascii():
+        text = text.translate(_ASCII_TABLE)
+    else:
+        result = []
+        for char in unicodedata.normalize('NFKC', text):
+            char = CONFUSABLES.get(char, char)
+            if len(char) == 1 and not char.isascii():
+                decomposed = unicodedata.normalize('NFKD', char)
+                char = ''.join(c for c in decomposed if not unicodedata.combining(c))
+                char = CONFUSABLES.get(char, char)
+            if char != '-':
+                result.append(char)
+        text = ''.join(result)
+
+    for sequence, replacement in MULTI_CONFUSABLES:
+        text = text.replace(sequence, replacement)
+    return text
+
+
+def _char_masks(text):
+    """Máscara de bits das posições de cada caractere (usada por edit_distance)"""
+    masks = {}
+    for i, char in enumerate(text):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+
+def edit_distance(a, b, masks=None):
+    """
+    Distância de Damerau-Levenshtein restrita (transposição adjacente conta 1)
+
+    Algoritmo paralelo de bits de Myers/Hyyrö: uma coluna da matriz de
+    programação dinâmica por caractere de b, com as colunas guardadas em
+    inteiros. masks pode receber _char_masks(a) já calculado.
+    """
+    m = len(a)
+    if not m:
+        return len(b)
+    if masks is None:
+        masks = _char_masks(a)
+
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    vp, vn, d0, previous_eq = full, 0, 0, 0
+    score = m
+    for char in b:
+        eq = masks.get(char, 0)
+        transposition = (((~d0) & eq) << 1) & previous_eq
+        d0 = ((((eq & vp) + vp) ^ vp) | eq | vn | transposition) & full
+        hp = vn | (~(d0 | vp) & full)
+        hn = d0 & vp
+        if hp & last:
+            score += 1
+        elif hn & last:
+            score -= 1
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = hn | (~(d0 | hp) & full)
+        vn = d0 & hp
+        previous_eq = eq
+    return score
+
+
+class DeletionIndex:
+    """
+    Índice de vizinhança por deleções (symmetric delete)
+
+    Duas palavras a até k edições uma da outra têm alguma variante em comum
+    quando se apagam até k caracteres de cada uma. Cada palavra é indexada
+    por essas variantes, e a busca gera as variantes do termo procurado e
+    consulta o dicionário: o custo depende do tamanho do termo, não da
+    quantidade de palavras indexadas. Os candidatos são confirmados com
+    edit_distance.
+    """
+
+    def __init__(self):
+        self.variants = {}  # variante → palavras indexadas
+        self.size = 0
+
+    @staticmethod
+    def _deletes(word, depth):
+        variants = {word}
+        frontier = {word}
+        for _ in range(depth):
+            frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            variants |= frontier
+        return variants
+
+    def add(self, word, tolerance):
+        self.size += 1
+        for variant in self._deletes(word, tolerance):
+            self.variants.setdefault(variant, []).append(word)
+
+    def search(self, word, tolerance):
+        """Retorna [(distância, palavra)] com distância <= tolerance"""
+        masks = _char_masks(word)
+        candidates = set()
+        for variant in self._deletes(word, tolerance):
+            candidates.update(self.variants.get(variant, ()))
+
+        results = []
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, masks)
+            if distance <= tolerance:
+                results.append((distance, candidate))
+        return sorted(results)
+
+
+class LookalikeDetector:
+    """
+    Detecta domínios que imitam marcas protegidas
+
+    Cada marca é indexada pelo esqueleto do seu nome (ex.: 'paypal.com' → 'paypal').
+    Um domínio é comparado por:
+        1. esqueleto idêntico com troca de caractere (homóglifos: paypa1, g00gle,
+           punycode com cirílico); o mesmo nome sem troca é a própria marca em
+           outro sufixo: .com/.net/.org e variantes de país (google.com.br) são
+           aceitos, os demais (paypal.top) são 'suffix'
+        2. distância de edição pequena no índice de deleções (typosquatting: gooogle, amazom)
+        3. nome da marca como rótulo ou parte separada por hífen (paypal-login.com)
+
+    Nomes curtos ou que são palavras comuns (COMMON_WORD_NAMES) só entram no 1.
+    """
+
+    def __init__(self, brands=None, brands_file=None):
+        brands_file = brands_file or os.getenv('BRANDS_FILE', 'data/brands.txt')
+        self.brands = {}      # esqueleto → domínio oficial da marca
+        self.names = {}       # esqueleto → nome da marca como escrito
+        self.official = set(RELATED_DOMAINS)  # domínios oficiais
+        self.index = DeletionIndex()
+
+        for domain in brands or DEFAULT_BRANDS:
+            self.add_brand(domain)
+
+        if brands_file and os.path.exists(brands_file):
+            self.load_file(brands_file)
+
+        digest = hashlib.sha1('\n'.join(sorted(self.official)).encode('utf-8'))
+        self.version = digest.hexdigest()[:12]
+
+        # Os mesmos domínios se repetem muito entre e-mails
+        self.check = functools.lru_cache(maxsize=4096)(self._check)
+
+    def load_file(self, path):
+        """Uma marca por linha (domínio oficial); linhas com # são ignoradas"""
+        count = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip().lower()
+                if line:
+                    self.add_brand(line)
+                    count += 1
+        logger.info(f"🏷️ {count} marcas carregadas de {path}")
+
+    @staticmethod
+    def _brand_name(domain):
+        """Nome principal do domínio oficial (ex.: 'mercadolivre.com.br' → 'mercadolivre')"""
+        labels = [l for l in domain.split('.') if l]
+        generic = {'com', 'net', 'org', 'gov', 'co', 'br', 'us', 'uol', 'fazenda'}
+        names = [l for l in labels[:-1] if l not in generic] or labels[:1]
+        return names[-1] if len(names) == 1 else names[0]
+
+    def add_brand(self, domain):
+        domain = domain.strip().lower()
+        if not domain:
+            return
+        self.official.add(domain)
+        name = self._brand_name(domain)
+        key = skeleton(name)
+        if key and key not in self.brands:
+            self.brands[key] = domain
+            self.names[key] = name
+            if len(key) >= 6 and name not in COMMON_WORD_NAMES:
+                self.index.add(key, self.tolerance(key))
+
+    @staticmethod
+    def tolerance(name):
+        """Erros de digitação aceitos conforme o tamanho do nome"""
+        if len(name) <= 5:
+            return 0
+        if len(name) <= 9:
+            return 1
+        return 2
+
+    def is_official(self, host):
+        """O host é um domínio oficial ou subdomínio de um"""
+        labels = host.lower().strip('.').split('.')
+        return any('.'.join(labels[i:]) in self.official for i in range(len(labels)))
+
+    def _check(self, host, registered_domain=None):
+        """
+        Verifica um domínio/host (use self.check, que guarda os resultados)
+
+        Args:
+            host: host completo (ex.: 'login.paypa1.com' ou 'xn--pypal-4ve.com')
+            registered_domain: domínio registrável já calculado (ex.: 'paypa1.com')
+
+        Returns:
+            None ou dict com brand, domain, kind ('homoglyph', 'suffix', 'typo',
+            'embedded') e distance
+        """
+        host = decode_idn((host or '').lower().strip('.').split(':')[0])
+        if not host or self.is_official(host):
+            return None
+
+        registered = decode_idn((registered_domain or '.'.join(host.split('.')[-2:])).lower())
+        name, _, suffix = registered.partition('.')
+        name_key = skeleton(name)
+
+        # 1. Mesmo esqueleto de uma marca
+        brand = self.brands.get(name_key)
+        if brand and len(name_key) >= MIN_HOMOGLYPH_LENGTH:
+            brand_name = self.names[name_key]
+            if name != brand_name:
+                # Houve troca de caractere ou hífen (paypa1, g00gle, cirílico)
+                return self._match(brand, host, 'homoglyph', 0)
+            if brand_name not in COMMON_WORD_NAMES and not _VARIANT_SUFFIX.match(suffix):
+                # Mesmo nome em sufixo que não é variante da marca (paypal.top)
+                return self._match(brand, host, 'suffix', 0)
+            return None
+
+        # 2. Typosquatting: nome a poucas edições de uma marca
+        if len(name_key) >= 6:
+            # Só marcas com 10+ caracteres aceitam 2 erros (nome a 2 de distância tem 8+)
+            for distance, key in self.index.search(name_key, 2 if len(name_key) >= 8 else 1):
+                if distance <= self.tolerance(key):
+                    return self._match(self.brands[key], host, 'typo', distance)
+
+        # 3. Marca embutida em subdomínio ou parte do nome (paypal.secure-login.tk, paypal-verify.com)
+        labels = host[:-len(registered)].split('.') if host.endswith(registered) else []
+        if registered in HOSTING_PLATFORMS:
+            labels = []
+        parts = [p for label in labels + [name] for p in label.split('-') if p]
+        if len(parts) > 1 or labels:
+            for part in parts:
+                key = skeleton(part)
+                if (len(key) >= MIN_EMBEDDED_LENGTH and key in self.brands
+                        and self.names[key] not in COMMON_WORD_NAMES):
+                    return self._match(self.brands[key], host, 'embedded', 0)
+
+        return None
+
+    def _match(self, brand, host, kind, distance):
+        return {'brand': brand, 'domain': host, 'kind': kind, 'distance': distance}
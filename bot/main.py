@@ -2,23 +2,43 @@
 import os
 import sys
 import time
+import logging
 
-# Criar pastas necessárias
-os.makedirs('data', exist_ok=True)
-os.makedirs('logs', exist_ok=True)
-os.makedirs('browser_session', exist_ok=True)
-
-from bot.ler_email import EmailReader
 from bot.database import EmailDatabase
 from bot.extrair import EmailExtractor
-from bot.phishing import PhishingDetector
-from bot.scheduler import EmailScheduler
+from bot.cache import AnalysisCache
+from bot.attachments import AttachmentCache
+from bot.crawler import default_mailbox
+from bot.logger import setup_logging, correlation
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_dirs():
+    """Cria as pastas usadas pelo bot (só ao executar, não ao importar)"""
+    os.makedirs('data', exist_ok=True)
+    os.makedirs('logs', exist_ok=True)
+    os.makedirs('browser_session', exist_ok=True)
 
 
-def main():
-    print("=" * 60)
-    print("🤖 BOT DE E-MAILS COM DETECÇÃO DE PHISHING")
-    print("=" * 60)
+def main(mode=None, headless=None):
+    """
+    Executa o bot com o navegador
+    
+    mode: 'continuous' ou 'single' (padrão: MODE ou --continuous na linha de comando)
+    headless: padrão HEADLESS
+    """
+    # Importações pesadas (Playwright, tldextract, schedule) só quando o bot roda
+    from bot.ler_email import EmailReader
+    from bot.phishing import PhishingDetector
+    from bot.scheduler import EmailScheduler
+    
+    ensure_dirs()
+    setup_logging()
+    
+    logger.info("=" * 60)
+    logger.info("🤖 BOT DE E-MAILS COM DETECÇÃO DE PHISHING")
+    logger.info("=" * 60)
     
     # Inicializar componentes
     db = EmailDatabase()
@@ -26,41 +46,41 @@ def main():
     phishing = PhishingDetector()
     
     # Modo headless para Docker
-    headless = os.getenv('HEADLESS', 'false').lower() == 'true'
+    if headless is None:
+        headless = os.getenv('HEADLESS', 'false').lower() == 'true'
     reader = EmailReader(headless=headless)
     
     try:
         # Iniciar navegador
         if not reader.start_browser("chrome"):
-            print("❌ Falha ao iniciar navegador")
+            logger.error("❌ Falha ao iniciar navegador")
             return
         
         # Login
         if not reader.login_gmail():
-            print("❌ Falha no login")
+            logger.error("❌ Falha no login")
             return
         
         time.sleep(2)
         
         # Verificar se é modo contínuo (24/7)
-        mode = os.getenv('MODE', 'single').lower()
+        if mode is None:
+            mode = 'continuous' if '--continuous' in sys.argv else os.getenv('MODE', 'single').lower()
         
-        if mode == 'continuous' or '--continuous' in sys.argv:
+        if mode == 'continuous':
             # Modo 24/7
             scheduler = EmailScheduler(reader, db, extractor, phishing)
             scheduler.start()
         else:
             # Modo único (uma verificação)
-            print("\n📊 Modo: Verificação única")
+            logger.info("📊 Modo: Verificação única")
             run_single_check(reader, db, extractor, phishing)
         
     except KeyboardInterrupt:
-        print("\n⚠️ Interrompido")
+        logger.warning("⚠️ Interrompido")
     
     except Exception as e:
-        print(f"\n❌ Erro: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Erro: {e}")
     
     finally:
         reader.close_browser()
@@ -68,67 +88,73 @@ def main():
 
 def run_single_check(reader, db, extractor, phishing):
     """Executa uma única verificação"""
-    reader.page.goto("https://mail.google.com/mail/u/0/#inbox", wait_until="load")
+    reader.page.goto(reader.inbox_url(), wait_until="load")
     time.sleep(3)
     
     total = reader.get_email_count()
     max_emails = min(10, total)
     
     if total == 0:
-        print("📭 Nenhum e-mail encontrado!")
+        logger.info("📭 Nenhum e-mail encontrado!")
         return
     
-    print(f"\n📬 Processando {max_emails} e-mails...\n")
+    logger.info(f"📬 Processando {max_emails} e-mails...")
     
     phishing_count = 0
+    cache = AnalysisCache(phishing, extractor, db.db_path)
+    attachment_cache = AttachmentCache(db.db_path)
     
     for i in range(max_emails):
-        print(f"\n{'─' * 50}")
-        print(f"📧 E-mail {i+1}/{max_emails}")
-        
-        content = reader.read_email_by_index(i)
-        
-        if not content:
-            continue
-        
-        # Analisar phishing
-        analysis = phishing.analyze_email(content)
-        content['phishing_result'] = analysis
-        
-        # Salvar
-        email_id = db.save_email(content)
-        
-        if email_id > 0:
-            db.save_phishing_analysis(email_id, analysis)
+        with correlation():
+            logger.info(f"{'─' * 50}")
+            logger.info(f"📧 E-mail {i+1}/{max_emails}")
+            
+            content = reader.read_email_by_index(i)
+            
+            if not content:
+                continue
             
-            extracted = extractor.extract_all(content.get('body', ''))
-            for data_type, values in extracted.items():
-                for value in values:
-                    db.save_extracted_data(email_id, data_type, value)
+            # Analisar phishing (com os vereditos já conhecidos dos anexos)
+            attachment_cache.annotate(content.get('attachments'))
+            analysis, extracted = cache.analyze(content)
+            content['phishing_result'] = analysis
+            content['mailbox'] = default_mailbox()
             
-            # Mostrar resultado
-            emoji = phishing.get_risk_emoji(analysis['risk_level'])
-            print(f"   {emoji} Risco: {analysis['risk_level']} (Score: {analysis['score']})")
-            print(f"   📝 {content.get('subject', 'N/A')[:45]}")
-            print(f"   👤 {content.get('sender', 'N/A')}")
+            # Salvar
+            email_id = db.save_email(content)
             
-            if analysis['is_phishing']:
-                phishing_count += 1
-                print(f"   ⚠️ MOTIVOS: {', '.join(analysis['reasons'][:3])}")
+            if email_id > 0:
+                db.save_phishing_analysis(email_id, analysis)
+                
+                for data_type, values in extracted.items():
+                    for value in values:
+                        db.save_extracted_data(email_id, data_type, value)
+                
+                db.save_attachments(email_id, content.get('attachments'))
+                
+                # Mostrar resultado
+                emoji = phishing.get_risk_emoji(analysis['risk_level'])
+                logger.info(f"   {emoji} Risco: {analysis['risk_level']} (Score: {analysis['score']})")
+                logger.info(f"   📝 {content.get('subject', 'N/A')[:45]}")
+                logger.info(f"   👤 {content.get('sender', 'N/A')}")
+                
+                if analysis['is_phishing']:
+                    phishing_count += 1
+                    logger.warning(f"   ⚠️ MOTIVOS: {', '.join(analysis['reasons'][:3])}")
         
         time.sleep(1)
     
     # Estatísticas finais
-    print(f"\n{'=' * 60}")
-    print("📊 RESUMO")
-    print(f"{'=' * 60}")
-    print(f"   Total verificados: {max_emails}")
-    print(f"   🔴 Phishing detectados: {phishing_count}")
+    logger.info(f"{'=' * 60}")
+    logger.info("📊 RESUMO")
+    logger.info(f"{'=' * 60}")
+    logger.info(f"   Total verificados: {max_emails}")
+    logger.info(f"   🔴 Phishing detectados: {phishing_count}")
     
     stats = db.get_stats()
-    print(f"\n   Banco de dados:")
-    print(f"   📧 Total de e-mails: {stats['total_emails']}")
-    print(f"   ⚠️ Total phishing: {stats['phishing_detected']}")
+    logger.info(f"   Banco de dados:")
+    logger.info(f"   📧 Total de e-mails: {stats['total_emails']}")
+    logger.info(f"   ⚠️ Total phishing: {stats['phishing_detected']}")
 
 
 if __name__ == "__main__":
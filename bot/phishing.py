@@ -1,13 +1,31 @@
 # bot/phishing.py
+import os
 import re
+import json
+import hashlib
+import logging
 from urllib.parse import urlparse
 from datetime import datetime
 import tldextract
 
+from bot.lookalike import LookalikeDetector, DEFAULT_BRANDS
+from bot.reputation import ReputationStore
+
+# Com OFFLINE=true usa a lista de sufixos embutida no pacote (sem acesso à rede)
+if os.getenv('OFFLINE', 'false').lower() == 'true':
+    extract_domain = tldextract.TLDExtract(suffix_list_urls=())
+else:
+    extract_domain = tldextract.extract
+
+logger = logging.getLogger(__name__)
+
 
 class PhishingDetector:
     """Detector de e-mails de phishing"""
     
+    # Incrementar sempre que a lógica de pontuação (código) mudar
+    RULESET_REVISION = 5
+    
     def __init__(self):
         # Palavras suspeitas no assunto/corpo
         self.suspicious_words = [
@@ -34,7 +52,7 @@ class PhishingDetector:
             'validar', 'reset', 'redefinir'
         ]
         
-        # Domínios legítimos (whitelist)
+        # Domínios legítimos (whitelist; feeds externos em self.reputation)
         self.trusted_domains = [
             'google.com', 'gmail.com', 'microsoft.com', 'outlook.com',
             'apple.com', 'amazon.com', 'facebook.com', 'instagram.com',
@@ -59,11 +77,58 @@ class PhishingDetector:
             r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}',  # IP direto
             r'\.php\?', r'\.asp\?',  # Scripts com parâmetros
         ]
+        
+        # Palavras genéricas em domínios de URL
+        self.suspicious_domain_keywords = ['bank', 'secure', 'login']
+        
+        # Listas externas de domínios confiáveis/bloqueados (data/reputation)
+        self.reputation = ReputationStore()
+        
+        # Domínios que imitam marcas (homóglifos, typosquatting, marca embutida)
+        self.lookalike = LookalikeDetector(brands=self.trusted_domains + [
+            d for d in DEFAULT_BRANDS if d not in self.trusted_domains
+        ])
+        
+        # Classificador estatístico opcional (bot/classifier.py)
+        self.classifier = None
+        self.classifier_weight = float(os.getenv('CLASSIFIER_WEIGHT', 0))
+        model_path = os.getenv('CLASSIFIER_MODEL', 'data/classifier.npz')
+        if self.classifier_weight > 0 and os.path.exists(model_path):
+            self.load_classifier(model_path)
+    
+    def load_classifier(self, path, weight=None):
+        """Carrega o modelo e passa a combinar sua probabilidade com o score das regras"""
+        try:
+            from bot.classifier import PhishingClassifier
+            self.classifier = PhishingClassifier.load(path)
+            if weight is not None:
+                self.classifier_weight = weight
+            logger.info(f"🧠 Classificador {self.classifier.model_id} carregado (peso {self.classifier_weight})")
+            return True
+        except ImportError as e:
+            logger.warning(f"⚠️ Classificador indisponível (instale numpy e scipy): {e}")
+        except Exception as e:
+            logger.error(f"❌ Erro ao carregar classificador: {e}")
+        self.classifier = None
+        return False
     
-    def analyze_email(self, email_data: dict) -> dict:
+    def is_trusted_domain(self, domain: str) -> bool:
+        """Domínio na whitelist embutida ou num feed de domínios confiáveis"""
+        return domain in self.trusted_domains or self.reputation.is_trusted(domain)
+    
+    def analyze_batch(self, emails: list) -> list:
+        """Analisa vários e-mails; o classificador pontua o lote de uma vez"""
+        probabilities = [None] * len(emails)
+        if self.classifier is not None and self.classifier_weight > 0 and emails:
+            probabilities = self.classifier.predict_proba(emails).tolist()
+        return [self.analyze_email(e, p) for e, p in zip(emails, probabilities)]
+    
+    def analyze_email(self, email_data: dict, ml_probability: float = None) -> dict:
         """
         Analisa um e-mail e retorna score de phishing
         
+        ml_probability: probabilidade já calculada pelo classificador (analyze_batch)
+        
         Returns:
             dict com score (0-100), is_phishing, reasons, risk_level
         """
@@ -97,7 +162,12 @@ class PhishingDetector:
         reasons.extend(url_reasons)
         
         # ===== 5. ANÁLISE DE ANEXOS =====
-        if email_data.get('has_attachments'):
+        attachments = email_data.get('attachments') or []
+        attachment_score, attachment_reasons = self._analyze_attachments(attachments)
+        score += attachment_score
+        reasons.extend(attachment_reasons)
+        
+        if email_data.get('has_attachments') or attachments:
             attachment_reasons = self._check_attachment_context(subject, body)
             if attachment_reasons:
                 score += 15
@@ -105,6 +175,17 @@ class PhishingDetector:
         
         # Limitar score a 100
         score = min(score, 100)
+        rule_score = score
+        
+        # ===== 6. CLASSIFICADOR ESTATÍSTICO =====
+        if self.classifier is not None and self.classifier_weight > 0:
+            if ml_probability is None:
+                ml_probability = float(self.classifier.predict_proba([email_data])[0])
+            weight = min(self.classifier_weight, 1.0)
+            score = min(round((1 - weight) * rule_score + weight * 100 * ml_probability), 100)
+            reasons.append(f"Classificador estatístico: {ml_probability:.0%} de chance de phishing")
+        else:
+            ml_probability = None
         
         # Determinar nível de risco
         if score >= 70:
@@ -129,7 +210,10 @@ class PhishingDetector:
             'risk_level': risk_level,
             'reasons': reasons,
             'analyzed_at': datetime.now().isoformat(),
-            'urls_found': urls
+            'urls_found': urls,
+            'ruleset_version': self.get_ruleset_version(),
+            'rule_score': rule_score,
+            'ml_probability': ml_probability
         }
     
     def _analyze_sender(self, sender_email: str, sender_name: str) -> tuple:
@@ -144,13 +228,20 @@ class PhishingDetector:
         
         # Extrair domínio
         try:
-            ext = tldextract.extract(sender_email.split('@')[-1])
+            ext = extract_domain(sender_email.split('@')[-1])
             domain = f"{ext.domain}.{ext.suffix}"
         except:
             domain = sender_email.split('@')[-1] if '@' in sender_email else ''
         
+        # Domínio em feed de bloqueio
+        blocked = self.reputation.blocked_match(sender_email.split('@')[-1])
+        if blocked:
+            score += 40
+            reasons.append(f"Remetente em lista de bloqueio: {blocked}")
+        
         # Verificar se é domínio confiável
-        if domain and domain not in self.trusted_domains:
+        trusted = bool(domain) and self.is_trusted_domain(domain)
+        if domain and not trusted:
             # Verificar padrões suspeitos
             for pattern in self.blacklisted_patterns:
                 if re.search(pattern, domain, re.IGNORECASE):
@@ -158,13 +249,23 @@ class PhishingDetector:
                     reasons.append(f"Domínio suspeito: {domain}")
                     break
         
+        # Domínio que imita uma marca
+        lookalike = self.lookalike.check(sender_email.split('@')[-1], domain)
+        if lookalike and lookalike['kind'] == 'suffix':
+            # Nome idêntico ao da marca, só com outro sufixo: menos grave que imitação
+            score += 15
+            reasons.append(f"Remetente usa o nome de {lookalike['brand']} em outro domínio: {lookalike['domain']}")
+        elif lookalike:
+            score += 30
+            reasons.append(f"Remetente imita {lookalike['brand']}: {lookalike['domain']}")
+        
         # Nome não combina com e-mail (spoofing)
         if sender_name:
             # Ex: Nome diz "Banco do Brasil" mas e-mail é xxx@gmail.com
             trusted_names = ['banco', 'bank', 'nubank', 'itau', 'bradesco', 'paypal', 'microsoft', 'apple', 'google']
             for name in trusted_names:
                 if name in sender_name.lower():
-                    if domain not in self.trusted_domains:
+                    if not trusted:
                         score += 30
                         reasons.append(f"Possível spoofing: '{sender_name}' com domínio '{domain}'")
                         break
@@ -267,6 +368,8 @@ class PhishingDetector:
             return score, reasons
         
         suspicious_urls = []
+        blocked_domains = []
+        lookalike_domains = []
         
         for url in urls:
             url_lower = url.lower()
@@ -284,31 +387,66 @@ class PhishingDetector:
             # Verificar domínio
             try:
                 parsed = urlparse(url)
-                ext = tldextract.extract(parsed.netloc)
+                ext = extract_domain(parsed.netloc)
                 domain = f"{ext.domain}.{ext.suffix}"
                 
-                # Domínio imita marca conhecida
-                fake_patterns = [
-                    r'g[o0][o0]gle', r'faceb[o0][o0]k', r'amaz[o0]n',
-                    r'micr[o0]s[o0]ft', r'paypai', r'netf[l1]ix',
-                    r'app[l1]e', r'bank', r'secure', r'login'
-                ]
+                # Domínio em feed de bloqueio
+                blocked = self.reputation.blocked_match(parsed.hostname or '')
+                if blocked:
+                    blocked_domains.append(blocked)
+                    continue
+                if self.is_trusted_domain(domain):
+                    continue
                 
-                for pattern in fake_patterns:
-                    if re.search(pattern, domain) and domain not in self.trusted_domains:
-                        score += 20
-                        reasons.append(f"URL imita marca conhecida: {domain}")
-                        break
+                # Domínio imita marca conhecida
+                lookalike = self.lookalike.check(parsed.hostname or '', domain)
+                if lookalike:
+                    lookalike_domains.append(f"{lookalike['domain']} ({lookalike['brand']})")
+                elif any(
+                    keyword in domain for keyword in self.suspicious_domain_keywords
+                ):
+                    lookalike_domains.append(domain)
                 
             except:
                 pass
         
+        # Uma vez por e-mail, não por URL
+        if lookalike_domains:
+            score += 20
+            examples = list(dict.fromkeys(lookalike_domains))
+            reasons.append(f"URL imita marca conhecida: {', '.join(examples[:3])}")
+        
+        if blocked_domains:
+            score += 40
+            reasons.append(f"URLs em lista de bloqueio: {', '.join(sorted(set(blocked_domains))[:3])}")
+        
         if suspicious_urls:
             score += 15
             reasons.append(f"URLs suspeitas encontradas: {len(suspicious_urls)}")
         
         return score, reasons
     
+    def _analyze_attachments(self, attachments: list) -> tuple:
+        """Analisa os anexos inspecionados (bot/attachments.py)"""
+        score = 0
+        reasons = []
+        
+        for attachment in attachments:
+            name = attachment.get('filename', '')
+            
+            # Hash já marcado como malicioso: veredito imediato
+            if attachment.get('verdict') == 'malicious':
+                score += 100
+                reasons.append(f"Anexo malicioso conhecido: {name} ({attachment.get('sha256', '')[:12]})")
+            elif attachment.get('mismatch'):
+                score += 35
+                reasons.append(f"Anexo disfarçado: '{name}' é {attachment.get('file_type')}")
+            elif attachment.get('dangerous'):
+                score += 25
+                reasons.append(f"Anexo perigoso: {name}")
+        
+        return score, reasons
+    
     def _check_attachment_context(self, subject: str, body: str) -> list:
         """Verifica contexto de anexos"""
         reasons = []
@@ -327,6 +465,39 @@ class PhishingDetector:
         
         return reasons
     
+    def get_ruleset_version(self) -> str:
+        """
+        Versão do conjunto de regras: revisão do código + hash das listas
+        
+        Muda automaticamente quando palavras, domínios, padrões, a lista de
+        marcas protegidas, os feeds de reputação, o modelo do classificador
+        ou o seu peso são alterados.
+        """
+        classifier = [self.classifier.model_id, self.classifier_weight] if self.classifier else []
+        rules = {
+            'suspicious_words': self.suspicious_words,
+            'trusted_domains': self.trusted_domains,
+            'blacklisted_patterns': self.blacklisted_patterns,
+            'suspicious_url_patterns': self.suspicious_url_patterns,
+            'suspicious_domain_keywords': self.suspicious_domain_keywords,
+            'lookalike_brands': [self.lookalike.version],
+            'reputation': [self.reputation.version],
+            'classifier': classifier,
+        }
+        
+        # Evita recalcular o hash a cada e-mail enquanto as listas não mudam
+        fingerprint = hash(tuple(tuple(rule_list) for rule_list in rules.values()))
+        cached = getattr(self, '_ruleset_cache', None)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        
+        digest = hashlib.sha1(
+            json.dumps(rules, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()[:12]
+        version = f"{self.RULESET_REVISION}-{digest}"
+        self._ruleset_cache = (fingerprint, version)
+        return version
+    
     def get_risk_emoji(self, risk_level: str) -> str:
         """Retorna emoji baseado no nível de risco"""
         emojis = {
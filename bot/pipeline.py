@@ -0,0 +1,224 @@
+# bot/pipeline.py
+import time
+import queue
+import logging
+import threading
+
+from bot.logger import correlation
+
+logger = logging.getLogger(__name__)
+
+# Sinal de fim de trabalho nas filas
+_STOP = object()
+# Resultado ainda não calculado
+_UNSET = object()
+
+
+class _Item:
+    __slots__ = ('seq', 'row', 'content', 'pending', 'correlation_id', 'result', 'error')
+
+    def __init__(self, seq, row, content, pending, correlation_id, result=_UNSET):
+        self.seq = seq
+        self.row = row
+        self.content = content
+        self.pending = pending
+        self.correlation_id = correlation_id
+        self.result = result
+        self.error = None
+
+
+class EmailPipeline:
+    """
+    Ciclo de processamento em estágios ligados por filas limitadas
+
+        leitura (thread de quem chama: navegador)
+            → análise/extração (PIPELINE_ANALYZERS threads)
+            → gravação no banco (1 thread)
+
+    O navegador só espera quando a fila de análise está cheia (contrapressão);
+    pontuação e gravação correm em paralelo à leitura do próximo e-mail.
+
+    Erros: uma exceção na análise ou na gravação de um e-mail é registrada e
+    afeta só aquele e-mail. advance(row, pending) é chamado na ordem de envio
+    e apenas para o prefixo contínuo de e-mails concluídos; depois de uma
+    falha a marca da caixa não avança, e o e-mail volta no próximo ciclo.
+    As falhas são contadas por message_id em `failures` (um dict que quem
+    chama mantém entre ciclos): na max_failures-ésima o e-mail é dado como
+    perdido, give_up(row, content, error) é chamado e a marca segue adiante.
+
+    Ao sair do bloco with (inclusive por exceção ou Ctrl+C), tudo o que já foi
+    lido é analisado e gravado antes do retorno.
+
+    Uso:
+        with EmailPipeline(analyze, write, advance) as pipeline:
+            for row in rows:
+                pipeline.submit(row, reader.read(row), pending)
+    """
+
+    def __init__(self, analyze, write, advance, analyzers=2, queue_size=8, max_failures=3,
+                 failures=None, give_up=None):
+        self.analyze = analyze    # content -> resultado
+        self.write = write        # (content, resultado) -> valor (ex.: 1 se phishing)
+        self.advance = advance    # (row, pending) -> None
+        self.give_up = give_up    # (row, content, erro) -> None, na thread de gravação
+        self.max_failures = max(1, max_failures)
+        self.failures = failures if failures is not None else {}
+        self.analyzers = max(1, analyzers)
+        self.analyze_queue = queue.Queue(maxsize=max(1, queue_size))
+        self.write_queue = queue.Queue(maxsize=max(1, queue_size))
+        self.threads = []
+        self.results = []
+        self.lock = threading.Lock()
+        self._seq = 0
+        self._done = {}
+        self._next_advance = 0
+        self._blocked = False
+        self.stats = {
+            'submitted': 0,
+            'analyzed': 0,
+            'written': 0,
+            'advanced': 0,
+            'analyze_errors': 0,
+            'write_errors': 0,
+            'given_up': 0,
+            'reader_wait_seconds': 0.0
+        }
+
+    def __enter__(self):
+        for i in range(self.analyzers):
+            thread = threading.Thread(target=self._analyzer, name=f"analyzer-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+        writer = threading.Thread(target=self._writer, name="db-writer", daemon=True)
+        writer.start()
+        self.threads.append(writer)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.drain()
+        return False
+
+    def submit(self, row, content, pending=0, correlation_id=None, result=_UNSET):
+        """
+        Envia um e-mail lido para análise (bloqueia se a fila estiver cheia)
+
+        content=None registra a linha sem processar (ex.: leitura abandonada),
+        só para a marca avançar na ordem certa. Com result (ex.: recuperado
+        do diário) a análise é pulada e o e-mail vai direto para a gravação.
+        """
+        item = _Item(self._seq, row, content, pending, correlation_id, result)
+        self._seq += 1
+
+        start = time.perf_counter()
+        self.analyze_queue.put(item)
+        self.stats['reader_wait_seconds'] += time.perf_counter() - start
+        self.stats['submitted'] += 1
+
+    def drain(self):
+        """Espera a análise e a gravação de tudo o que foi enviado e encerra as threads"""
+        if not self.threads:
+            return
+        for _ in range(self.analyzers):
+            self.analyze_queue.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    # ===== Estágios =====
+
+    def _analyzer(self):
+        while True:
+            item = self.analyze_queue.get()
+            if item is _STOP:
+                self.write_queue.put(_STOP)
+                return
+
+            if item.content is not None and item.result is _UNSET:
+                try:
+                    with correlation(item.correlation_id):
+                        item.result = self.analyze(item.content)
+                    with self.lock:
+                        self.stats['analyzed'] += 1
+                except Exception as e:
+                    item.error = e
+                    with self.lock:
+                        self.stats['analyze_errors'] += 1
+                    with correlation(item.correlation_id):
+                        logger.error(f"   ❌ Erro na análise de {item.content.get('message_id')}: {e}")
+
+            self.write_queue.put(item)
+
+    def _writer(self):
+        stopped = 0
+        while stopped < self.analyzers:
+            item = self.write_queue.get()
+            if item is _STOP:
+                stopped += 1
+                continue
+
+            ok = item.error is None
+            if ok and item.content is not None:
+                try:
+                    with correlation(item.correlation_id):
+                        self.results.append(self.write(item.content, item.result))
+                    self.stats['written'] += 1
+                except Exception as e:
+                    ok = False
+                    item.error = e
+                    self.stats['write_errors'] += 1
+                    with correlation(item.correlation_id):
+                        logger.error(f"   ❌ Erro ao gravar {item.content.get('message_id')}: {e}")
+
+            if item.content is not None:
+                ok = self._count_failure(item, ok)
+            self._complete(item, ok)
+
+    def _count_failure(self, item, ok):
+        """
+        Conta as falhas seguidas do e-mail; depois de max_failures desiste dele
+
+        Returns:
+            True se a marca pode passar deste e-mail
+        """
+        message_id = item.content.get('message_id')
+        if ok:
+            self.failures.pop(message_id, None)
+            return True
+
+        count = self.failures.get(message_id, 0) + 1
+        if count < self.max_failures:
+            self.failures[message_id] = count
+            return False
+
+        self.failures.pop(message_id, None)
+        self.stats['given_up'] += 1
+        with correlation(item.correlation_id):
+            logger.error(f"   ❌ Desistindo do e-mail {message_id} após {count} falhas: {item.error}",
+                         extra={'message_id': message_id, 'failures': count})
+            if self.give_up:
+                try:
+                    self.give_up(item.row, item.content, item.error)
+                except Exception as e:
+                    logger.error(f"   ❌ Erro ao registrar a desistência de {message_id}: {e}")
+        return True
+
+    def _complete(self, item, ok):
+        """Avança a marca pelo prefixo contínuo de e-mails concluídos (na thread de gravação)"""
+        self._done[item.seq] = (item, ok)
+
+        while self._next_advance in self._done:
+            item, ok = self._done.pop(self._next_advance)
+            self._next_advance += 1
+
+            if not ok:
+                self._blocked = True
+            if self._blocked:
+                continue
+
+            try:
+                self.advance(item.row, item.pending)
+                self.stats['advanced'] += 1
+            except Exception as e:
+                self._blocked = True
+                logger.error(f"   ❌ Erro ao avançar a marca: {e}")
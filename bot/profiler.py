@@ -0,0 +1,150 @@
+# bot/profiler.py
+import os
+import io
+import sys
+import signal
+import logging
+import pstats
+import cProfile
+import tracemalloc
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class CycleProfiler:
+    """
+    Perfilamento sob demanda dos ciclos de verificação
+
+    Ativação:
+        PROFILE_CYCLES=N      perfila os N próximos ciclos a partir do início
+        kill -USR1 <pid>      perfila os próximos PROFILE_SIGNAL_CYCLES ciclos (padrão 1)
+
+    Para cada ciclo perfilado são gravados em logs/profiles/:
+        cycle_<timestamp>.prof         dump do cProfile (abrir com pstats/snakeviz)
+        cycle_<timestamp>_stats.txt    top funções por tempo acumulado
+        cycle_<timestamp>_alloc.txt    top alocações do tracemalloc
+
+    As threads criadas durante o ciclo (análise e gravação do pipeline) entram
+    no mesmo perfil: cada uma ganha o seu cProfile via threading.setprofile e
+    os resultados são somados ao da thread principal. No Python 3.12+ o
+    cProfile já cobre todas as threads. O tracemalloc vale para o processo.
+    """
+
+    def __init__(self, output_dir='logs/profiles'):
+        self.output_dir = output_dir
+        self.pending = int(os.getenv('PROFILE_CYCLES', 0))
+        self.signal_cycles = int(os.getenv('PROFILE_SIGNAL_CYCLES', 1))
+        self.top = int(os.getenv('PROFILE_TOP', 30))
+        self._lock = threading.Lock()
+        self._thread_profiles = []
+
+    def request(self, cycles=1):
+        """Agenda o perfilamento dos próximos ciclos"""
+        with self._lock:
+            self.pending += cycles
+        logger.info(f"🔬 Perfilamento agendado para {cycles} ciclo(s)")
+
+    def install_signal_handler(self):
+        """Liga o SIGUSR1 ao perfilamento (apenas Unix, thread principal)"""
+        sig = getattr(signal, 'SIGUSR1', None)
+        if sig is None or threading.current_thread() is not threading.main_thread():
+            return False
+
+        signal.signal(sig, lambda signum, frame: self.request(self.signal_cycles))
+        return True
+
+    @contextmanager
+    def profile_cycle(self, name='cycle'):
+        """Perfila o bloco se houver ciclos pendentes; caso contrário não faz nada"""
+        if not self.pending:
+            yield
+            return
+
+        with self._lock:
+            if self.pending <= 0:
+                active = False
+            else:
+                self.pending -= 1
+                active = True
+
+        if not active:
+            yield
+            return
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(25)
+
+        self._thread_profiles = []
+        threading.setprofile(self._profile_thread)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            threading.setprofile(None)
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            self._write_reports(name, self._merge(profiler), snapshot)
+
+    def _profile_thread(self, frame, event, arg):
+        """Primeiro evento de uma thread nova: liga um cProfile só para ela"""
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+: só um cProfile por vez, e o principal já vê esta thread
+            return
+        with self._lock:
+            self._thread_profiles.append(profiler)
+
+    def _merge(self, profiler):
+        """Estatísticas da thread principal somadas às das threads do ciclo"""
+        stats = pstats.Stats(profiler)
+        with self._lock:
+            profiles, self._thread_profiles = self._thread_profiles, []
+        for thread_profiler in profiles:
+            try:
+                thread_profiler.create_stats()
+                stats.add(thread_profiler)
+            except Exception as e:
+                logger.debug(f"Perfil de thread ignorado: {e}")
+        return stats
+
+    def _write_reports(self, name, stats, snapshot):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            base = os.path.join(self.output_dir, f"{name}_{stamp}")
+
+            stats.dump_stats(f"{base}.prof")
+
+            stream = io.StringIO()
+            stats.stream = stream
+            stats.sort_stats('cumulative').print_stats(self.top)
+            with open(f"{base}_stats.txt", 'w', encoding='utf-8') as f:
+                f.write(stream.getvalue())
+
+            snapshot = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            ])
+            with open(f"{base}_alloc.txt", 'w', encoding='utf-8') as f:
+                f.write(f"Top {self.top} alocações por linha\n\n")
+                for stat in snapshot.statistics('lineno')[:self.top]:
+                    f.write(f"{stat}\n")
+                f.write(f"\nTop {self.top} alocações por pilha\n\n")
+                for stat in snapshot.statistics('traceback')[:self.top]:
+                    f.write(f"{stat}\n")
+                    for line in stat.traceback.format()[-6:]:
+                        f.write(f"    {line}\n")
+
+            logger.info(f"🔬 Perfil salvo em {base}.prof")
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar perfil: {e}")
@@ -0,0 +1,240 @@
+# bot/replay.py
+"""
+Gravação e reprodução do Gmail com fixtures HTML locais
+
+Uso:
+    python -m bot.replay record fixtures/gmail --pages 3    # Gmail real (login no navegador)
+    python -m bot.replay run fixtures/gmail                 # offline, mede e-mails/s
+
+A gravação salva o HTML (sem scripts) das páginas da caixa de entrada
+(inbox_p<N>.html) e de cada conversa (thread_<id>.html). A reprodução serve
+esses arquivos num servidor HTTP local e executa o pipeline completo
+(EmailReader → PhishingDetector → EmailDatabase) com os mesmos seletores
+usados no Gmail, num banco temporário.
+"""
+import os
+import re
+import sys
+import json
+import glob
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from playwright.sync_api import sync_playwright
+
+from bot.ler_email import EmailReader
+
+logger = logging.getLogger(__name__)
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """Servidor HTTP local para o diretório de fixtures"""
+
+    def __init__(self, fixture_dir, port=0):
+        self.fixture_dir = os.path.abspath(fixture_dir)
+        self.server = ThreadingHTTPServer(
+            ('127.0.0.1', port), partial(_QuietHandler, directory=self.fixture_dir)
+        )
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        # shutdown() espera o serve_forever: só chamar se o servidor subiu
+        if self.thread:
+            self.server.shutdown()
+            self.thread = None
+        self.server.server_close()
+
+
+class ReplayReader(EmailReader):
+    """EmailReader que navega nas fixtures gravadas em vez do Gmail"""
+
+    def __init__(self, fixture_dir, headless=True):
+        super().__init__(headless=headless)
+        self.fixture_dir = fixture_dir
+        self.server = FixtureServer(fixture_dir)
+        self.delay_factor = 0
+
+    def page_count(self):
+        return len(glob.glob(os.path.join(self.fixture_dir, 'inbox_p*.html')))
+
+    def start_browser(self, browser_type="chromium"):
+        try:
+            self.server.start()
+            self.playwright = sync_playwright().start()
+            self.browser = self.playwright.chromium.launch(headless=self.headless)
+            # Sem JavaScript: as fixtures são HTML estático
+            self.context = self.browser.new_context(java_script_enabled=False)
+            self.page = self.context.new_page()
+            logger.info(f"🎞️ Replay de {self.fixture_dir} em {self.server.url}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Erro ao iniciar replay: {e}")
+            return False
+
+    def login_gmail(self):
+        return True
+
+    def inbox_url(self, page=1):
+        return f"{self.server.url}/inbox_p{max(page, 1)}.html"
+
+    def thread_url(self, thread_id):
+        return f"{self.server.url}/thread_{re.sub(r'[^A-Za-z0-9_.-]', '_', thread_id)}.html"
+
+    def close_browser(self):
+        # Contexto e navegador fecham antes de a classe base parar o Playwright
+        try:
+            if self.context:
+                self.context.close()
+            if self.browser:
+                self.browser.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao fechar navegador do replay: {e}")
+        self.context = None
+        self.browser = None
+        super().close_browser()
+        self.server.stop()
+
+
+def record(fixture_dir, pages=1, max_threads=None, headless=False):
+    """Grava páginas da caixa de entrada e conversas do Gmail real"""
+    reader = EmailReader(headless=headless, record_dir=fixture_dir)
+    threads = []
+
+    try:
+        if not reader.start_browser("chrome") or not reader.login_gmail():
+            logger.error("❌ Falha ao abrir o Gmail")
+            return None
+
+        rows = []
+        for page in range(1, pages + 1):
+            page_rows = reader.list_inbox_page(page)
+            if not page_rows:
+                break
+            rows.extend(page_rows)
+
+        for row in rows[:max_threads]:
+            if reader.read_email_by_id(row['thread_id'], row['sender'], row['subject']):
+                threads.append(row['thread_id'])
+
+        manifest = {
+            'recorded_at': datetime.now().isoformat(),
+            'pages': pages,
+            'threads': threads
+        }
+        with open(os.path.join(fixture_dir, 'fixtures.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        logger.info(f"💾 {len(threads)} conversas gravadas em {fixture_dir}")
+        return manifest
+    finally:
+        reader.close_browser()
+
+
+def replay(fixture_dir, db_path=None, headless=True):
+    """
+    Executa o pipeline completo sobre as fixtures
+
+    Returns:
+        dict com e-mails processados, segundos e e-mails por segundo
+    """
+    from bot.database import EmailDatabase
+    from bot.extrair import EmailExtractor
+    from bot.phishing import PhishingDetector
+    from bot.scheduler import EmailScheduler
+
+    tmp_dir = None
+    if not db_path:
+        tmp_dir = tempfile.mkdtemp(prefix='bot_replay_')
+        db_path = os.path.join(tmp_dir, 'replay.db')
+
+    reader = ReplayReader(fixture_dir, headless=headless)
+
+    try:
+        if not reader.start_browser():
+            return None
+
+        db = EmailDatabase(db_path)
+        scheduler = EmailScheduler(reader, db, EmailExtractor(), PhishingDetector())
+        scheduler.pause = 0
+        scheduler.max_emails = 10 ** 9
+        scheduler.max_seconds = 10 ** 9
+        scheduler.crawler.initial_pages = max(reader.page_count(), 1)
+
+        start = time.perf_counter()
+        scheduler.check_emails()
+        while scheduler.backlog:
+            scheduler.check_emails()
+        elapsed = time.perf_counter() - start
+
+        processed = scheduler.stats['total_checked']
+        result = {
+            'emails': processed,
+            'phishing': scheduler.stats['phishing_detected'],
+            'seconds': round(elapsed, 3),
+            'per_second': round(processed / elapsed, 2) if elapsed else None
+        }
+        logger.info(
+            f"🏁 Replay: {result['emails']} e-mails em {result['seconds']}s "
+            f"({result['per_second']} e-mails/s), {result['phishing']} phishing"
+        )
+        return result
+    finally:
+        reader.close_browser()
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    from bot.logger import setup_logging
+
+    parser = argparse.ArgumentParser(description='Grava e reproduz o Gmail com fixtures locais')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rec = sub.add_parser('record', help='Grava fixtures a partir do Gmail real')
+    rec.add_argument('fixture_dir')
+    rec.add_argument('--pages', type=int, default=1)
+    rec.add_argument('--max-threads', type=int, default=None)
+    rec.add_argument('--headless', action='store_true')
+
+    run = sub.add_parser('run', help='Executa o pipeline offline sobre as fixtures')
+    run.add_argument('fixture_dir')
+    run.add_argument('--db', default=None, help='Banco de destino (padrão: temporário)')
+    run.add_argument('--show-browser', action='store_true')
+
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    if args.command == 'record':
+        return 0 if record(args.fixture_dir, args.pages, args.max_threads, args.headless) else 1
+
+    result = replay(args.fixture_dir, args.db, headless=not args.show_browser)
+    if result is None:
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
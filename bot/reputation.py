@@ -0,0 +1,217 @@
+# bot/reputation.py
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+# Linha de feed já normalizada (caso mais comum): dispensa normalize_domain
+_PLAIN_DOMAIN = re.compile(r'[a-z0-9][a-z0-9.-]*[a-z0-9]')
+
+
+class _Lists:
+    """Conjunto imutável de listas carregadas (trocado inteiro a cada recarga)"""
+
+    __slots__ = ('trusted', 'blocked', 'version', 'loaded_at')
+
+    def __init__(self, trusted=None, blocked=None, version='', loaded_at=None):
+        self.trusted = trusted if trusted is not None else array('q')
+        self.blocked = blocked if blocked is not None else array('q')
+        self.version = version
+        self.loaded_at = loaded_at
+
+
+def normalize_domain(value):
+    """
+    Normaliza uma linha de feed ou um host para comparação
+
+    Aceita 'dominio.com', '*.dominio.com', '.dominio.com' e o formato de
+    arquivo hosts ('0.0.0.0 dominio.com'). Retorna '' se não houver domínio.
+    """
+    value = value.split('#', 1)[0].strip()
+    if not value:
+        return ''
+    value = value.split()[-1].lower().strip('.')
+    if value.startswith('*.'):
+        value = value[2:]
+    if not value.isascii():
+        try:
+            value = value.encode('idna').decode('ascii')
+        except UnicodeError:
+            return ''
+    if value in ('localhost', '0.0.0.0', '127.0.0.1'):
+        return ''
+    return value
+
+
+class ReputationStore:
+    """
+    Listas externas de domínios confiáveis e bloqueados
+
+    Os feeds ficam em REPUTATION_DIR (padrão data/reputation), um domínio por
+    linha, em arquivos *.txt dentro de trusted/ e blocked/. Cada lista é
+    guardada como um array ordenado de hashes de 64 bits (8 bytes por
+    domínio) e consultada por busca binária; um host casa com a lista se ele
+    ou algum domínio pai estiver nela (sufixo: 'a.b.evil.com' casa com
+    'evil.com').
+
+    A cada consulta, no máximo uma vez a cada REPUTATION_CHECK_SECONDS, a data
+    de modificação dos arquivos é conferida. Se algo mudou, a thread que fez a
+    consulta recarrega as listas e as troca de uma só vez; as demais threads
+    continuam usando a versão anterior enquanto isso.
+    Para atualizar um feed, grave num arquivo temporário e renomeie.
+    """
+
+    KINDS = ('trusted', 'blocked')
+
+    def __init__(self, directory=None, check_interval=None):
+        self.directory = directory or os.getenv('REPUTATION_DIR', 'data/reputation')
+        if check_interval is None:
+            check_interval = float(os.getenv('REPUTATION_CHECK_SECONDS', 5))
+        self.check_interval = check_interval
+
+        self._lists = _Lists()
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    # ===== Carga =====
+
+    def _scan(self):
+        """Assinatura dos arquivos: [(tipo, caminho, mtime, tamanho)]"""
+        signature = []
+        for kind in self.KINDS:
+            folder = os.path.join(self.directory, kind)
+            try:
+                entries = list(os.scandir(folder))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name.endswith('.txt') and entry.is_file():
+                    stat = entry.stat()
+                    signature.append((kind, entry.path, stat.st_mtime_ns, stat.st_size))
+        return sorted(signature)
+
+    def _load(self, signature):
+        hashes = {kind: set() for kind in self.KINDS}
+        digest = hashlib.sha1()
+
+        for kind, path, _, _ in signature:
+            digest.update(f"{kind}:{os.path.basename(path)}\n".encode('utf-8'))
+            with open(path, 'rb') as f:
+                data = f.read()
+            digest.update(data)
+
+            domains = []
+            for line in data.decode('utf-8', errors='ignore').splitlines():
+                if not _PLAIN_DOMAIN.fullmatch(line):
+                    line = normalize_domain(line)
+                if line:
+                    domains.append(line)
+            hashes[kind].update(map(hash, domains))
+
+        return _Lists(
+            trusted=array('q', sorted(hashes['trusted'])),
+            blocked=array('q', sorted(hashes['blocked'])),
+            version=digest.hexdigest()[:12] if signature else '',
+            loaded_at=time.time()
+        )
+
+    def refresh(self, force=False):
+        """Recarrega as listas se os arquivos mudaram. Retorna True se recarregou."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+
+        # Outra thread já está recarregando: segue com a versão atual
+        if not self._lock.acquire(blocking=False):
+            return False
+
+        try:
+            self._checked_at = now
+            signature = self._scan()
+            if signature == self._signature:
+                return False
+
+            start = time.perf_counter()
+            lists = self._load(signature)
+            self._lists = lists
+            self._signature = signature
+            logger.info(
+                f"🛡️ Reputação {lists.version or 'vazia'}: {len(lists.trusted)} confiáveis, "
+                f"{len(lists.blocked)} bloqueados ({time.perf_counter() - start:.2f}s)"
+            )
+            return True
+        except OSError as e:
+            logger.error(f"❌ Erro ao carregar listas de reputação: {e}")
+            return False
+        finally:
+            self._lock.release()
+
+    # ===== Consulta =====
+
+    @property
+    def version(self):
+        return self._lists.version
+
+    @staticmethod
+    def _find(table, host):
+        """Retorna o sufixo de host presente na tabela (ou None)"""
+        if not table:
+            return None
+        labels = host.split('.')
+        size = len(table)
+        for i in range(len(labels)):
+            suffix = '.'.join(labels[i:])
+            value = hash(suffix)
+            position = bisect_left(table, value)
+            if position < size and table[position] == value:
+                return suffix
+        return None
+
+    def lookup(self, host):
+        """
+        Reputação de um host
+
+        Returns:
+            ('blocked', sufixo), ('trusted', sufixo) ou (None, None).
+            Se o host casar com as duas listas, bloqueado prevalece.
+        """
+        self.refresh()
+        host = normalize_domain(host or '')
+        if not host:
+            return None, None
+
+        lists = self._lists
+        blocked = self._find(lists.blocked, host)
+        if blocked:
+            return 'blocked', blocked
+        trusted = self._find(lists.trusted, host)
+        if trusted:
+            return 'trusted', trusted
+        return None, None
+
+    def is_trusted(self, host):
+        return self.lookup(host)[0] == 'trusted'
+
+    def blocked_match(self, host):
+        """Domínio da lista de bloqueio que casou com host (ou None)"""
+        kind, suffix = self.lookup(host)
+        return suffix if kind == 'blocked' else None
+
+    def get_stats(self):
+        lists = self._lists
+        count = len(lists.trusted) + len(lists.blocked)
+        return {
+            'version': lists.version,
+            'trusted': len(lists.trusted),
+            'blocked': len(lists.blocked),
+            'bytes': count * 8,
+            'loaded_at': lists.loaded_at
+        }
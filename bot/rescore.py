@@ -0,0 +1,277 @@
+# bot/rescore.py
+"""
+Reavaliação em massa dos e-mails salvos com o conjunto de regras atual
+
+Uso:
+    python -m bot.rescore                     # retoma do último checkpoint
+    python -m bot.rescore --workers 8 --batch-size 20000
+    python -m bot.rescore --restart           # ignora o checkpoint da versão atual
+
+Os e-mails são lidos do SQLite em lotes (paginação por id) e pontuados em
+paralelo num pool de processos. Só as linhas cujo veredito (score, nível de
+risco, is_phishing) mudou são regravadas, em emails e em phishing_analysis
+(motivos inclusive); as demais não são tocadas, então uma reavaliação que
+muda pouco escreve pouco. O checkpoint é gravado na mesma transação de cada
+lote, então uma interrupção retoma do último lote concluído.
+
+A coluna ruleset_version de emails/phishing_analysis indica a versão que
+produziu o veredito salvo. Que uma versão já foi aplicada à tabela inteira
+vem de rescore_checkpoint: finished_at preenchido para aquela versão.
+
+A versão da execução é fixada no início. Cada processo do pool carrega os
+feeds de reputação uma vez e não os recarrega: um feed atualizado durante
+uma reavaliação longa vale para a próxima execução (versão nova), sem
+interromper a atual.
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from bot.attachments import assess
+from bot.database import EmailDatabase
+from bot.phishing import PhishingDetector
+
+logger = logging.getLogger(__name__)
+
+_detector = None
+
+
+def _init_worker(expected_version):
+    global _detector
+    _detector = PhishingDetector()
+    # Reputação fixa durante toda a execução (sem recarga dos feeds)
+    _detector.reputation.check_interval = float('inf')
+
+    version = _detector.get_ruleset_version()
+    if version != expected_version:
+        logger.warning(
+            f"⚠️ Feeds mudaram antes do início do processo {os.getpid()}: regras {version}, "
+            f"gravando como {expected_version}; a próxima reavaliação usa a versão nova"
+        )
+
+
+def _score_chunk(rows):
+    """Executado nos processos do pool: [(id, subject, sender, sender_email, body, has_attachments, anexos)]"""
+    emails = [{
+        'subject': subject or '',
+        'sender': sender or '',
+        'sender_email': sender_email or '',
+        'body': body or '',
+        'has_attachments': bool(has_attachments),
+        'attachments': [assess(a) for a in attachments]
+    } for _, subject, sender, sender_email, body, has_attachments, attachments in rows]
+
+    analyses = _detector.analyze_batch(emails)
+    return [(row[0], a) for row, a in zip(rows, analyses)]
+
+
+class Rescorer:
+    """Reavalia os e-mails salvos quando as regras do PhishingDetector mudam"""
+
+    def __init__(self, db_path="data/emails.db", workers=None, batch_size=5000, chunk_size=250):
+        self.db_path = db_path
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.ruleset_version = PhishingDetector().get_ruleset_version()
+
+        self.db = EmailDatabase(db_path)
+        self.create_tables()
+
+    def create_tables(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rescore_checkpoint (
+                ruleset_version TEXT PRIMARY KEY,
+                last_id INTEGER DEFAULT 0,
+                processed INTEGER DEFAULT 0,
+                changed INTEGER DEFAULT 0,
+                started_at TEXT,
+                updated_at TEXT,
+                finished_at TEXT
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def get_checkpoint(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT last_id, processed, changed, finished_at
+            FROM rescore_checkpoint WHERE ruleset_version = ?
+        ''', (self.ruleset_version,))
+        row = cursor.fetchone()
+        conn.close()
+
+        if not row:
+            return {'last_id': 0, 'processed': 0, 'changed': 0, 'finished_at': None}
+        return {'last_id': row[0], 'processed': row[1], 'changed': row[2], 'finished_at': row[3]}
+
+    def reset_checkpoint(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('DELETE FROM rescore_checkpoint WHERE ruleset_version = ?', (self.ruleset_version,))
+        conn.commit()
+        conn.close()
+
+    def _read_batches(self, last_id):
+        """Gera lotes de linhas em ordem de id, a partir de last_id"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        try:
+            while True:
+                cursor.execute('''
+                    SELECT id, subject, sender, sender_email, body, has_attachments,
+                           phishing_score, risk_level, is_phishing
+                    FROM emails
+                    WHERE id > ?
+                    ORDER BY id
+                    LIMIT ?
+                ''', (last_id, self.batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                yield rows
+        finally:
+            conn.close()
+
+    def _write_changes(self, conn, results, changes, batch_last_id, processed, changed):
+        """
+        Grava o lote e o checkpoint numa única transação
+
+        results: [(email_id, analysis)] de todas as linhas do lote
+        changes: ids cujo veredito mudou (as únicas linhas regravadas)
+        """
+        now = datetime.now().isoformat()
+        cursor = conn.cursor()
+        changed_results = [(email_id, a) for email_id, a in results if email_id in changes]
+
+        cursor.executemany('''
+            UPDATE emails
+            SET phishing_score = ?, is_phishing = ?, risk_level = ?, ruleset_version = ?
+            WHERE id = ?
+        ''', [(
+            a['score'], 1 if a['is_phishing'] else 0, a['risk_level'], self.ruleset_version, email_id
+        ) for email_id, a in changed_results])
+
+        cursor.executemany('''
+            UPDATE phishing_analysis
+            SET score = ?, risk_level = ?, is_phishing = ?, reasons = ?,
+                urls_found = ?, analyzed_at = ?, ruleset_version = ?
+            WHERE email_id = ?
+        ''', [(
+            a['score'], a['risk_level'], 1 if a['is_phishing'] else 0,
+            json.dumps(a['reasons'], ensure_ascii=False),
+            json.dumps(a['urls_found'], ensure_ascii=False),
+            a['analyzed_at'], self.ruleset_version, email_id
+        ) for email_id, a in changed_results])
+
+        cursor.execute('''
+            INSERT INTO rescore_checkpoint (ruleset_version, last_id, processed, changed, started_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(ruleset_version) DO UPDATE SET
+                last_id = excluded.last_id,
+                processed = excluded.processed,
+                changed = excluded.changed,
+                updated_at = excluded.updated_at
+        ''', (self.ruleset_version, batch_last_id, processed, changed, now, now))
+
+        conn.commit()
+
+    def run(self, restart=False):
+        """Executa (ou retoma) a reavaliação. Retorna o resumo."""
+        if restart:
+            self.reset_checkpoint()
+
+        checkpoint = self.get_checkpoint()
+        if checkpoint['finished_at']:
+            logger.info(f"✅ Regras {self.ruleset_version} já aplicadas em {checkpoint['finished_at']}")
+            return checkpoint
+
+        processed = checkpoint['processed']
+        changed = checkpoint['changed']
+        if checkpoint['last_id']:
+            logger.info(f"↩️ Retomando a partir do id {checkpoint['last_id']} ({processed} já reavaliados)")
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+
+        started = time.perf_counter()
+        done_now = 0
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self.ruleset_version,)) as pool:
+                for rows in self._read_batches(checkpoint['last_id']):
+                    previous = {row[0]: (row[6], row[7], row[8]) for row in rows}
+                    # Anexos com o veredito atual de cada hash
+                    attachments = self.db.get_attachments([row[0] for row in rows])
+                    inputs = [row[:6] + (attachments.get(row[0], []),) for row in rows]
+                    chunks = [inputs[i:i + self.chunk_size] for i in range(0, len(inputs), self.chunk_size)]
+
+                    results = []
+                    changes = set()
+                    for chunk_results in pool.map(_score_chunk, chunks):
+                        for email_id, analysis in chunk_results:
+                            results.append((email_id, analysis))
+                            verdict = (analysis['score'], analysis['risk_level'],
+                                       1 if analysis['is_phishing'] else 0)
+                            if verdict != previous[email_id]:
+                                changes.add(email_id)
+
+                    processed += len(rows)
+                    changed += len(changes)
+                    done_now += len(rows)
+                    self._write_changes(conn, results, changes, rows[-1][0], processed, changed)
+
+                    elapsed = time.perf_counter() - started
+                    logger.info(
+                        f"🔁 {processed} reavaliados | {changed} alterados | "
+                        f"{done_now / elapsed if elapsed else 0:.0f} e-mails/s"
+                    )
+
+            conn.execute('''
+                INSERT INTO rescore_checkpoint (ruleset_version, started_at, updated_at, finished_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(ruleset_version) DO UPDATE SET finished_at = excluded.finished_at
+            ''', (self.ruleset_version, datetime.now().isoformat(), datetime.now().isoformat(),
+                  datetime.now().isoformat()))
+            conn.commit()
+        finally:
+            conn.close()
+
+        summary = self.get_checkpoint()
+        logger.info(f"✅ Reavaliação concluída: {summary['processed']} e-mails, {summary['changed']} alterados")
+        return summary
+
+
+def main(argv=None):
+    from bot.logger import setup_logging
+
+    parser = argparse.ArgumentParser(description='Reavalia os e-mails salvos com as regras atuais')
+    parser.add_argument('--db', default='data/emails.db')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--restart', action='store_true', help='Ignora o checkpoint da versão atual')
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    rescorer = Rescorer(args.db, workers=args.workers, batch_size=args.batch_size)
+    logger.info(f"📐 Regras atuais: {rescorer.ruleset_version}")
+    rescorer.run(restart=args.restart)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+# bot/retention.py
+"""
+Retenção: move e-mails antigos para bancos de arquivo mensais
+
+Uso:
+    python -m bot.retention run --days 180      # arquiva o que tem mais de 180 dias
+    python -m bot.retention run --dry-run       # só mostra quantos seriam movidos
+    python -m bot.retention list                # arquivos e quantidade de e-mails
+    python -m bot.retention sql "SELECT risk_level, COUNT(*) FROM all_emails GROUP BY 1"
+
+Cada e-mail enviado antes do corte (sent_at, a data do e-mail; created_at
+quando ela não pôde ser lida) vai, junto com as linhas de
+phishing_analysis, extracted_data e attachments, para
+data/archive/emails_AAAA_MM.db (mês do envio). Cada lote é movido em
+duas fases, com o arquivo anexado via ATTACH: a cópia é confirmada no
+arquivo e só depois os ids que estão lá são apagados do banco principal.
+Com o banco em WAL (rescore) o SQLite não garante uma transação atômica
+entre os dois arquivos, por isso não há uma só. Uma queda entre as fases
+deixa o lote nos dois bancos; a próxima execução copia de novo (INSERT OR
+REPLACE) e apaga. Nada se perde. Os ids são mantidos, e o message_id de
+cada e-mail movido fica em archived_ids para que ele não seja salvo de novo
+no banco principal.
+
+O banco principal usa auto_vacuum=INCREMENTAL e, após cada lote, devolve as
+páginas livres ao sistema com incremental_vacuum, mantendo o arquivo pequeno.
+
+Os arquivos continuam consultáveis: open_with_archives() anexa os meses
+pedidos e cria a view temporária all_emails (banco principal + arquivos).
+"""
+import os
+import re
+import sys
+import sqlite3
+import logging
+import argparse
+from urllib.parse import quote
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'data/archive')
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', 0))
+BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 500))
+
+# Tabelas movidas com o e-mail e a coluna que aponta para emails.id
+TABLES = (
+    ('emails', 'id'),
+    ('phishing_analysis', 'email_id'),
+    ('extracted_data', 'email_id'),
+    ('attachments', 'email_id'),
+)
+
+# Idade do e-mail: data de envio, ou a de gravação quando ela não foi lida
+AGE = 'COALESCE(sent_at, created_at)'
+
+_ARCHIVE_NAME = re.compile(r'^emails_(\d{4})_(\d{2})\.db$')
+
+
+def _read_only_uri(path):
+    return f"file:{quote(os.path.abspath(path))}?mode=ro"
+
+
+def enable_incremental_vacuum(db_path):
+    """
+    Liga auto_vacuum=INCREMENTAL no banco (bancos antigos precisam de um
+    VACUUM completo, feito só uma vez)
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            logger.info("🧹 Ativando auto_vacuum incremental (VACUUM único, pode demorar)")
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+    finally:
+        conn.close()
+
+
+def list_archives(archive_dir=ARCHIVE_DIR):
+    """Arquivos mensais existentes: lista de (AAAA_MM, caminho), do mais antigo ao mais novo"""
+    if not os.path.isdir(archive_dir):
+        return []
+    archives = []
+    for name in sorted(os.listdir(archive_dir)):
+        match = _ARCHIVE_NAME.match(name)
+        if match:
+            archives.append((f"{match.group(1)}_{match.group(2)}", os.path.join(archive_dir, name)))
+    return archives
+
+
+def open_with_archives(db_path="data/emails.db", archive_dir=ARCHIVE_DIR, months=None):
+    """
+    Conexão ao banco principal com os arquivos anexados (somente leitura)
+
+    Cada mês fica como o esquema a_AAAA_MM e a view temporária all_emails
+    junta main.emails e os arquivos. months limita os meses anexados (ex.:
+    ['2024_01', '2024_02']); o SQLite aceita poucos ATTACH por conexão
+    (10 por padrão), e os meses além do limite são ignorados com aviso.
+    """
+    conn = sqlite3.connect(_read_only_uri(db_path), uri=True)
+    conn.row_factory = sqlite3.Row
+
+    schemas = ['main']
+    for month, path in list_archives(archive_dir):
+        if months and month not in months:
+            continue
+        schema = f"a_{month}"
+        try:
+            conn.execute(f'ATTACH DATABASE ? AS {schema}', (_read_only_uri(path),))
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ Arquivo {month} não anexado ({e}); use months para escolher os meses")
+            break
+        schemas.append(schema)
+
+    columns = [row[1] for row in conn.execute('PRAGMA main.table_info(emails)')]
+    selects = []
+    for schema in schemas:
+        available = {row[1] for row in conn.execute(f'PRAGMA {schema}.table_info(emails)')}
+        # Arquivos antigos podem não ter colunas criadas depois
+        fields = ', '.join(c if c in available else f'NULL AS {c}' for c in columns)
+        selects.append(f"SELECT {fields}, '{schema}' AS source FROM {schema}.emails")
+    conn.execute(f"CREATE TEMP VIEW all_emails AS {' UNION ALL '.join(selects)}")
+    return conn
+
+
+class RetentionManager:
+    """Move e-mails antigos do banco principal para os arquivos mensais"""
+
+    def __init__(self, db_path="data/emails.db", archive_dir=ARCHIVE_DIR,
+                 days=RETENTION_DAYS, batch_size=BATCH_SIZE):
+        self.db_path = db_path
+        self.archive_dir = archive_dir
+        self.days = days
+        self.batch_size = batch_size
+
+    def archive_path(self, month):
+        return os.path.join(self.archive_dir, f"emails_{month}.db")
+
+    def cutoff(self):
+        # Mesmo formato de sent_at e de created_at (CURRENT_TIMESTAMP, UTC)
+        return (datetime.now(timezone.utc) - timedelta(days=self.days)).strftime('%Y-%m-%d %H:%M:%S')
+
+    def count_expired(self):
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute(
+            f'SELECT COUNT(*) FROM emails WHERE {AGE} < ?', (self.cutoff(),)
+        ).fetchone()[0]
+        conn.close()
+        return count
+
+    def _prepare_archive(self, conn):
+        """Cria no arquivo anexado as tabelas e colunas que faltarem"""
+        for table, _ in TABLES:
+            sql = conn.execute(
+                "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone()[0]
+            # sqlite_master guarda 'CREATE TABLE nome (...)', já com as colunas de migrações
+            conn.execute(re.sub(r'^CREATE TABLE\s+', 'CREATE TABLE IF NOT EXISTS archive.', sql))
+
+            archived = {row[1] for row in conn.execute(f'PRAGMA archive.table_info({table})')}
+            for row in conn.execute(f'PRAGMA main.table_info({table})').fetchall():
+                if row[1] not in archived:
+                    conn.execute(f'ALTER TABLE archive.{table} ADD COLUMN {row[1]} {row[2]}')
+
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_phishing_analysis_email ON phishing_analysis(email_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_extracted_data_email ON extracted_data(email_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_attachments_email ON attachments(email_id)')
+
+    @staticmethod
+    def _transaction(conn, statements):
+        """Executa [(sql, parâmetros)] numa transação"""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _move(self, conn, month, ids):
+        """
+        Move um grupo de e-mails do mesmo mês em duas fases
+
+        Returns:
+            quantidade de e-mails removidos do banco principal
+        """
+        conn.execute('ATTACH DATABASE ? AS archive', (self.archive_path(month),))
+        try:
+            self._prepare_archive(conn)
+            marks = ','.join('?' * len(ids))
+
+            # 1. Cópia confirmada no arquivo
+            copies = []
+            for table, key in TABLES:
+                columns = ', '.join(row[1] for row in conn.execute(f'PRAGMA main.table_info({table})'))
+                copies.append((f'''
+                    INSERT OR REPLACE INTO archive.{table} ({columns})
+                    SELECT {columns} FROM main.{table} WHERE {key} IN ({marks})
+                ''', ids))
+            self._transaction(conn, copies)
+
+            # 2. Remoção do principal, só dos ids que o arquivo já tem
+            confirmed = [row[0] for row in conn.execute(
+                f'SELECT id FROM archive.emails WHERE id IN ({marks})', ids
+            )]
+            if confirmed:
+                marks = ','.join('?' * len(confirmed))
+                now = datetime.now().isoformat()
+                self._transaction(conn, [(f'''
+                    INSERT OR IGNORE INTO main.archived_ids (message_id, month, archived_at)
+                    SELECT message_id, ?, ? FROM archive.emails WHERE id IN ({marks})
+                ''', [month, now] + confirmed)] + [
+                    # Dependentes antes do e-mail
+                    (f'DELETE FROM main.{table} WHERE {key} IN ({marks})', confirmed)
+                    for table, key in reversed(TABLES)
+                ])
+            return len(confirmed)
+        finally:
+            conn.execute('DETACH DATABASE archive')
+
+    def _backfill_archived_ids(self, conn):
+        """Registra em archived_ids os e-mails de arquivos criados antes da tabela"""
+        if conn.execute('SELECT 1 FROM archived_ids LIMIT 1').fetchone():
+            return
+        for month, path in list_archives(self.archive_dir):
+            conn.execute('ATTACH DATABASE ? AS archive', (path,))
+            try:
+                self._transaction(conn, [('''
+                    INSERT OR IGNORE INTO main.archived_ids (message_id, month, archived_at)
+                    SELECT message_id, ?, ? FROM archive.emails
+                ''', (month, datetime.now().isoformat()))])
+            finally:
+                conn.execute('DETACH DATABASE archive')
+
+    def run(self, dry_run=False):
+        """
+        Arquiva tudo o que passou da idade de retenção
+
+        Returns:
+            {mês: e-mails movidos}
+        """
+        if self.days <= 0:
+            logger.info("🗄️ Retenção desativada (RETENTION_DAYS=0)")
+            return {}
+
+        cutoff = self.cutoff()
+        if dry_run:
+            logger.info(f"🗄️ {self.count_expired()} e-mails anteriores a {cutoff} seriam arquivados")
+            return {}
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        enable_incremental_vacuum(self.db_path)
+
+        moved = {}
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            self._backfill_archived_ids(conn)
+            while True:
+                rows = conn.execute(f'''
+                    SELECT id, strftime('%Y_%m', {AGE}) FROM emails
+                    WHERE {AGE} < ? ORDER BY id LIMIT ?
+                ''', (cutoff, self.batch_size)).fetchall()
+                if not rows:
+                    break
+
+                by_month = {}
+                for email_id, month in rows:
+                    by_month.setdefault(month or '0000_00', []).append(email_id)
+
+                for month, ids in by_month.items():
+                    count = self._move(conn, month, ids)
+                    if count < len(ids):
+                        raise RuntimeError(f"{len(ids) - count} e-mails não confirmados no arquivo {month}")
+                    moved[month] = moved.get(month, 0) + count
+
+                # Devolve ao sistema as páginas liberadas pelo lote. O pragma
+                # libera uma página por passo e execute() só dá o primeiro;
+                # executescript() vai até o fim.
+                conn.executescript('PRAGMA incremental_vacuum;')
+        finally:
+            conn.close()
+
+        total = sum(moved.values())
+        if total:
+            logger.info(f"🗄️ {total} e-mails anteriores a {cutoff} arquivados em {len(moved)} arquivo(s) mensal(is)")
+        else:
+            logger.info(f"🗄️ Nenhum e-mail anterior a {cutoff} para arquivar")
+        return moved
+
+
+def main(argv=None):
+    from bot.database import EmailDatabase
+    from bot.logger import setup_logging
+
+    parser = argparse.ArgumentParser(description='Retenção e arquivos mensais de e-mails')
+    parser.add_argument('--db', default='data/emails.db')
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='Arquiva e-mails mais antigos que --days')
+    run.add_argument('--days', type=int, default=RETENTION_DAYS)
+    run.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    run.add_argument('--dry-run', action='store_true')
+
+    sub.add_parser('list', help='Lista os arquivos mensais')
+
+    sql = sub.add_parser('sql', help='Consulta com os arquivos anexados (view all_emails)')
+    sql.add_argument('query')
+    sql.add_argument('--months', help='Meses separados por vírgula (ex.: 2024_01,2024_02)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        setup_logging()
+        EmailDatabase(args.db)
+        RetentionManager(args.db, args.archive_dir, args.days, args.batch_size).run(args.dry_run)
+        return 0
+
+    if args.command == 'list':
+        archives = list_archives(args.archive_dir)
+        for month, path in archives:
+            conn = sqlite3.connect(_read_only_uri(path), uri=True)
+            count = conn.execute('SELECT COUNT(*) FROM emails').fetchone()[0]
+            conn.close()
+            print(f"{month}  {count:>8} e-mails  {os.path.getsize(path) / 1024 / 1024:>8.1f} MB  {path}")
+        if not archives:
+            print("Nenhum arquivo")
+        return 0
+
+    months = args.months.split(',') if args.months else None
+    conn = open_with_archives(args.db, args.archive_dir, months)
+    cursor = conn.execute(args.query)
+    if cursor.description:
+        print('\t'.join(d[0] for d in cursor.description))
+        for row in cursor:
+            print('\t'.join('' if v is None else str(v) for v in row))
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,17 +6,17 @@ import logging
 from datetime import datetime
 from dotenv import load_dotenv
 
+from bot.attachments import AttachmentCache
+from bot.cache import AnalysisCache
+from bot.crawler import InboxCrawler, row_id
+from bot.journal import WorkJournal
+from bot.logger import setup_logging, correlation
+from bot.pipeline import EmailPipeline
+from bot.profiler import CycleProfiler
+from bot.retention import RetentionManager
+
 load_dotenv()
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/bot.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
@@ -31,102 +31,323 @@ class EmailScheduler:
         self.interval = int(os.getenv('CHECK_INTERVAL_MINUTES', 5))
         self.max_emails = int(os.getenv('MAX_EMAILS_PER_CHECK', 10))
         self.running = False
+        self.profiler = CycleProfiler()
+        # Gravações do cache ficam para a thread de gravação do pipeline
+        self.cache = AnalysisCache(phishing_detector, extractor, database.db_path, write_behind=True)
+        self.attachment_cache = AttachmentCache(database.db_path)
+        self.crawler = InboxCrawler(email_reader, database)
+        self.journal = WorkJournal(database.db_path, self.crawler.mailbox)
+        self.retention = RetentionManager(database.db_path)
+        self.max_seconds = int(os.getenv('MAX_SECONDS_PER_CHECK', 600))
+        self.max_failures = 3
+        # Pausa extra do navegador entre e-mails (a leitura já espera cada página carregar)
+        self.pause = float(os.getenv('EMAIL_PAUSE_SECONDS', 0))
+        self.analyzers = int(os.getenv('PIPELINE_ANALYZERS', 2))
+        self.queue_size = int(os.getenv('PIPELINE_QUEUE_SIZE', 8))
+        self.failures = {}
+        # Falhas de análise/gravação por message_id (contadas pelo pipeline entre ciclos)
+        self.process_failures = {}
+        self.backlog = 0
+        # Falhas seguidas de gravação no banco (espera crescente entre tentativas)
+        self.write_failures = 0
+        self.retry_at = 0
         self.stats = {
             'total_checked': 0,
             'phishing_detected': 0,
             'last_check': None,
             'started_at': None
         }
+        
+        # Totais acumulados sobrevivem a reinícios do contêiner
+        saved = self.journal.load_stats()
+        for key in ('total_checked', 'phishing_detected', 'last_check'):
+            if key in saved:
+                self.stats[key] = saved[key]
     
     def check_emails(self):
-        """Verifica novos e-mails"""
+        """Verifica novos e-mails (perfilado sob demanda)"""
+        if time.monotonic() < self.retry_at:
+            logger.info("⏸️ Aguardando para tentar gravar no banco de novo")
+            return
+        with self.profiler.profile_cycle('check_emails'):
+            self._check_emails()
+    
+    def _check_emails(self):
+        """Executa um ciclo de verificação (um bloco limitado de e-mails novos)"""
         try:
             logger.info("=" * 50)
             logger.info("🔍 Verificando novos e-mails...")
             
-            # Ir para inbox
-            self.reader.page.goto(
-                "https://mail.google.com/mail/u/0/#inbox", 
-                wait_until="load"
-            )
-            time.sleep(3)
-            
-            # Contar e-mails
-            total = self.reader.get_email_count()
-            
-            if total == 0:
-                logger.info("📭 Nenhum e-mail na caixa de entrada")
-                return
+            # Atraso já listado e trabalho interrompido (ex.: queda do contêiner)
+            # vêm antes da caixa, do mais antigo para o mais recente
+            entries = self.journal.pending()
+            chunk_entries = entries[:self.max_emails]
+            if entries:
+                logger.info(f"♻️ {len(entries)} e-mails pendentes no diário; "
+                            f"processando {len(chunk_entries)} neste ciclo")
             
-            check_count = min(self.max_emails, total)
-            logger.info(f"📬 Verificando {check_count} e-mails...")
+            # Entradas que já voltaram max_failures vezes sem concluir (ex.: o
+            # processo cai sempre no mesmo e-mail) são abandonadas
+            for entry in chunk_entries:
+                if entry['attempts'] >= self.max_failures:
+                    message_id = row_id(entry['row'])
+                    logger.error(f"   ❌ Desistindo do e-mail {message_id} após "
+                                 f"{entry['attempts']} tentativas pelo diário")
+                    self.journal.failed(message_id, entry['row'], entry['content'],
+                                        f"{entry['attempts']} tentativas sem concluir (etapa {entry['stage']})")
+                    entry['stage'] = 'abandoned'
             
-            phishing_found = 0
+            deadline = time.monotonic() + self.max_seconds
+            cursor_before = self.crawler.cursor_page
+            pipeline = EmailPipeline(
+                analyze=self._analyze_content,
+                write=self._save_content,
+                advance=self._advance,
+                analyzers=self.analyzers,
+                queue_size=self.queue_size,
+                max_failures=self.max_failures,
+                failures=self.process_failures,
+                give_up=self._give_up
+            )
             
-            for i in range(check_count):
-                try:
-                    content = self.reader.read_email_by_index(i)
-                    
-                    if not content:
-                        continue
-                    
-                    # Verificar se já processado
-                    if self.db.email_exists(content.get('message_id', '')):
-                        continue
-                    
-                    # Analisar phishing
-                    analysis = self.phishing.analyze_email(content)
-                    content['phishing_score'] = analysis['score']
-                    content['phishing_result'] = analysis
-                    
-                    # Salvar no banco
-                    email_id = self.db.save_email(content)
-                    
-                    if email_id > 0:
-                        # Salvar análise de phishing
-                        self.db.save_phishing_analysis(email_id, analysis)
-                        
-                        # Extrair dados
-                        extracted = self.extractor.extract_all(content.get('body', ''))
-                        for data_type, values in extracted.items():
-                            for value in values:
-                                self.db.save_extracted_data(email_id, data_type, value)
-                        
-                        # Log do resultado
-                        emoji = self.phishing.get_risk_emoji(analysis['risk_level'])
-                        logger.info(
-                            f"   {emoji} [{analysis['risk_level']}] "
-                            f"Score: {analysis['score']} | "
-                            f"{content.get('sender', 'N/A')[:20]} - "
-                            f"{content.get('subject', 'N/A')[:30]}"
-                        )
-                        
-                        if analysis['is_phishing']:
-                            phishing_found += 1
-                            logger.warning(f"   ⚠️ PHISHING: {', '.join(analysis['reasons'][:2])}")
-                        
-                        self.stats['total_checked'] += 1
-                    
-                    time.sleep(1)
-                    
-                except Exception as e:
-                    logger.error(f"   ❌ Erro no e-mail {i}: {e}")
-                    continue
+            # O navegador lê nesta thread; análise e gravação seguem em paralelo
+            with pipeline:
+                total = len(entries)
+                submitted = self._submit_entries(pipeline, chunk_entries, 0, total, deadline)
+                
+                # Depois do diário, a caixa, em todo ciclo: o diário não inclui o
+                # que chegou depois. Todas as linhas novas vão para o diário, e as
+                # que cabem no bloco são processadas já.
+                new_rows = self.crawler.find_new(discovered=self.journal.known_ids())
+                self.journal.discover(new_rows)
+                total += len(new_rows)
+                room = self.max_emails - len(chunk_entries) if submitted == len(chunk_entries) else 0
+                chunk = new_rows[:room]
+                
+                if new_rows:
+                    logger.info(f"📬 {len(new_rows)} e-mails novos; processando {len(chunk)} neste ciclo")
+                elif not entries:
+                    logger.info("📭 Nenhum e-mail novo na caixa de entrada")
+                
+                if chunk:
+                    self._submit_entries(
+                        pipeline,
+                        [{'row': row, 'stage': 'discovered', 'content': None, 'result': None}
+                         for row in chunk],
+                        len(chunk_entries), total, deadline
+                    )
             
+            # Pipeline encerrado: grava o que as últimas análises deixaram no cache
+            self.cache.flush()
+            phishing_found = sum(pipeline.results)
+            self.backlog = total - pipeline.stats['advanced']
+            if self.crawler.cursor_page:
+                # A varredura não alcançou a marca: listar a caixa em seguida
+                self.backlog = max(self.backlog, 1)
+            if not pipeline.stats['advanced'] and self.crawler.cursor_page == cursor_before:
+                # Nada avançou (ex.: o mesmo e-mail falhando): esperar o
+                # intervalo em vez de repetir o ciclo sem pausa
+                self.backlog = 0
+            self._update_write_backoff(pipeline.stats['write_errors'])
             self.stats['phishing_detected'] += phishing_found
             self.stats['last_check'] = datetime.now().isoformat()
+            self.journal.save_stats(self.stats)
             
             logger.info(f"✅ Verificação concluída! Phishing encontrados: {phishing_found}")
             logger.info(f"📊 Total processados: {self.stats['total_checked']} | "
                        f"Total phishing: {self.stats['phishing_detected']}")
+            logger.info(f"🧵 Pipeline: {pipeline.stats['submitted']} lidos, "
+                       f"{pipeline.stats['analyze_errors']} erros de análise, "
+                       f"{pipeline.stats['write_errors']} erros de gravação, "
+                       f"{pipeline.stats['given_up']} abandonados, "
+                       f"navegador esperou {pipeline.stats['reader_wait_seconds']:.1f}s pela fila",
+                       extra={'pipeline': pipeline.stats})
+            if self.backlog:
+                logger.info(f"📥 {self.backlog} e-mails pendentes para o próximo bloco")
+            
+            cache_stats = self.cache.get_stats()
+            logger.info(f"💾 Cache de análises: {cache_stats['hit_rate']:.0%} de acertos "
+                       f"({cache_stats['memory_hits']} memória, {cache_stats['disk_hits']} disco, "
+                       f"{cache_stats['misses']} novas)", extra={'cache': cache_stats})
             
         except Exception as e:
             logger.error(f"❌ Erro na verificação: {e}")
     
+    def _submit_entries(self, pipeline, entries, offset, total, deadline):
+        """
+        Lê (quando preciso) e envia ao pipeline as entradas, na ordem
+
+        Returns:
+            quantas entradas foram enviadas; menos que len(entries) se o tempo
+            acabou ou uma leitura falhou (o restante fica para o próximo ciclo)
+        """
+        for index, entry in enumerate(entries):
+            if time.monotonic() > deadline:
+                logger.info("⏱️ Tempo máximo do ciclo atingido; o restante fica para o próximo")
+                return index
+            
+            row, stage = entry['row'], entry['stage']
+            pending = total - offset - index - 1
+            
+            # Retomada do diário: nada do que já foi concluído é refeito
+            if stage in ('saved', 'abandoned'):
+                pipeline.submit(row, None, pending)
+                continue
+            self.journal.attempt(row_id(row))
+            if stage == 'analyzed':
+                pipeline.submit(row, entry['content'], pending, result=entry['result'])
+                continue
+            if stage == 'scraped':
+                pipeline.submit(row, entry['content'], pending)
+                continue
+            
+            try:
+                with correlation() as correlation_id:
+                    content = self._read_row(row)
+            except Exception as e:
+                logger.error(f"   ❌ Erro no e-mail {row_id(row)}: {e}")
+                return index
+            
+            if content is None:
+                # Falha na leitura: tenta de novo no próximo ciclo sem pular a marca
+                return index
+            
+            if content:
+                self.journal.scraped(row_id(row), content)
+            
+            pipeline.submit(row, content or None, pending, correlation_id)
+            if self.pause:
+                time.sleep(self.pause)
+        
+        return len(entries)
+    
+    def _read_row(self, row):
+        """
+        Lê uma linha da lista no navegador
+        
+        Returns:
+            o conteúdo lido; {} se a leitura foi abandonada após max_failures
+            tentativas (a marca avança sem salvar); None se deve tentar de novo
+        """
+        message_id = row_id(row)
+        content = self.reader.read_email_by_id(row['thread_id'], row['sender'], row['subject'], message_id)
+        
+        if content:
+            self.failures.pop(message_id, None)
+            return content
+        
+        self.failures[message_id] = self.failures.get(message_id, 0) + 1
+        if self.failures[message_id] < self.max_failures:
+            return None
+        
+        logger.error(f"   ❌ Desistindo do e-mail {message_id} após {self.max_failures} falhas")
+        self.failures.pop(message_id, None)
+        self.journal.failed(message_id, row, None, f"{self.max_failures} falhas de leitura")
+        return {}
+    
+    def _analyze_content(self, content):
+        """
+        Estágio de análise: phishing e dados extraídos (só lê o banco)
+        
+        Returns:
+            (analysis, extracted), ou None se o e-mail já estiver salvo
+        """
+        if self.db.is_complete(content.get('message_id', '')):
+            return None
+        
+        # Vereditos já conhecidos dos hashes dos anexos
+        self.attachment_cache.annotate(content.get('attachments'))
+        
+        # Reaproveita cópias já analisadas
+        return self.cache.analyze(content)
+    
+    def _save_content(self, content, result):
+        """
+        Estágio de gravação, a única thread que escreve no banco durante o
+        ciclo: cache de análises, diário e e-mail. Retorna 1 se for phishing.
+        """
+        self.cache.flush()
+        if result is None:
+            return 0
+        
+        analysis, extracted = result
+        # Se a gravação abaixo falhar, a retomada não refaz a análise
+        self.journal.analyzed(content.get('message_id'), result)
+        content.setdefault('mailbox', self.crawler.mailbox)
+        content['phishing_score'] = analysis['score']
+        content['phishing_result'] = analysis
+        
+        # E-mail, análise, dados extraídos e anexos numa só transação; um erro
+        # sobe para o pipeline e o e-mail fica no diário como 'analyzed'
+        email_id, inserted = self.db.save_processed(content, analysis, extracted)
+        self.journal.saved(content.get('message_id'))
+        
+        if email_id is None:
+            # Já movido para um arquivo mensal
+            return 0
+        if not inserted:
+            logger.info(f"   ♻️ Gravação de {content.get('message_id')} completada", extra={'email_id': email_id})
+            return 0
+        
+        # Log do resultado (linha detalhada, sujeita a amostragem)
+        emoji = self.phishing.get_risk_emoji(analysis['risk_level'])
+        logger.info(
+            f"   {emoji} [{analysis['risk_level']}] "
+            f"Score: {analysis['score']} | "
+            f"{content.get('sender', 'N/A')[:20]} - "
+            f"{content.get('subject', 'N/A')[:30]}",
+            extra={'sample': True, 'message_id': content.get('message_id'),
+                   'score': analysis['score'], 'email_id': email_id}
+        )
+        
+        self.stats['total_checked'] += 1
+        
+        if analysis['is_phishing']:
+            logger.warning(f"   ⚠️ PHISHING: {', '.join(analysis['reasons'][:2])}",
+                           extra={'message_id': content.get('message_id')})
+            return 1
+        
+        return 0
+    
+    def _update_write_backoff(self, write_errors):
+        """Espera crescente (30s a 1h) antes de tentar de novo após falhas de gravação"""
+        if not write_errors:
+            self.write_failures = 0
+            self.retry_at = 0
+            return
+        
+        self.write_failures += 1
+        delay = min(30 * 2 ** (self.write_failures - 1), 3600)
+        self.retry_at = time.monotonic() + delay
+        logger.warning(f"💾 Falha ao gravar no banco ({self.write_failures}x seguidas); "
+                       f"nova tentativa em {delay}s")
+    
+    def _give_up(self, row, content, error):
+        """E-mail que falhou max_failures vezes: fica registrado e a marca segue"""
+        self.journal.failed(content.get('message_id'), row, content, error)
+    
+    def _advance(self, row, pending):
+        """Avança a marca da caixa e tira o e-mail do diário"""
+        self.crawler.mark_processed(row_id(row), pending)
+        self.journal.done(row_id(row))
+    
+    def _process_content(self, content):
+        """Analisa e salva um e-mail lido, sem o pipeline. Retorna 1 se for phishing."""
+        return self._save_content(content, self._analyze_content(content))
+    
+    def run_retention(self):
+        """Arquiva os e-mails antigos (entre ciclos, na mesma thread do agendador)"""
+        try:
+            self.retention.run()
+        except Exception as e:
+            logger.error(f"❌ Erro na retenção: {e}")
+    
     def start(self):
         """Inicia o agendador"""
+        setup_logging()
         self.running = True
         self.stats['started_at'] = datetime.now().isoformat()
+        self.profiler.install_signal_handler()
         
         logger.info("=" * 50)
         logger.info("🚀 BOT DE E-MAILS INICIADO")
@@ -140,10 +361,22 @@ class EmailScheduler:
         # Agendar verificações
         schedule.every(self.interval).minutes.do(self.check_emails)
         
+        # Arquivamento diário dos e-mails antigos (RETENTION_DAYS > 0)
+        if self.retention.days > 0:
+            retention_at = os.getenv('RETENTION_AT', '03:30')
+            schedule.every().day.at(retention_at).do(self.run_retention)
+            logger.info(f"🗄️ Retenção de {self.retention.days} dias, arquivando diariamente às {retention_at}")
+        
         # Loop principal
         while self.running:
             try:
                 schedule.run_pending()
+                
+                # Ainda há e-mails novos: processar o próximo bloco sem esperar o intervalo
+                if self.backlog and self.running and time.monotonic() >= self.retry_at:
+                    self.check_emails()
+                    continue
+                
                 time.sleep(30)  # Verificar agenda a cada 30 segundos
             except KeyboardInterrupt:
                 logger.info("\n⚠️ Interrompido pelo usuário")
@@ -156,6 +389,7 @@ class EmailScheduler:
     def stop(self):
         """Para o agendador"""
         self.running = False
+        self.journal.save_stats(self.stats)
         logger.info("🛑 Bot parado")
         logger.info(f"📊 Estatísticas finais:")
         logger.info(f"   Total verificados: {self.stats['total_checked']}")